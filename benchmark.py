@@ -0,0 +1,506 @@
+#!/usr/bin/env python3
+import os
+import sys
+import json
+import time
+import shutil
+import resource
+import platform
+import tempfile
+import threading
+import subprocess
+import statistics
+import urllib.parse
+
+# ------------------------------------------------------------
+# 오프라인 벤치마크
+# ------------------------------------------------------------
+# 로컬 가짜 미디어 서버 + 가짜 추출기로 youtube_downloader_cli 의
+#   download_video / download_playlist / process_download_queue (URL 목록 / 플레이리스트 1개)
+# 처리량과 오버헤드를 측정 (네트워크 / YouTube 없이).
+#
+#   python3 benchmark.py                                   # 전체 시나리오 → JSON 출력
+#   python3 benchmark.py --modes queue --kinds dash --workers 1 4 8 -o after.json
+#   python3 benchmark.py --compare before.json after.json  # 두 결과 비교
+#
+# 시나리오마다 별도 프로세스에서 실행 → 최대 RSS / CPU 시간이 섞이지 않음.
+# 캐시/저널/자동 튜닝 기록은 임시 폴더 사용 (.cache, .state 는 건드리지 않음).
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+BENCH_MODES = ("video", "playlist", "queue", "channel")
+BENCH_KINDS = ("progressive", "dash", "hls")
+BENCH_WORKERS = (1, 2, 4)
+BENCH_JOBS = 8
+BENCH_SIZE_MIB = 8
+BENCH_SEGMENT_MIB = 1
+BENCH_SEGMENT_SECONDS = 2.0
+BENCH_STARTUP_RUNS = 5
+BENCH_TIMEOUT = 600
+BENCH_CAPTION_LANGS = 100      # YouTube info 크기 흉내 (자동 자막 언어 수)
+
+MIB = 1024 * 1024
+PAYLOAD = os.urandom(MIB)      # 응답 본문은 이 블록을 반복
+
+# ------------------------------------------------------------
+# 가짜 미디어 서버
+# ------------------------------------------------------------
+# /media/<id>.mp4?size=N                   : 단일 파일 (Range 지원)
+# /dash/<id>/seg-<i>.m4s?size=N            : DASH 조각
+# /hls/<id>/index.m3u8?segments=K&size=N   : HLS 재생 목록 → /hls/<id>/seg-<i>.ts?size=N
+
+def hls_manifest(segments, size):
+    lines = [
+        "#EXTM3U",
+        "#EXT-X-VERSION:3",
+        f"#EXT-X-TARGETDURATION:{int(BENCH_SEGMENT_SECONDS)}",
+        "#EXT-X-MEDIA-SEQUENCE:0",
+    ]
+    for i in range(segments):
+        lines += [f"#EXTINF:{BENCH_SEGMENT_SECONDS:.1f},", f"seg-{i}.ts?size={size}"]
+    lines.append("#EXT-X-ENDLIST")
+    return ("\n".join(lines) + "\n").encode()
+
+def make_media_handler():
+    from http.server import BaseHTTPRequestHandler
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, fmt, *args):
+            pass
+
+        def _send_bytes(self, data, content_type):
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            if self.command != "HEAD":
+                self.wfile.write(data)
+
+        def _send_payload(self, size):
+            start, end = 0, size - 1
+            match = self.headers.get("Range", "").partition("bytes=")[2]
+            if match:
+                first, _, last = match.partition("-")
+                start = int(first or 0)
+                end = min(int(last), size - 1) if last else size - 1
+                if start >= size:
+                    self.send_response(416)
+                    self.send_header("Content-Range", f"bytes */{size}")
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                self.send_response(206)
+                self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+            else:
+                self.send_response(200)
+
+            self.send_header("Content-Type", "video/mp4")
+            self.send_header("Accept-Ranges", "bytes")
+            self.send_header("Content-Length", str(end - start + 1))
+            self.end_headers()
+            if self.command == "HEAD":
+                return
+
+            view = memoryview(PAYLOAD)
+            pos = start
+            while pos <= end:
+                offset = pos % MIB
+                chunk = view[offset:offset + min(end - pos + 1, MIB - offset, 256 * 1024)]
+                self.wfile.write(chunk)
+                pos += len(chunk)
+
+        def do_GET(self):
+            parsed = urllib.parse.urlsplit(self.path)
+            query = dict(urllib.parse.parse_qsl(parsed.query))
+            size = int(query.get("size") or MIB)
+
+            if parsed.path.endswith(".m3u8"):
+                return self._send_bytes(hls_manifest(int(query.get("segments") or 1), size),
+                                        "application/vnd.apple.mpegurl")
+            if parsed.path.startswith(("/media/", "/dash/", "/hls/")):
+                return self._send_payload(size)
+
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+        do_HEAD = do_GET
+
+    return Handler
+
+class MediaServer:
+
+    def __init__(self):
+        from http.server import ThreadingHTTPServer
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), make_media_handler())
+        self.server.daemon_threads = True
+        self.port = self.server.server_address[1]
+
+    def __enter__(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.server.shutdown()
+        self.server.server_close()
+
+# ------------------------------------------------------------
+# 가짜 추출기
+# ------------------------------------------------------------
+# http://127.0.0.1:<port>/watch/<kind>/<id>?size=N  → 영상 1개 (kind 형식의 포맷 하나)
+# http://127.0.0.1:<port>/playlist/<kind>/<count>?size=N → 위 영상 count 개의 플레이리스트
+# 영상 info에는 자막/썸네일 목록을 넣어서 실제 YouTube info(수백 KB)와 비슷한 크기로.
+# create_ydl 이 만드는 모든 YoutubeDL 에 다른 추출기보다 먼저 등록.
+
+def bench_formats(base, kind, video_id, size):
+    segments = max(1, size // (BENCH_SEGMENT_MIB * MIB))
+    segment_size = size // segments
+    common = {
+        "ext": "mp4",
+        "vcodec": "avc1.4d401f",
+        "acodec": "mp4a.40.2",
+        "width": 1280,
+        "height": 720,
+        "filesize": segment_size * segments if kind != "progressive" else size,
+    }
+
+    if kind == "dash":
+        return [{
+            **common,
+            "format_id": "dash",
+            "protocol": "http_dash_segments",
+            "url": f"{base}/dash/{video_id}/manifest.mpd",
+            "fragment_base_url": f"{base}/dash/{video_id}/",
+            "fragments": [{"path": f"seg-{i}.m4s?size={segment_size}", "duration": BENCH_SEGMENT_SECONDS}
+                          for i in range(segments)],
+        }], segments
+    if kind == "hls":
+        return [{
+            **common,
+            "format_id": "hls",
+            "protocol": "m3u8_native",
+            "url": f"{base}/hls/{video_id}/index.m3u8?segments={segments}&size={segment_size}",
+        }], segments
+    return [{**common, "format_id": "progressive", "protocol": "http", "url": f"{base}/media/{video_id}.mp4?size={size}"}], segments
+
+def install_stub_extractor(cli):
+    from yt_dlp.extractor.common import InfoExtractor
+
+    YoutubeDL = cli.load_yt_dlp()
+
+    class BenchIE(InfoExtractor):
+        _VALID_URL = r"(?P<base>http://127\.0\.0\.1:\d+)/(?P<type>watch|playlist)/(?P<kind>\w+)/(?P<id>[\w-]+)"
+
+        def _real_extract(self, url):
+            base, kind_type, kind, item = self._match_valid_url(url).group("base", "type", "kind", "id")
+            size = int(dict(urllib.parse.parse_qsl(urllib.parse.urlsplit(url).query)).get("size") or MIB)
+
+            if kind_type == "playlist":
+                entries = [
+                    self.url_result(f"{base}/watch/{kind}/{item}-{i}?size={size}", BenchIE, f"{item}-{i}", f"bench {item}-{i}")
+                    for i in range(int(item.rsplit("-", 1)[-1]))
+                ]
+                return self.playlist_result(entries, f"bench-{kind}-{item}", f"bench {kind} {item}")
+
+            formats, segments = bench_formats(base, kind, item, size)
+            return {
+                "id": item,
+                "title": f"bench {item}",
+                "duration": segments * BENCH_SEGMENT_SECONDS,
+                "webpage_url": url,
+                "formats": formats,
+                "thumbnails": [{"url": f"{base}/thumb/{item}/{i}.jpg", "width": 16 * i, "height": 9 * i}
+                               for i in range(1, 41)],
+                "automatic_captions": {
+                    f"l{lang}": [{"ext": ext, "url": f"{base}/caption/{item}?lang=l{lang}&fmt={ext}&" + "x" * 200}
+                                 for ext in ("json3", "srv1", "srv2", "srv3", "ttml", "vtt")]
+                    for lang in range(BENCH_CAPTION_LANGS)
+                },
+            }
+
+    class BenchYoutubeDL(YoutubeDL):
+
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            self.add_info_extractor(BenchIE())
+            self._ies = {"Bench": self._ies.pop("Bench"), **self._ies}
+
+    cli.load_yt_dlp = lambda: BenchYoutubeDL
+
+# ------------------------------------------------------------
+# 시나리오 실행 (자식 프로세스)
+# ------------------------------------------------------------
+
+def cpu_seconds():
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return own.ru_utime + own.ru_stime + children.ru_utime + children.ru_stime
+
+def dir_size(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            if not name.endswith((".part", ".ytdl")):
+                total += os.path.getsize(os.path.join(root, name))
+    return total
+
+def run_scenario(mode, kind, workers, jobs, size, port):
+    import youtube_downloader_cli as cli
+
+    work = tempfile.mkdtemp(prefix="ytdl-bench-")
+    output = os.path.join(work, "out")
+    os.makedirs(output)
+
+    # 캐시/보관 목록/저널은 임시 폴더 (이전 실행 결과로 건너뛰지 않도록 보관 목록/저널은 끔)
+    cli.info_cache = cli.InfoCache(os.path.join(work, "info_cache.sqlite3"))
+    cli.tuner.path = os.path.join(work, "tuning.json")
+    cli.failures.path = os.path.join(work, "failures.sqlite3")
+    cli.ARCHIVE_ENABLED = False
+    cli.JOURNAL_ENABLED = False
+    cli.ydl_base_opts["quiet"] = True
+    cli.ydl_base_opts["fixup"] = "never"
+    install_stub_extractor(cli)
+
+    # progress_hook 호출 횟수 / 소요 시간
+    hook = cli.progress_hook
+    hook_stats = {"calls": 0, "time": 0.0}
+    hook_lock = threading.Lock()
+
+    def timed_hook(d):
+        start = time.perf_counter()
+        try:
+            hook(d)
+        finally:
+            with hook_lock:
+                hook_stats["calls"] += 1
+                hook_stats["time"] += time.perf_counter() - start
+
+    cli.progress_hook = timed_hook
+
+    base = f"http://127.0.0.1:{port}"
+    urls = [f"{base}/watch/{kind}/{mode}-{i}?size={size}" for i in range(jobs)]
+
+    cpu_start = cpu_seconds()
+    start = time.perf_counter()
+
+    if mode == "video":
+        failed = sum(1 for url in urls if cli.download_video(url, output))
+    elif mode == "playlist":
+        failed = cli.download_playlist(f"{base}/playlist/{kind}/list-{jobs}?size={size}", output, workers=workers)
+    elif mode == "channel":
+        summary = cli.process_download_queue(iter([{"url": f"{base}/playlist/{kind}/list-{jobs}?size={size}"}]),
+                                             output, threads=workers)
+        failed = summary["failed"]
+    else:
+        summary = cli.process_download_queue(iter([{"url": url} for url in urls]), output, threads=workers)
+        failed = summary["failed"]
+
+    wall = time.perf_counter() - start
+    cpu = cpu_seconds() - cpu_start
+    nbytes = dir_size(output)
+    mb = nbytes / MIB
+
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    shutil.rmtree(work, ignore_errors=True)
+
+    return {
+        "mode": mode,
+        "kind": kind,
+        "workers": workers,
+        "jobs": jobs,
+        "failed": failed,
+        "bytes": nbytes,
+        "wall": round(wall, 3),
+        "jobs_per_sec": round(jobs / wall, 3) if wall else None,
+        "mb_per_sec": round(mb / wall, 2) if wall else None,
+        "cpu_sec": round(cpu, 3),
+        "cpu_per_mb": round(cpu / mb, 4) if mb else None,
+        "hook_calls": hook_stats["calls"],
+        "hook_time": round(hook_stats["time"], 4),
+        "hook_overhead": round(hook_stats["time"] / wall, 4) if wall else None,
+        "hook_us_per_call": round(hook_stats["time"] / hook_stats["calls"] * 1e6, 1) if hook_stats["calls"] else None,
+        # Linux ru_maxrss = KiB
+        "peak_rss_mb": round(own.ru_maxrss / 1024, 1),
+        "peak_child_rss_mb": round(children.ru_maxrss / 1024, 1),
+        "sessions": cli.sessions.summary(),
+    }
+
+# ------------------------------------------------------------
+# 시작 시간
+# ------------------------------------------------------------
+
+STARTUP_PROBE = (
+    "import time, json\n"
+    "start = time.perf_counter()\n"
+    "import youtube_downloader_cli as cli\n"
+    "imported = time.perf_counter()\n"
+    "cli.load_yt_dlp()\n"
+    "loaded = time.perf_counter()\n"
+    "print(json.dumps({'import_cli': imported - start, 'load_yt_dlp': loaded - imported}))\n"
+)
+
+def measure_startup(runs):
+    # venv 점검(ensure_venv)은 제외: 인터프리터 시작 + 모듈 import + yt_dlp 로드
+    process_times = []
+    probes = []
+
+    for _ in range(runs):
+        start = time.perf_counter()
+        proc = subprocess.run([sys.executable, "-c", STARTUP_PROBE], cwd=SCRIPT_DIR, capture_output=True, text=True)
+        process_times.append(time.perf_counter() - start)
+        if proc.returncode == 0:
+            probes.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+
+    return {
+        "runs": runs,
+        "process_sec": round(statistics.median(process_times), 4),
+        "import_cli_sec": round(statistics.median(p["import_cli"] for p in probes), 4) if probes else None,
+        "load_yt_dlp_sec": round(statistics.median(p["load_yt_dlp"] for p in probes), 4) if probes else None,
+    }
+
+# ------------------------------------------------------------
+# 전체 실행 / 비교
+# ------------------------------------------------------------
+
+def scenarios(args):
+    for mode in args.modes:
+        for kind in args.kinds:
+            # download_video 는 순차 실행 → 워커 수 무관
+            for workers in ((1,) if mode == "video" else args.workers):
+                yield mode, kind, workers
+
+def run_benchmark(args):
+    import yt_dlp.version
+
+    results = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "host": {
+            "platform": platform.platform(),
+            "python": platform.python_version(),
+            "cpu_count": os.cpu_count(),
+            "yt_dlp": yt_dlp.version.__version__,
+            "ffmpeg": shutil.which("ffmpeg") is not None,
+        },
+        "config": {"jobs": args.jobs, "size_mib": args.size, "segment_mib": BENCH_SEGMENT_MIB},
+        "startup": measure_startup(args.startup_runs) if args.startup_runs else None,
+        "runs": [],
+    }
+
+    with MediaServer() as server:
+        for mode, kind, workers in scenarios(args):
+            with tempfile.NamedTemporaryFile(suffix=".json", delete=False) as f:
+                result_path = f.name
+
+            cmd = [
+                sys.executable, os.path.abspath(__file__),
+                "--scenario", f"{mode},{kind},{workers}",
+                "--jobs", str(args.jobs), "--size", str(args.size),
+                "--port", str(server.port), "--result", result_path,
+            ]
+            output = None if args.verbose else subprocess.DEVNULL
+            try:
+                proc = subprocess.run(cmd, cwd=SCRIPT_DIR, stdout=output, stderr=output, timeout=BENCH_TIMEOUT)
+                with open(result_path, encoding="utf-8") as f:
+                    run = json.load(f) if proc.returncode == 0 else None
+            except (subprocess.TimeoutExpired, OSError, ValueError):
+                run = None
+            finally:
+                os.unlink(result_path)
+
+            if run is None:
+                run = {"mode": mode, "kind": kind, "workers": workers, "error": "시나리오 실행 실패"}
+                print(f"[ERROR] {mode}/{kind} workers={workers} 실패", file=sys.stderr)
+            else:
+                print(f"[INFO] {mode:8} {kind:11} workers={workers}: {run['jobs_per_sec']} jobs/s,"
+                      f" {run['mb_per_sec']} MB/s, CPU {run['cpu_per_mb']} s/MB,"
+                      f" hook {run['hook_us_per_call']} us/call, RSS {run['peak_rss_mb']} MB", file=sys.stderr)
+
+            results["runs"].append(run)
+
+    text = json.dumps(results, ensure_ascii=False, indent=2)
+    if args.output and args.output != "-":
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+        print(f"[INFO] 결과 저장: {args.output}", file=sys.stderr)
+    else:
+        print(text)
+
+    return 1 if any("error" in run or run.get("failed") for run in results["runs"]) else 0
+
+COMPARE_FIELDS = ("jobs_per_sec", "mb_per_sec", "cpu_per_mb", "hook_us_per_call", "peak_rss_mb")
+
+def compare_results(base_path, new_path):
+    with open(base_path, encoding="utf-8") as f:
+        base = json.load(f)
+    with open(new_path, encoding="utf-8") as f:
+        new = json.load(f)
+
+    def key(run):
+        return run["mode"], run["kind"], run["workers"]
+
+    base_runs = {key(run): run for run in base["runs"] if "error" not in run}
+
+    print(f"{'시나리오':<32}" + "".join(f"{field:>22}" for field in COMPARE_FIELDS))
+    for run in new["runs"]:
+        old = base_runs.get(key(run))
+        if old is None or "error" in run:
+            continue
+
+        cells = []
+        for field in COMPARE_FIELDS:
+            before, after = old.get(field), run.get(field)
+            if before and after is not None:
+                cells.append(f"{after:>12} ({(after - before) / before * 100:+6.1f}%)")
+            else:
+                cells.append(f"{after!s:>22}")
+        print(f"{'/'.join(map(str, key(run))):<32}" + "".join(f"{cell:>22}" for cell in cells))
+
+    for name in ("process_sec", "import_cli_sec", "load_yt_dlp_sec"):
+        before = (base.get("startup") or {}).get(name)
+        after = (new.get("startup") or {}).get(name)
+        if before and after:
+            print(f"{name:<32}{after:>12} ({(after - before) / before * 100:+6.1f}%)")
+
+    return 0
+
+def parse_args(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="youtube_downloader_cli 오프라인 벤치마크")
+    parser.add_argument("--modes", nargs="+", choices=BENCH_MODES, default=list(BENCH_MODES))
+    parser.add_argument("--kinds", nargs="+", choices=BENCH_KINDS, default=list(BENCH_KINDS),
+                        help="미디어 형식 (단일 파일 / DASH 조각 / HLS 조각)")
+    parser.add_argument("--workers", nargs="+", type=int, default=list(BENCH_WORKERS), help="동시 다운로드 수")
+    parser.add_argument("--jobs", type=int, default=BENCH_JOBS, help="시나리오별 영상 수")
+    parser.add_argument("--size", type=int, default=BENCH_SIZE_MIB, help="영상 1개 크기 (MiB)")
+    parser.add_argument("--startup-runs", type=int, default=BENCH_STARTUP_RUNS, help="시작 시간 측정 횟수 (0 = 생략)")
+    parser.add_argument("-o", "--output", default="-", help="결과 JSON 파일 ('-' = stdout)")
+    parser.add_argument("--compare", nargs=2, metavar=("BASE", "NEW"), help="두 결과 JSON 비교")
+    parser.add_argument("-v", "--verbose", action="store_true", help="시나리오 출력 표시")
+    # 내부용: 시나리오 하나를 실행하는 자식 프로세스
+    parser.add_argument("--scenario", help=argparse.SUPPRESS)
+    parser.add_argument("--port", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--result", help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    if args.compare:
+        return compare_results(*args.compare)
+
+    if args.scenario:
+        mode, kind, workers = args.scenario.split(",")
+        result = run_scenario(mode, kind, int(workers), args.jobs, args.size * MIB, args.port)
+        with open(args.result, "w", encoding="utf-8") as f:
+            json.dump(result, f)
+        return 0
+
+    return run_benchmark(args)
+
+if __name__ == "__main__":
+    sys.exit(main())
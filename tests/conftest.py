@@ -0,0 +1,19 @@
+import os
+import sys
+
+import pytest
+
+# 저장소 루트의 단일 스크립트를 모듈로 가져옴 (패키지 설치 없이)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import youtube_downloader_cli as cli
+
+
+@pytest.fixture
+def journal(tmp_path, monkeypatch):
+    # 임시 SQLite 저널 → 모듈 전역 journal 대체 (.state는 건드리지 않음)
+    j = cli.JobJournal(str(tmp_path / "jobs.sqlite3"))
+    monkeypatch.setattr(cli, "journal", j)
+    yield j
+    if j._conn is not None:
+        j._conn.close()
@@ -0,0 +1,206 @@
+import os
+
+import pytest
+
+import youtube_downloader_cli as cli
+
+# PostgreSQL 저장소도 확인하려면 테스트 전용 DB URL 지정 (jobs / nodes 테이블을 지우고 시작)
+#   YTDL_TEST_POSTGRES=postgresql://user@127.0.0.1/ytdl_test python3 -m pytest -q tests
+POSTGRES_URL = os.environ.get("YTDL_TEST_POSTGRES")
+
+
+def task(i, priority=None):
+    t = {"url": f"https://www.youtube.com/watch?v={i:011d}", "output": "/tmp/out"}
+    if priority:
+        t["priority"] = priority
+    return t
+
+
+@pytest.fixture(params=["sqlite", "postgres"])
+def store_path(request, tmp_path):
+    if request.param == "sqlite":
+        return str(tmp_path / "jobs.sqlite3")
+
+    if not POSTGRES_URL:
+        pytest.skip("YTDL_TEST_POSTGRES 미지정")
+    psycopg = pytest.importorskip("psycopg")
+    with psycopg.connect(POSTGRES_URL, autocommit=True) as conn:
+        conn.execute("DROP TABLE IF EXISTS jobs, nodes")
+    return POSTGRES_URL
+
+
+@pytest.fixture
+def nodes(store_path):
+    # 같은 저장소를 쓰는 두 노드
+    journals = []
+    for name in ("a", "b"):
+        j = cli.JobJournal(store_path)
+        j.node = name
+        j.join_cluster(name, f"host-{name}")
+        journals.append(j)
+    yield journals
+    for j in journals:
+        conn = j._conn.conn if isinstance(j._conn, cli.PostgresConnection) else j._conn
+        conn.close()
+
+
+def expire(j, seconds=cli.CLUSTER_LEASE * 2):
+    # 임대 만료 (노드 중단) 흉내
+    db = j._db()
+    db.execute("UPDATE jobs SET lease = lease - ? WHERE lease IS NOT NULL", (seconds,))
+    db.commit()
+
+
+def ids(jobs):
+    return [job["id"] for job in jobs]
+
+
+def test_claim_splits_jobs_between_nodes(nodes):
+    a, b = nodes
+    job_ids = [a.enqueue(task(i))[0] for i in range(4)]
+
+    assert ids(a.claim("a", 2)) == job_ids[:2]
+    assert ids(b.claim("b", 5)) == job_ids[2:]
+    assert a.claim("a", 5) == []
+
+
+def test_claim_follows_priority(nodes):
+    a, _ = nodes
+    low = a.enqueue(task(1, "low"))[0]
+    normal = a.enqueue(task(2))[0]
+    urgent = a.enqueue(task(3, "urgent"))[0]
+    assert ids(a.claim("a", 3)) == [urgent, normal, low]
+
+
+def test_claimed_job_is_recorded_only_by_owner(nodes):
+    a, b = nodes
+    job_id = a.enqueue(task(1))[0]
+    b.claim("b", 1)
+
+    assert a.update(job_id, "extracting") is False
+    assert b.update(job_id, "extracting") is True
+    assert b.get(job_id)["state"] == "extracting"
+
+
+def test_enqueue_does_not_rerun_leased_job(nodes):
+    a, b = nodes
+    job_id = a.enqueue(task(1))[0]
+    assert a.enqueue(task(1)) == (job_id, "queued", False)
+
+    b.claim("b", 1)
+    b.update(job_id, "downloading")
+    assert a.enqueue(task(1), resume=True) == (job_id, "downloading", False)
+
+    # 임대가 끝난 작업(멈춘 노드) → 다시 대기
+    expire(a)
+    assert a.enqueue(task(1)) == (job_id, "downloading", True)
+    assert a.get(job_id)["state"] == "queued"
+
+
+def test_steal_takes_half_of_busiest_node(nodes):
+    a, b = nodes
+    job_ids = [a.enqueue(task(i))[0] for i in range(5)]
+    a.claim("a", 5)
+
+    jobs, victim = b.steal("b", 10)
+    assert victim == "a"
+    assert ids(jobs) == job_ids[3:]
+
+    # 시작한 작업은 가져가지 않음
+    a.update(job_ids[0], "extracting")
+    a.update(job_ids[1], "extracting")
+    assert b.steal("b", 10) == ([], None)
+
+
+def test_expired_lease_is_reclaimed(nodes):
+    a, b = nodes
+    queued, running = a.enqueue(task(1))[0], a.enqueue(task(2))[0]
+    a.claim("a", 2)
+    a.update(running, "downloading")
+
+    assert b.claim("b", 5) == []
+    expire(a)
+
+    # 실행 중이던 작업은 처음부터 다시 (재시도 횟수 증가)
+    assert sorted(ids(b.claim("b", 5))) == [queued, running]
+    assert b.get(queued)["attempts"] == 1
+    assert (b.get(running)["state"], b.get(running)["attempts"]) == ("queued", 2)
+
+
+def test_expired_lease_fails_after_max_attempts(nodes):
+    a, b = nodes
+    job_id = a.enqueue(task(1))[0]
+    db = a._db()
+    db.execute("UPDATE jobs SET attempts = ? WHERE id = ?", (cli.JOURNAL_MAX_ATTEMPTS, job_id))
+    db.commit()
+
+    a.claim("a", 1)
+    a.update(job_id, "downloading")
+    expire(a)
+
+    assert b.claim("b", 5) == []
+    assert b.get(job_id)["state"] == "failed"
+
+
+def test_lease_uses_store_clock(nodes, monkeypatch):
+    a, b = nodes
+    a.enqueue(task(1))
+    a.claim("a", 1)
+
+    # 노드 시계가 어긋나도 (몇 시간 앞선 노드) 임대는 저장소 시계로 판단
+    now = cli.time.time()
+    monkeypatch.setattr(cli.time, "time", lambda: now + 3 * 3600)
+    assert b.claim("b", 5) == []
+
+
+def test_renew_reports_lost_and_finished_jobs(nodes):
+    a, b = nodes
+    first, second = a.enqueue(task(1))[0], a.enqueue(task(2))[0]
+    a.claim("a", 2)
+    a.update(first, "done")
+
+    expire(a)
+    assert ids(b.claim("b", 5)) == [second]
+    assert a.renew("a", [first, second]) == ([second], [first])
+
+
+def test_renew_extends_lease(nodes):
+    a, b = nodes
+    a.enqueue(task(1))
+    a.claim("a", 1)
+
+    expire(a)
+    a.renew("a", [])
+    assert b.claim("b", 5) == []
+
+
+def test_join_releases_previous_run_jobs(nodes):
+    a, b = nodes
+    job_ids = [a.enqueue(task(i))[0] for i in range(2)]
+    a.claim("a", 2)
+
+    # 같은 이름으로 다시 시작 → 임대를 기다리지 않고 바로 풀어 줌
+    assert a.join_cluster("a", "host-a") == 2
+    assert ids(b.claim("b", 5)) == job_ids
+
+
+def test_node_stats(nodes):
+    a, b = nodes
+    job_id = a.enqueue(task(1))[0]
+    a.claim("a", 1)
+    a.update(job_id, "done", nbytes=1 << 20)
+    b.leave_cluster("b")
+
+    stats = a.node_stats()
+    assert (stats["a"]["done"], stats["a"]["bytes"], stats["a"]["alive"]) == (1, 1 << 20, True)
+    assert (stats["b"]["done"], stats["b"]["alive"]) == (0, False)
+    assert a.live_hosts("host-a") == []
+    assert a.active() == 0
+
+
+def test_check_host_rejects_network_filesystem(journal, monkeypatch):
+    monkeypatch.setattr(cli, "filesystem_type", lambda path: "nfs4")
+    assert "postgresql://" in cli.ClusterNode().check_host()
+
+    monkeypatch.setattr(journal, "path", "postgresql://user@db.example/ytdl")
+    assert cli.ClusterNode().check_host() is None
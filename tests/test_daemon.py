@@ -0,0 +1,135 @@
+import http.client
+import json
+import threading
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+import youtube_downloader_cli as cli
+
+
+@pytest.fixture
+def daemon(journal, monkeypatch):
+    monkeypatch.setattr(cli, "cancelled_jobs", set())
+    submitted = []
+
+    def submit(tasks):
+        submitted.extend(tasks)
+        return [{"url": t["url"], "id": i} for i, t in enumerate(tasks)]
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), cli.make_daemon_handler(submit, lambda: {"ok": True}))
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True)
+    thread.start()
+
+    def request(method, path, body=None, headers=None):
+        conn = http.client.HTTPConnection("127.0.0.1", server.server_address[1], timeout=5)
+        try:
+            conn.putrequest(method, path)
+            for name, value in (headers or {}).items():
+                conn.putheader(name, value)
+            if body is not None and "Content-Length" not in (headers or {}):
+                conn.putheader("Content-Length", str(len(body)))
+            conn.endheaders(body)
+            response = conn.getresponse()
+            return response.status, json.loads(response.read() or b"null")
+        finally:
+            conn.close()
+
+    request.submitted = submitted
+    yield request
+
+    server.shutdown()
+    server.server_close()
+
+
+def post(daemon, body):
+    return daemon("POST", "/jobs", body if isinstance(body, bytes) else json.dumps(body).encode())
+
+
+def test_submit_single_url(daemon):
+    status, body = post(daemon, {"url": "https://youtu.be/x", "convert": "mp3"})
+    assert status == 202
+    assert body == {"jobs": [{"url": "https://youtu.be/x", "id": 0}]}
+    assert daemon.submitted == [{"url": "https://youtu.be/x", "convert": "mp3"}]
+
+
+def test_submit_url_list_shares_options(daemon):
+    status, _ = post(daemon, {"urls": ["https://youtu.be/a", "https://youtu.be/b"], "priority": "high"})
+    assert status == 202
+    assert daemon.submitted == [
+        {"url": "https://youtu.be/a", "priority": "high"},
+        {"url": "https://youtu.be/b", "priority": "high"},
+    ]
+
+
+@pytest.mark.parametrize("body", [
+    b"{not json",
+    b"[\"https://youtu.be/x\"]",
+    b"\"https://youtu.be/x\"",
+    b"{}",
+    b"",
+    json.dumps({"url": ""}).encode(),
+    json.dumps({"urls": []}).encode(),
+])
+def test_submit_rejects_bad_body(daemon, body):
+    status, response = post(daemon, body)
+    assert status == 400
+    assert "error" in response
+    assert daemon.submitted == []
+
+
+def test_submit_rejects_bad_content_length(daemon):
+    status, _ = daemon("POST", "/jobs", b"{}", {"Content-Length": "-1"})
+    assert status == 400
+    status, _ = daemon("POST", "/jobs", b"{}", {"Content-Length": "abc"})
+    assert status == 400
+
+
+def test_submit_rejects_large_body(daemon):
+    status, _ = daemon("POST", "/jobs", b"", {"Content-Length": str(cli.DAEMON_MAX_BODY + 1)})
+    assert status == 413
+    assert daemon.submitted == []
+
+
+def test_health(daemon):
+    assert daemon("GET", "/health") == (200, {"ok": True})
+
+
+def test_list_jobs_limit(daemon, journal):
+    for i in range(3):
+        journal.enqueue({"url": f"https://youtu.be/{i}"})
+
+    status, body = daemon("GET", "/jobs?limit=2")
+    assert status == 200 and len(body["jobs"]) == 2
+    assert daemon("GET", "/jobs?state=done")[1] == {"jobs": []}
+
+    for limit in ("abc", "-1", "1.5"):
+        assert daemon("GET", f"/jobs?limit={limit}")[0] == 400
+
+
+def test_get_and_cancel_job(daemon, journal):
+    job_id, _, _ = journal.enqueue({"url": "https://youtu.be/x"})
+
+    status, job = daemon("GET", f"/jobs/{job_id}")
+    assert status == 200 and job["state"] == "queued"
+
+    status, job = daemon("DELETE", f"/jobs/{job_id}")
+    assert status == 202 and job["state"] == "cancelled"
+    assert job_id in cli.cancelled_jobs
+
+    # 이미 끝난 작업은 취소 불가
+    assert daemon("DELETE", f"/jobs/{job_id}")[0] == 409
+
+
+@pytest.mark.parametrize("method, path", [
+    ("GET", "/jobs/999"),
+    ("GET", "/jobs/abc"),
+    ("GET", "/nope"),
+    ("POST", "/jobs/1"),
+    ("DELETE", "/jobs/999"),
+    ("DELETE", "/jobs/abc"),
+    ("DELETE", "/jobs"),
+])
+def test_not_found(daemon, method, path):
+    assert daemon(method, path, b"{}" if method == "POST" else None)[0] == 404
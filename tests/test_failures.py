@@ -0,0 +1,126 @@
+import pytest
+
+import youtube_downloader_cli as cli
+
+
+@pytest.mark.parametrize("message, kind", [
+    ("ERROR: [youtube] x: HTTP Error 429: Too Many Requests", "throttle"),
+    ("Sign in to confirm you're not a bot", "throttle"),
+    ("ERROR: [youtube] x: Join this channel to get access to members-only content", "auth"),
+    ("ERROR: [youtube] x: Private video. Sign in if you've been granted access", "auth"),
+    ("Sign in to confirm your age. This video may be inappropriate for some users.", "auth"),
+    ("ERROR: [youtube] x: Video unavailable. This video has been removed by the uploader", "unavailable"),
+    ("This video is not available in your country", "unavailable"),
+    ("Video unavailable. The uploader has blocked it in your country", "unavailable"),
+    ("ERROR: Unsupported URL: https://example.com/", "unavailable"),
+    ("ERROR: unable to download video data: HTTP Error 403: Forbidden", "transient"),
+    ("HTTP Error 503: Service Unavailable", "transient"),
+    ("<urlopen error [Errno -3] Temporary failure in name resolution>", "transient"),
+    ("Read timed out.", "transient"),
+    ("Postprocessing: Conversion failed!", "unknown"),
+    ("", "unknown"),
+    (None, "unknown"),
+])
+def test_classify_failure(message, kind):
+    assert cli.classify_failure(message) == kind
+
+
+def test_classify_not_found_by_stage():
+    message = "ERROR: Unable to download webpage: HTTP Error 404: Not Found"
+    # 추출 중 404 = 없는 영상 / 다운로드 중 404 = 서명 URL 만료 → 다시 추출
+    assert cli.classify_failure(message, "extract") == "unavailable"
+    assert cli.classify_failure(message, "download") == "transient"
+
+
+def test_permanent_kinds_are_not_retried():
+    for kind in cli.FAILURE_PERMANENT:
+        assert kind not in cli.RETRY_POLICIES
+
+
+@pytest.mark.parametrize("kind", sorted(cli.RETRY_POLICIES))
+def test_backoff_delay_is_bounded(kind):
+    _, base, cap = cli.RETRY_POLICIES[kind]
+    for attempt in range(1, 12):
+        delay = min(cap, base * 2 ** (attempt - 1))
+        assert delay / 2 <= cli.backoff_delay(kind, attempt) <= delay
+
+
+@pytest.mark.parametrize("url, host", [
+    ("https://www.youtube.com/watch?v=x", "youtube.com"),
+    ("https://m.youtube.com/watch?v=x", "youtube.com"),
+    ("https://youtu.be/x", "youtube.com"),
+    ("https://rr3---sn-abc.googlevideo.com/videoplayback", "youtube.com"),
+    ("https://vimeo.com/1", "vimeo.com"),
+    ("http://127.0.0.1:8765/a.mp4", "127.0.0.1"),
+])
+def test_host_key(url, host):
+    assert cli.host_key(url) == host
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cli.time, "monotonic", lambda: now[0])
+    return now
+
+
+URL = "https://www.youtube.com/watch?v=x"
+
+
+def test_breaker_opens_for_whole_host(clock):
+    breaker = cli.CircuitBreaker()
+    assert not breaker.paused(URL)
+
+    breaker.trip(URL)
+    assert breaker.paused(URL)
+    assert breaker.paused("https://youtu.be/y")
+    assert not breaker.paused("https://vimeo.com/1")
+
+    clock[0] += cli.BREAKER_COOLDOWN - 1
+    assert breaker.paused(URL)
+    clock[0] += 1
+    assert not breaker.paused(URL)
+
+
+def test_breaker_does_not_extend_while_open(clock):
+    breaker = cli.CircuitBreaker()
+    breaker.trip(URL)
+    until = breaker.hosts["youtube.com"]["until"]
+
+    clock[0] += 10
+    breaker.trip(URL)
+    assert breaker.hosts["youtube.com"] == {"until": until, "trips": 1}
+    assert breaker.trips == 1
+
+
+def test_breaker_half_open_failure_doubles_cooldown(clock):
+    breaker = cli.CircuitBreaker()
+    breaker.trip(URL)
+    clock[0] += cli.BREAKER_COOLDOWN
+
+    # 중지가 끝난 뒤 첫 작업이 다시 제한에 걸림 → 2배
+    breaker.trip(URL)
+    assert breaker.hosts["youtube.com"]["until"] == clock[0] + cli.BREAKER_COOLDOWN * 2
+
+    # 최대 중지 시간을 넘지 않음
+    for _ in range(10):
+        clock[0] = breaker.hosts["youtube.com"]["until"]
+        breaker.trip(URL)
+    assert breaker.hosts["youtube.com"]["until"] == clock[0] + cli.BREAKER_MAX_COOLDOWN
+
+
+def test_breaker_half_open_success_closes(clock):
+    breaker = cli.CircuitBreaker()
+    breaker.trip(URL)
+
+    # 중지 중에 끝난 작업(제한 전에 시작)은 닫지 않음
+    breaker.success(URL)
+    assert breaker.hosts["youtube.com"]["trips"] == 1
+
+    clock[0] += cli.BREAKER_COOLDOWN
+    breaker.success(URL)
+    assert breaker.hosts["youtube.com"]["trips"] == 0
+
+    # 닫힌 뒤 다시 제한 → 처음 중지 시간부터
+    breaker.trip(URL)
+    assert breaker.hosts["youtube.com"]["until"] == clock[0] + cli.BREAKER_COOLDOWN
@@ -0,0 +1,139 @@
+import youtube_downloader_cli as cli
+
+TASK = {"url": "https://www.youtube.com/watch?v=aaaaaaaaaaa", "output": "/tmp/out", "convert": "mp3"}
+
+
+def state(journal, job_id):
+    return journal.get(job_id)["state"]
+
+
+def test_job_key_ignores_extra_fields():
+    extra = {**TASK, "priority": "high", "source": "x", "sync": "y", "job_id": 3, "resumed": True}
+    assert cli.job_key(extra) == cli.job_key(TASK)
+
+
+def test_job_key_depends_on_task_fields():
+    assert cli.job_key({**TASK, "convert": "mp4"}) != cli.job_key(TASK)
+    assert cli.job_key({**TASK, "output": "/tmp/other"}) != cli.job_key(TASK)
+
+
+def test_enqueue_new_job(journal):
+    job_id, previous, runnable = journal.enqueue(TASK)
+    assert (previous, runnable) == (None, True)
+
+    job = journal.get(job_id)
+    assert job["state"] == "queued"
+    assert job["attempts"] == 1
+    assert job["task"]["convert"] == "mp3"
+
+
+def test_enqueue_keeps_extra_fields_but_not_markers(journal):
+    job_id, _, _ = journal.enqueue({**TASK, "priority": "high", "sync": "https://example.com/list", "resumed": True})
+    task = journal.get(job_id)["task"]
+    assert task["priority"] == "high"
+    assert task["sync"] == "https://example.com/list"
+    assert "resumed" not in task
+
+
+def test_enqueue_duplicate_active_job_is_not_rerun(journal):
+    job_id, _, _ = journal.enqueue(TASK)
+    for active in cli.JOB_ACTIVE_STATES:
+        journal.update(job_id, active)
+        assert journal.enqueue(TASK) == (job_id, active, False)
+    assert journal.get(job_id)["attempts"] == 1
+
+
+def test_enqueue_resume_requeues_active_job(journal):
+    job_id, _, _ = journal.enqueue(TASK)
+    journal.update(job_id, "downloading")
+
+    assert journal.enqueue(TASK, resume=True) == (job_id, "downloading", True)
+    job = journal.get(job_id)
+    assert (job["state"], job["attempts"]) == ("queued", 2)
+
+
+def test_enqueue_skips_done_job(journal):
+    job_id, _, _ = journal.enqueue(TASK)
+    journal.update(job_id, "done", path="/tmp/out/a.mp3")
+    assert journal.enqueue(TASK) == (job_id, "done", False)
+    assert journal.enqueue(TASK, resume=True) == (job_id, "done", False)
+
+
+def test_enqueue_retries_failed_job_until_max_attempts(journal):
+    job_id, _, _ = journal.enqueue(TASK)
+    for attempt in range(2, cli.JOURNAL_MAX_ATTEMPTS + 1):
+        journal.update(job_id, "failed", error="HTTP Error 503")
+        assert journal.enqueue(TASK) == (job_id, "failed", True)
+        job = journal.get(job_id)
+        assert (job["state"], job["attempts"], job["error"]) == ("queued", attempt, None)
+
+    journal.update(job_id, "failed", error="HTTP Error 503")
+    assert journal.enqueue(TASK) == (job_id, "failed", False)
+    assert state(journal, job_id) == "failed"
+
+
+def test_enqueue_reruns_cancelled_job(journal):
+    job_id, _, _ = journal.enqueue(TASK)
+    journal.update(job_id, "cancelled")
+    assert journal.enqueue(TASK) == (job_id, "cancelled", True)
+    assert state(journal, job_id) == "queued"
+
+
+def test_expanded_playlist_done_when_all_children_done(journal):
+    playlist = {**TASK, "url": "https://www.youtube.com/playlist?list=PL1"}
+    parent_id, _, _ = journal.enqueue(playlist)
+    journal.update(parent_id, "expanded")
+    child_ids = [journal.enqueue({**TASK, "url": f"https://youtu.be/{i:011d}"}, parent=parent_id)[0] for i in range(2)]
+
+    # 끝나지 않은 항목이 있으면 다시 펼침
+    journal.update(child_ids[0], "done")
+    assert journal.enqueue(playlist) == (parent_id, "expanded", True)
+
+    journal.update(parent_id, "expanded")
+    journal.update(child_ids[1], "done")
+    assert journal.enqueue(playlist) == (parent_id, "done", False)
+    assert state(journal, parent_id) == "done"
+
+
+def test_pending_returns_unfinished_top_level_jobs(journal):
+    first, _, _ = journal.enqueue(TASK)
+    second, _, _ = journal.enqueue({**TASK, "url": "https://youtu.be/bbbbbbbbbbb"})
+    journal.enqueue({**TASK, "url": "https://youtu.be/ccccccccccc"}, parent=second)
+    journal.update(first, "done")
+    journal.update(second, "expanded")
+
+    pending = journal.pending()
+    assert [t["url"] for t in pending] == ["https://youtu.be/bbbbbbbbbbb"]
+    assert pending[0]["resumed"] is True
+
+    # 이어서 실행 → 대기 상태로 남은 작업도 다시 실행
+    assert journal.enqueue(pending[0], resume=pending[0]["resumed"])[2] is True
+
+
+def test_update_without_job_id_is_noop(journal):
+    assert journal.update(None, "done") is True
+    assert journal.counts() == {}
+
+
+def test_counts(journal):
+    job_id, _, _ = journal.enqueue(TASK)
+    journal.enqueue({**TASK, "url": "https://youtu.be/bbbbbbbbbbb"})
+    journal.update(job_id, "done")
+    assert journal.counts() == {"done": 1, "queued": 1}
+
+
+def test_admit_task_keeps_pending_cancel(journal, monkeypatch):
+    monkeypatch.setattr(cli, "cancelled_jobs", set())
+    task, previous, runnable = cli.admit_task(TASK, "/tmp/out")
+    assert (previous, runnable) == (None, True)
+
+    # 취소 후 아직 파이프라인에서 빠지기 전에 같은 작업을 다시 넣음 → 취소 유지
+    job_id = task["job_id"]
+    assert cli.cancel_job(job_id)[0] == 202
+    assert cli.admit_task(TASK, "/tmp/out")[1:] == ("cancelled", False)
+    assert state(journal, job_id) == "cancelled"
+    assert job_id in cli.cancelled_jobs
+
+    # 빠진 뒤에는 다시 실행
+    cli.cancelled_jobs.discard(job_id)
+    assert cli.admit_task(TASK, "/tmp/out")[1:] == ("cancelled", True)
@@ -0,0 +1,114 @@
+import threading
+import time
+
+import youtube_downloader_cli as cli
+
+
+def job(name, source=None, priority=None, deadline=None, channel=None):
+    j = {"url": f"https://www.youtube.com/watch?v={name}", "name": name}
+    if source:
+        j["source"] = source
+    if priority:
+        j["priority"] = priority
+    if deadline:
+        j["deadline"] = deadline
+    if channel:
+        j["info"] = {"channel_id": channel}
+    return j
+
+
+def drain(sched):
+    sched.put(None)
+    names = []
+    while True:
+        j = sched.get()
+        if j is None:
+            return names
+        names.append(j["name"])
+
+
+def test_priority_classes_in_order():
+    sched = cli.JobScheduler()
+    for name, priority in (("n1", None), ("l1", "low"), ("h1", "high"), ("u1", "urgent"), ("n2", "normal")):
+        sched.put(job(name, priority=priority))
+    assert drain(sched) == ["u1", "h1", "n1", "n2", "l1"]
+
+
+def test_sources_share_a_class_round_robin():
+    sched = cli.JobScheduler()
+    # 큰 플레이리스트 하나가 먼저 들어와도 다른 출처의 작업이 뒤로 밀리지 않음
+    for i in range(4):
+        sched.put(job(f"a{i}", source="playlist-a"))
+    sched.put(job("b0", source="playlist-b"))
+    sched.put(job("b1", source="playlist-b"))
+    sched.put(job("c0"))
+    assert drain(sched) == ["a0", "b0", "c0", "a1", "b1", "a2", "a3"]
+
+
+def test_near_deadline_goes_first():
+    now = time.time()
+    sched = cli.JobScheduler()
+    sched.put(job("u1", priority="urgent"))
+    sched.put(job("far", priority="low", deadline=now + cli.SCHED_DEADLINE_WINDOW * 10))
+    sched.put(job("late", priority="low", deadline=now + 60))
+    sched.put(job("soon", priority="low", deadline=now + 30))
+    assert drain(sched) == ["soon", "late", "u1", "far"]
+
+
+def test_missed_deadline_is_counted():
+    sched = cli.JobScheduler()
+    sched.put(job("missed", deadline=time.time() - 1))
+    sched.put(job("n1"))
+    assert drain(sched) == ["missed", "n1"]
+    assert sched.stats[cli.SCHED_PRIORITIES.index("normal")]["missed"] == 1
+
+
+def test_close_waits_for_queued_jobs():
+    sched = cli.JobScheduler()
+    sched.put(job("n1"))
+    sched.put(None)
+    assert sched.get()["name"] == "n1"
+    assert sched.get() is None
+    assert sched.qsize() == 0
+
+
+def test_channel_limit_parks_until_release():
+    sched = cli.JobScheduler(channel_limit=1)
+    a1, a2, b1 = job("a1", channel="A"), job("a2", channel="A"), job("b1", channel="B")
+    for j in (a1, a2, b1):
+        sched.put(j)
+
+    assert sched.get() is a1
+    # 같은 채널이 한도만큼 실행 중 → 다른 채널 작업 먼저
+    assert sched.get() is b1
+
+    sched.put(None)
+    got = []
+    getter = threading.Thread(target=lambda: got.extend([sched.get(), sched.get()]))
+    getter.start()
+    getter.join(0.2)
+    assert getter.is_alive() and not got
+
+    sched.release(a1)
+    getter.join(2)
+    assert got == [a2, None]
+
+
+def test_maxsize_blocks_except_urgent():
+    sched = cli.JobScheduler(maxsize=1)
+    sched.put(job("n1"))
+    sched.put(job("u1", priority="urgent"))     # 가득 차도 바로 들어감
+
+    putter = threading.Thread(target=sched.put, args=(job("n2"),))
+    putter.start()
+    putter.join(0.2)
+    assert putter.is_alive()
+
+    assert sched.get()["name"] == "u1"
+    putter.join(0.2)
+    assert putter.is_alive()
+
+    assert sched.get()["name"] == "n1"
+    putter.join(2)
+    assert not putter.is_alive()
+    assert drain(sched) == ["n2"]
@@ -0,0 +1,86 @@
+import pytest
+
+import youtube_downloader_cli as cli
+
+URL = "https://www.youtube.com/playlist?list=PL1"
+META = {"playlist_id": "PL1", "playlist_title": "list"}
+
+
+def entries(*ids):
+    return [(vid, f"https://www.youtube.com/watch?v={vid}", vid.upper()) for vid in ids]
+
+
+@pytest.fixture
+def sync(tmp_path):
+    s = cli.PlaylistSync(str(tmp_path / "sync.sqlite3"))
+    yield s
+    if s._conn is not None:
+        s._conn.close()
+
+
+def test_first_sync_records_all_entries(sync):
+    assert sync.state(URL) is None
+
+    new = sync.record(URL, META, entries("a", "b", "c"), True, False)
+    assert new == entries("a", "b", "c")
+
+    state = sync.state(URL)
+    assert (state["id"], state["title"], state["entry_count"]) == ("PL1", "list", 3)
+    assert state["newest_first"] == 0
+    assert state["last_full"] is not None
+    assert sync.known(URL) == {"a", "b", "c"}
+
+
+def test_new_entries_in_front_mark_newest_first(sync):
+    sync.record(URL, META, entries("a", "b"), True, False)
+    new = sync.record(URL, META, entries("d", "c", "a", "b"), True, False)
+    assert new == entries("d", "c")
+    assert sync.state(URL)["newest_first"] == 1
+
+
+def test_new_entries_at_end_mark_oldest_first(sync):
+    sync.record(URL, META, entries("a", "b"), True, True)
+    new = sync.record(URL, META, entries("a", "b", "c"), True, True)
+    assert new == entries("c")
+    assert sync.state(URL)["newest_first"] == 0
+
+
+def test_mixed_or_no_new_entries_keep_given_order(sync):
+    sync.record(URL, META, entries("b", "c"), True, False)
+
+    # 앞뒤 모두 새 항목 → 판단하지 않음
+    sync.record(URL, META, entries("a", "b", "c", "d"), True, True)
+    assert sync.state(URL)["newest_first"] == 1
+
+    # 새 항목 없음
+    assert sync.record(URL, META, entries("a", "b", "c", "d"), True, False) == []
+    assert sync.state(URL)["newest_first"] == 0
+
+
+def test_partial_listing_does_not_infer(sync):
+    sync.record(URL, META, entries("a", "b"), True, True)
+    new = sync.record(URL, META, entries("z", "a"), False, True)
+    assert new == entries("z")
+
+    state = sync.state(URL)
+    assert state["newest_first"] == 1
+    assert state["entry_count"] == 3
+
+
+def test_pending_follows_listing_order_until_done(sync):
+    sync.record(URL, META, entries("a", "b"), True, True)
+    sync.record(URL, META, entries("y", "z"), False, True)
+    assert [vid for vid, _, _ in sync.pending(URL)] == ["y", "z", "a", "b"]
+
+    sync.mark_done(URL, "y")
+    sync.mark_done(URL, "a")
+    assert [vid for vid, _, _ in sync.pending(URL)] == ["z", "b"]
+
+
+def test_removed_entries_lose_position(sync):
+    sync.record(URL, META, entries("a", "b", "c"), True, False)
+    sync.record(URL, META, entries("a", "c"), True, False)
+
+    assert sync.state(URL)["entry_count"] == 2
+    # 목록에서 빠진 항목은 맨 뒤
+    assert [vid for vid, _, _ in sync.pending(URL)] == ["a", "c", "b"]
@@ -1,20 +1,37 @@
 #!/usr/bin/env python3
 import os
+import re
+import atexit
 import sys
+import json
+import time
+import zlib
+import errno
+import heapq
 import queue
+import collections
+import contextlib
+import random
+import sqlite3
+import hashlib
+import itertools
 import threading
 import platform
 import shutil
 import subprocess
+import urllib.parse
 
+# 실행 시점 (launch → 첫 프롬프트 시간 측정용)
+_LAUNCH_TIME = time.perf_counter()
 
 VENV_DIR = os.path.join(os.path.dirname(__file__), "venv")
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache")
+STATE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".state")
 
 # ------------------------------------------------------------
 # venv 확인
 # ------------------------------------------------------------
 def is_venv():
-    ensure_ffmpeg()
     return sys.prefix != sys.base_prefix
 
 def get_venv_python():
@@ -83,6 +100,75 @@ def ensure_venv():
     print("[INFO] 환경 구성 완료. 재실행합니다.\n")
     os.execv(venv_python, [venv_python] + sys.argv)
 
+# ------------------------------------------------------------
+# 환경 점검 stamp (빠른 시작)
+# ------------------------------------------------------------
+# 매 실행마다 pip/ffmpeg 점검을 하지 않고, 마지막 점검 결과를 stamp 파일에 기록
+# - stamp가 유효하고 점검 주기 이내면 pip 호출 없이 바로 시작
+# - yt-dlp 버전 변경, python 변경, ffmpeg 삭제 시 stamp 무효
+ENV_STAMP_PATH = os.path.join(CACHE_DIR, "env_stamp.json")
+ENV_CHECK_INTERVAL = int(os.environ.get("YTDL_ENV_CHECK_INTERVAL", 24 * 3600))
+UPDATE_TIMEOUT = 60
+
+def get_installed_version(dist_name):
+    try:
+        from importlib.metadata import version
+        return version(dist_name)
+    except Exception:
+        return None
+
+def load_env_stamp():
+    try:
+        with open(ENV_STAMP_PATH, encoding="utf-8") as f:
+            return json.load(f)
+    except Exception:
+        return None
+
+def save_env_stamp(stamp):
+    try:
+        os.makedirs(os.path.dirname(ENV_STAMP_PATH), exist_ok=True)
+        tmp_path = ENV_STAMP_PATH + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(stamp, f, indent=2)
+        os.replace(tmp_path, ENV_STAMP_PATH)
+    except Exception as e:
+        print(f"[WARN] 환경 stamp 저장 실패: {e}")
+
+def is_env_stamp_valid(stamp):
+    if not stamp:
+        return False
+
+    if stamp.get("python") != sys.executable:
+        return False
+
+    if stamp.get("yt_dlp_version") != get_installed_version("yt-dlp"):
+        return False
+
+    ffmpeg = stamp.get("ffmpeg")
+    if ffmpeg and not os.path.exists(ffmpeg):
+        return False
+
+    return time.time() - stamp.get("last_update_check", 0) < ENV_CHECK_INTERVAL
+
+def check_environment():
+    # 1. 설치 보장
+    ensure_python_package("yt-dlp", "yt_dlp")
+
+    # 2. 선택적 업데이트 (오프라인이면 timeout 후 통과)
+    update_package("yt-dlp")
+
+    # 3. ffmpeg (OS 패키지 : 필요 시 수동 업데이트)
+    ensure_ffmpeg()
+
+    stamp = {
+        "python": sys.executable,
+        "yt_dlp_version": get_installed_version("yt-dlp"),
+        "ffmpeg": shutil.which("ffmpeg"),
+        "last_update_check": time.time(),
+    }
+    save_env_stamp(stamp)
+    return stamp
+
 # ------------------------------------------------------------
 # 패키지 설치
 # ------------------------------------------------------------
@@ -124,9 +210,12 @@ def ensure_python_package(package_name, import_name=None):
 def update_package(package_name):
     try:
         subprocess.check_call(
-            [sys.executable, "-m", "pip", "install", "-U", package_name],
+            [sys.executable, "-m", "pip", "install", "-U",
+             "--disable-pip-version-check", "--retries", "1", "--timeout", "10",
+             package_name],
             stdout=subprocess.DEVNULL,
-            stderr=subprocess.DEVNULL
+            stderr=subprocess.DEVNULL,
+            timeout=UPDATE_TIMEOUT
         )
     except:
         pass
@@ -192,11 +281,16 @@ FFMPEG_PATH = detect_ffmpeg_path()
 # 최신 component 사용
 # SSL 검증 우회
 # 로그 최소화
+def ydl_retry_sleep(n):
+    # yt-dlp 내부 재시도(http/조각) 간격: 1, 2, 4, 8초 (+지터) - 긴 대기는 재시도 큐에서
+    return min(8, 2 ** n) * random.uniform(0.5, 1)
+
 ydl_base_opts = {
     "ignoreerrors": True,               # 오류발생 시 계속 진행(맴버십 전용, 삭제, 지역 제한, 접근 권한 부족, 네워크 일시 오류등이 발생해도 스킵하고 다음 영상으로 진행)
     "continue_dl": True,                # 일부 분할 다운로드된 파일이 있을 경우, 해당 파일을 이어받기 위한 옵션
     "retries": 3,                       # 네트워크 오류(http 오류, 연결 timeout등)발생 시 전체 요청을 재시도하는 횟수 지정
     "fragment_retries": 3,              # HLS/MPEG-DASH와 같은 분할 다운로드(조각 단위 다운로드) 중 개별 조각 다운로드가 실패하면 해당 조각을 몇 번까지 재시도할지를 지정
+    "retry_sleep_functions": {"http": ydl_retry_sleep, "fragment": ydl_retry_sleep},  # 재시도 사이 대기 (바로 연달아 재시도하지 않음)
     "quiet": False,                     # 로그 최소화
     "no_warnings": True,                # 경고 제거
     "ffmpeg_location": FFMPEG_PATH,     # ffmpeg/ffprobe가 단일 경로 또는 디렉토리여도 정상 인식(존재하면 직접 사용, 미존재시 PATH에서 찾음)
@@ -204,9 +298,341 @@ ydl_base_opts = {
     "nocheckcertificate": True,         # SSL 검증 비활성화
     "remote_components": "ejs:github",  # 최신 extractor component를 GitHub에서 가져오도록 지정
     "merge_output_format": "mp4",       # ffmpeg 병합의 명시적 포맷 지정
+    "noprogress": True,                 # yt-dlp 자체 진행률 출력 대신 progress_hook 렌더러 사용
     #"cookiefile": "cookies.txt",       # 실제 멤버십 계정이 있고, 해당 콘텐츠 접근 권한이 있는 경우에만
 }
 
+# ------------------------------------------------------------
+# yt_dlp 지연 import
+# ------------------------------------------------------------
+# yt_dlp import는 수백 ms가 걸리므로 실제로 필요할 때 로드
+YoutubeDL = None
+
+def load_yt_dlp():
+    global YoutubeDL
+
+    if YoutubeDL is None:
+        from yt_dlp import YoutubeDL as _YoutubeDL
+        YoutubeDL = _YoutubeDL
+
+    return YoutubeDL
+
+class YdlLogger:
+    # yt-dlp 출력을 그대로 전달하면서 작업별 재시도/오류 메시지를 집계
+
+    def __init__(self, quiet=False, no_warnings=False):
+        self.quiet = quiet
+        self.no_warnings = no_warnings
+        self.retries = 0
+        self.errors = []
+
+    def debug(self, msg):
+        if "Retrying" in msg:
+            self.retries += 1
+        if self.quiet or msg.startswith("[debug] "):
+            return
+        print(msg)
+
+    info = debug
+
+    def warning(self, msg):
+        if "Retrying" in msg:
+            self.retries += 1
+        if not self.no_warnings:
+            print(f"WARNING: {msg}", file=sys.stderr)
+
+    def error(self, msg):
+        self.errors = self.errors[-4:] + [msg]
+        print(msg, file=sys.stderr)
+
+def create_ydl(opts):
+    logger = opts.get("logger") or YdlLogger(opts.get("quiet"), opts.get("no_warnings"))
+    opts = {**opts, "logger": logger}
+
+    # 대역폭 제한 사용 시 블록 크기 고정 (큰 블록 단위로 몰아서 받지 않도록)
+    if bandwidth.configured():
+        opts.setdefault("buffersize", BANDWIDTH_BLOCK_SIZE)
+        opts.setdefault("noresizebuffer", True)
+
+    ydl = load_yt_dlp()(opts)
+    install_ydl_hooks(ydl, logger)
+    tuner.attach(ydl)
+    return ydl
+
+def install_ydl_hooks(ydl, logger):
+    # 대역폭 분배 항목은 인스턴스별 → 작업이 끝나면(오류 / 취소 포함) bandwidth.release(ydl)로 제거
+    ydl.add_progress_hook(lambda d, owner=id(ydl): bandwidth.throttle(d, owner))
+
+    if metrics.enabled:
+        ydl.add_progress_hook(lambda d: metrics.on_progress(d, logger))
+        ydl.add_postprocessor_hook(lambda d: metrics.on_postprocess(d, logger))
+
+# ------------------------------------------------------------
+# YoutubeDL 세션 재사용
+# ------------------------------------------------------------
+# 작업마다 YoutubeDL을 새로 만들면 연결(TLS), 쿠키, 추출기 인스턴스(플레이어 JS 캐시 등)를
+# 매번 다시 준비해야 함. 세션 관련 옵션이 같은 작업끼리 인스턴스를 재사용하고,
+# 작업별 옵션(출력 경로/포맷/후처리/훅)만 체크아웃할 때 갈아끼움.
+SESSION_REUSE = os.environ.get("YTDL_SESSION_REUSE", "1") != "0"
+SESSION_FORCE = os.environ.get("YTDL_SESSION_REUSE") == "force"
+# 작업별 옵션 교체를 확인한 yt-dlp 버전 범위 (양 끝 포함)
+# 내부 속성은 이름이 그대로여도 의미가 바뀔 수 있음 → 범위 밖 버전이면 시작할 때 재사용을 끔
+# (YTDL_SESSION_REUSE=force 로 강제). 새 버전을 확인하면 위쪽 끝을 올림
+SESSION_TESTED_VERSIONS = ("2024.08.06", "2026.08.19")
+SESSION_JOB_OPTS = (
+    "outtmpl", "format", "postprocessors", "progress_hooks", "postprocessor_hooks", "logger",
+    "extract_flat", "continuedl", "noplaylist", "playlist_items", "skip_download",
+)
+SESSION_MAX_IDLE = 8        # 옵션 조합별 보관할 유휴 인스턴스 수
+SESSION_MAX_USES = 500      # 이 횟수만큼 쓰면 새로 생성 (쿠키/캐시 누적 방지)
+# 작업별 옵션을 갈아끼울 때 건드리는 YoutubeDL 내부 속성 (공개 API가 아님)
+# → 강제로 켠 경우에도 하나라도 없으면 재사용을 끄고 작업마다 새 인스턴스
+SESSION_REQUIRED_ATTRS = (
+    "params", "format_selector", "build_format_selector", "_parse_outtmpl", "_pps",
+    "_progress_hooks", "_postprocessor_hooks", "_download_retcode", "_num_downloads",
+    "_playlist_level", "_playlist_urls", "add_post_processor", "add_progress_hook", "add_postprocessor_hook",
+)
+
+def parse_version(text):
+    # "2026.08.19" / "2026.8.19" / "2026.08.19.232130.dev0" → (2026, 8, 19)
+    return tuple(int(part) for part in re.findall(r"\d+", text or "")[:3])
+
+def count_connections(ydl):
+    # requests 핸들러(urllib3 풀)만 연결 수 집계 가능 → None이면 요청마다 새 연결 (urllib)
+    # 핸들러의 세션 목록은 비공개 속성 (SESSION_TESTED_VERSIONS 범위에서 확인) → 없으면 집계 안 함
+    if "_request_director" not in ydl.__dict__:
+        return 0
+
+    handler = ydl._request_director.handlers.get("Requests")
+    if handler is None:
+        return None
+
+    total = 0
+    try:
+        for _, session in getattr(handler, "_InstanceStoreMixin__instances", []):
+            for adapter in session.adapters.values():
+                pools = adapter.poolmanager.pools
+                for key in list(pools.keys()):
+                    total += getattr(pools.get(key), "num_connections", 0)
+    except Exception:
+        return None
+    return total
+
+class YdlSessionPool:
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.enabled = SESSION_REUSE
+        self.idle = {}      # 옵션 서명 → [YoutubeDL]
+        self.stats = {
+            "created": 0, "reused": 0, "requests": 0, "connections": 0,
+            "init_time": 0.0, "cold_time": 0.0, "cold_jobs": 0, "warm_time": 0.0, "warm_jobs": 0,
+        }
+
+    def check_version(self):
+        # 시작 시 확인: 설치된 yt-dlp가 확인한 범위 밖이면 재사용 끔 (반환: 재사용 여부)
+        if not self.enabled or SESSION_FORCE:
+            return self.enabled
+
+        installed = get_installed_version("yt-dlp")
+        low, high = SESSION_TESTED_VERSIONS
+        if installed and parse_version(low) <= parse_version(installed) <= parse_version(high):
+            return True
+
+        self.enabled = False
+        print(f"[INFO] YoutubeDL 세션 재사용 끔: yt-dlp {installed or '버전 알 수 없음'}"
+              f" (확인한 버전 {low} ~ {high}, YTDL_SESSION_REUSE=force 로 강제 사용)")
+        return False
+
+    def _signature(self, opts):
+        shared = {k: v for k, v in opts.items() if k not in SESSION_JOB_OPTS}
+        return json.dumps(shared, sort_keys=True, default=repr)
+
+    def _create(self, opts):
+        start = time.perf_counter()
+        ydl = create_ydl({k: v for k, v in opts.items() if k not in SESSION_JOB_OPTS})
+        ydl._session_base = dict(ydl.params)
+        ydl._session_init = time.perf_counter() - start
+        ydl._session_uses = 0
+        ydl._session_requests = 0
+        ydl._session_connections = 0
+
+        # 요청 수 집계 (연결 재사용률 계산용)
+        urlopen = ydl.urlopen
+
+        def counting_urlopen(req):
+            ydl._session_requests += 1
+            return urlopen(req)
+
+        ydl.urlopen = counting_urlopen
+        return ydl
+
+    def _apply(self, ydl, opts):
+        from yt_dlp.postprocessor import get_postprocessor
+
+        logger = opts.get("logger") or YdlLogger(opts.get("quiet"), opts.get("no_warnings"))
+        params = {**ydl._session_base, **{k: opts[k] for k in SESSION_JOB_OPTS if k in opts}, "logger": logger}
+        if isinstance(params.get("outtmpl"), dict):
+            params["outtmpl"] = dict(params["outtmpl"])
+        ydl.params = params
+        ydl._parse_outtmpl()
+
+        fmt = params.get("format")
+        ydl.format_selector = fmt if fmt in (None, "-") or callable(fmt) else ydl.build_format_selector(fmt)
+
+        # 이전 작업의 후처리/훅/카운터 제거 후 이번 작업 것으로 등록
+        ydl._pps = {when: [] for when in ydl._pps}
+        for pp in params.get("postprocessors") or []:
+            pp = dict(pp)
+            when = pp.pop("when", "post_process")
+            ydl.add_post_processor(get_postprocessor(pp.pop("key"))(ydl, **pp), when=when)
+
+        ydl._progress_hooks = []
+        ydl._postprocessor_hooks = []
+        for hook in params.get("progress_hooks") or []:
+            ydl.add_progress_hook(hook)
+        for hook in params.get("postprocessor_hooks") or []:
+            ydl.add_postprocessor_hook(hook)
+        install_ydl_hooks(ydl, logger)
+
+        ydl._download_retcode = 0
+        ydl._num_downloads = 0
+        ydl._playlist_level = 0
+        ydl._playlist_urls = set()
+
+    def checkout(self, opts):
+        if not self.enabled:
+            return None, create_ydl(opts)
+
+        signature = self._signature(opts)
+
+        with self.lock:
+            idle = self.idle.get(signature)
+            ydl = idle.pop() if idle else None
+
+        if ydl is None:
+            ydl = self._create(opts)
+            missing = [name for name in SESSION_REQUIRED_ATTRS if not hasattr(ydl, name)]
+            if missing:
+                ydl.close()
+                return self._fallback(opts, f"yt-dlp 내부 속성 없음: {', '.join(missing)}")
+            with self.lock:
+                self.stats["created"] += 1
+                self.stats["init_time"] += ydl._session_init
+        else:
+            with self.lock:
+                self.stats["reused"] += 1
+
+        try:
+            self._apply(ydl, opts)
+        except (AttributeError, TypeError, KeyError) as e:
+            ydl.close()
+            return self._fallback(opts, f"{type(e).__name__}: {e}")
+        return signature, ydl
+
+    def _fallback(self, opts, reason):
+        # 이 yt-dlp 버전과 맞지 않음 → 재사용을 끄고 이번 작업부터 새 인스턴스
+        with self.lock:
+            disabled, self.enabled = self.enabled, False
+            idle = [ydl for ydls in self.idle.values() for ydl in ydls]
+            self.idle.clear()
+
+        for ydl in idle:
+            ydl.close()
+        if disabled:
+            print(f"\n[WARN] YoutubeDL 세션 재사용 끔 (yt-dlp {get_installed_version('yt-dlp')}): {reason}")
+        return None, create_ydl(opts)
+
+    def release(self, signature, ydl, duration):
+        # 오류 / 취소로 끝난 다운로드도 대역폭 몫을 돌려줌
+        bandwidth.release(ydl)
+
+        if signature is None or not self.enabled:
+            ydl.close()
+            return
+
+        requests = ydl._session_requests
+        connections = count_connections(ydl)
+
+        with self.lock:
+            # urllib 핸들러는 요청마다 새 연결
+            new_requests = requests - ydl.__dict__.get("_session_counted", 0)
+            if connections is None:
+                new_connections = new_requests
+            else:
+                new_connections = connections - ydl._session_connections
+                ydl._session_connections = connections
+            ydl._session_counted = requests
+
+            self.stats["requests"] += new_requests
+            self.stats["connections"] += new_connections
+
+            kind = "warm" if ydl._session_uses else "cold"
+            self.stats[f"{kind}_time"] += duration
+            self.stats[f"{kind}_jobs"] += 1
+
+            ydl._session_uses += 1
+            ydl._progress_hooks = []
+            ydl._postprocessor_hooks = []
+
+            idle = self.idle.setdefault(signature, [])
+            if ydl._session_uses < SESSION_MAX_USES and len(idle) < SESSION_MAX_IDLE:
+                idle.append(ydl)
+                return
+
+        ydl.close()
+
+    def session(self, opts):
+        # with sessions.session(opts) as ydl: ... (재사용을 꺼도 끝날 때 release()에서 닫음)
+        return self._Checkout(self, opts)
+
+    class _Checkout:
+
+        def __init__(self, pool, opts):
+            self.pool = pool
+            self.opts = opts
+
+        def __enter__(self):
+            self.start = time.perf_counter()
+            self.signature, self.ydl = self.pool.checkout(self.opts)
+            return self.ydl
+
+        def __exit__(self, exc_type, exc, tb):
+            self.pool.release(self.signature, self.ydl, time.perf_counter() - self.start)
+
+    def summary(self):
+        with self.lock:
+            s = dict(self.stats)
+
+        jobs = s["created"] + s["reused"]
+        init = s["init_time"] / s["created"] if s["created"] else 0.0
+        cold = s["cold_time"] / s["cold_jobs"] if s["cold_jobs"] else 0.0
+        warm = s["warm_time"] / s["warm_jobs"] if s["warm_jobs"] else 0.0
+        # 재사용 작업 1건당 절약 = 생성 비용 + (첫 작업 - 재사용 작업) 평균 시간 차이
+        saved = init + max(0.0, cold - warm) if s["warm_jobs"] and s["cold_jobs"] else 0.0
+
+        return {
+            "jobs": jobs,
+            "created": s["created"],
+            "reused": s["reused"],
+            "reuse_rate": round(s["reused"] / jobs, 3) if jobs else 0.0,
+            "requests": s["requests"],
+            "connections": s["connections"],
+            "connection_reuse_rate": round(1 - s["connections"] / s["requests"], 3) if s["requests"] else 0.0,
+            "saved_per_job": round(saved, 3),
+            "saved_total": round(saved * s["reused"], 1),
+        }
+
+    def close(self):
+        with self.lock:
+            idle, self.idle = self.idle, {}
+        for ydls in idle.values():
+            for ydl in ydls:
+                ydl.close()
+
+sessions = YdlSessionPool()
+atexit.register(sessions.close)
+
 # ------------------------------------------------------------
 # 유틸 함수
 # ------------------------------------------------------------
@@ -295,12 +721,68 @@ def detect_android_storage():
 
     return volumes
 
-
+# ------------------------------------------------------------
+# 볼륨 목록 캐시
+# ------------------------------------------------------------
+# main() 루프마다 /proc/mounts, mount 명령을 다시 읽지 않도록 캐시.
+# Linux: /proc/self/mounts poll → 마운트 테이블이 바뀔 때만 POLLPRI
+# 그 외: /Volumes 등 마운트 상위 디렉토리 mtime + TTL
+VOLUME_CACHE_TTL = 60
+VOLUME_MOUNT_ROOTS = ("/Volumes", "/mnt", "/media", "/run/media", "/storage")
+
+class VolumeScanner:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.volumes = None
+        self.scanned = 0.0
+        self.signature = None
+        self.poller = None
+        self.mounts = None
+
+    def _watch(self):
+        if self.poller is not None or platform.system() != "Linux":
+            return
+        try:
+            import select
+            self.mounts = open("/proc/self/mounts")
+            self.poller = select.poll()
+            self.poller.register(self.mounts, select.POLLPRI | select.POLLERR)
+            self.poller.poll(0)     # 현재 상태를 기준점으로
+        except (OSError, AttributeError):
+            self.poller = None
+
+    def _signature(self):
+        sig = []
+        for root in VOLUME_MOUNT_ROOTS:
+            try:
+                sig.append((root, os.stat(root).st_mtime_ns))
+            except OSError:
+                pass
+        return tuple(sig)
+
+    def _changed(self):
+        if self.poller is not None:
+            return bool(self.poller.poll(0))
+        return self._signature() != self.signature
+
+    def get(self):
+        with self.lock:
+            fresh = time.monotonic() - self.scanned < VOLUME_CACHE_TTL
+            if self.volumes is not None and fresh and not self._changed():
+                return list(self.volumes)
+
+            self._watch()
+            self.signature = self._signature()
+            self.volumes = detect_volumes()
+            self.scanned = time.monotonic()
+            return list(self.volumes)
+
+volume_scanner = VolumeScanner()
 
 def build_download_paths():
 
     paths = []
-    volumes = detect_volumes()
+    volumes = volume_scanner.get()
 
     for v in volumes:
 
@@ -362,28 +844,608 @@ def format_size(size):
 
     return f"{size:.1f} PB"    
 # ------------------------------------------------------------
+# 메타데이터 캐시 (SQLite)
+# ------------------------------------------------------------
+# 같은 URL을 하루에도 여러 번 조회하므로 extract_info 결과를 디스크에 보관
+# - meta    : 제목/길이/업로더 등 잘 변하지 않는 정보 → 길게 보관
+# - streams : 서명된 스트림 URL이 포함된 전체 info → 짧게 보관 (URL 만료)
+INFO_CACHE_ENABLED = True
+INFO_CACHE_PATH = os.path.join(CACHE_DIR, "info_cache.sqlite3")
+INFO_CACHE_MAX_BYTES = 256 * 1024 * 1024
+INFO_CACHE_TTL = {
+    "meta": 7 * 24 * 3600,      # 7일
+    "streams": 4 * 3600,        # 4시간 (YouTube 서명 URL은 약 6시간 후 만료)
+}
+STREAM_EXPIRE_MARGIN = 10 * 60  # URL의 expire 값보다 10분 먼저 만료 처리
+
+# meta 저장 시 제거하는 스트림 관련 필드
+STREAM_FIELDS = (
+    "formats", "requested_formats", "requested_downloads", "requested_subtitles",
+    "url", "manifest_url", "fragment_base_url", "fragments", "http_headers",
+)
+
+# 추출 결과에 영향을 주는 옵션 (캐시 키 fingerprint)
+CACHE_KEY_OPTS = (
+    "cookiefile", "cookiesfrombrowser", "extractor_args", "remote_components",
+    "format", "extract_flat", "playlist_items", "noplaylist", "geo_bypass_country",
+)
+
+# 재처리(process_ie_result) 전에 제거하는 이전 실행의 결과 필드
+PROCESSED_FIELDS = (
+    "requested_downloads", "requested_formats", "requested_subtitles",
+    "filepath", "_filename", "filename", "__files_to_move", "__postprocessors",
+)
+
+# 포맷 선택 후 다운로드 대기 작업에서 제거하는 필드 (영상당 수백 KB ~ 수 MB)
+# formats 는 선택한 스트림만 남김 - 자막/썸네일은 받지 않으므로 불필요
+HEAVY_FIELDS = ("formats", "thumbnails", "subtitles", "automatic_captions", "heatmap")
+
+URL_MAX_REDIRECTS = 3       # 채널 URL → 업로드 탭 등 url 결과를 따라가는 최대 횟수
+
+YOUTUBE_ID_RE = re.compile(r"(?:[?&]v=|youtu\.be/|/shorts/|/live/|/embed/)([0-9A-Za-z_-]{11})")
+STREAM_EXPIRE_RE = re.compile(r"[?&/]expire[=/](\d{9,11})")
+
+
+def extract_video_key(url):
+    url = url.strip()
+    query = urllib.parse.parse_qs(urllib.parse.urlparse(url).query)
+
+    # list= 가 있으면 yt-dlp는 플레이리스트 전체를 추출
+    if query.get("list"):
+        return f"youtube:playlist:{query['list'][0]}"
+
+    m = YOUTUBE_ID_RE.search(url)
+    if m:
+        return f"youtube:{m.group(1)}"
+
+    return f"url:{url}"
+
+
+def info_cache_key(url, opts):
+    fingerprint = json.dumps(
+        {k: opts.get(k) for k in CACHE_KEY_OPTS}, sort_keys=True, default=str
+    )
+    digest = hashlib.sha1(fingerprint.encode("utf-8")).hexdigest()[:12]
+    return f"{extract_video_key(url)}|{digest}"
+
+
+def strip_fields(info, fields):
+    stripped = {k: v for k, v in info.items() if k not in fields}
+
+    entries = info.get("entries")
+    if isinstance(entries, list):
+        stripped["entries"] = [strip_fields(e, fields) if isinstance(e, dict) else e for e in entries]
+
+    return stripped
+
+
+def stream_expire_time(info, default):
+    # 포맷 URL의 expire 파라미터 중 가장 빠른 시점
+    expire = default
+
+    def scan(obj):
+        nonlocal expire
+        for f in obj.get("formats") or []:
+            m = STREAM_EXPIRE_RE.search(f.get("url") or "")
+            if m:
+                expire = min(expire, int(m.group(1)) - STREAM_EXPIRE_MARGIN)
+
+    scan(info)
+    for entry in info.get("entries") or []:
+        if isinstance(entry, dict):
+            scan(entry)
+
+    return expire
+
+
+class InfoCache:
+
+    def __init__(self, path, ttl=None, max_bytes=INFO_CACHE_MAX_BYTES):
+        self.path = path
+        self.ttl = {**INFO_CACHE_TTL, **(ttl or {})}
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.stats = {"hit": 0, "meta_hit": 0, "miss": 0, "expired": 0, "store": 0, "evict": 0}
+        self._conn = None
+
+    def _db(self):
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS info ("
+                " key TEXT PRIMARY KEY,"
+                " meta BLOB, meta_expires REAL,"
+                " streams BLOB, streams_expires REAL,"
+                " size INTEGER, last_access REAL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS info_lru ON info(last_access)")
+            self._conn = conn
+        return self._conn
+
+    @staticmethod
+    def _pack(info):
+        return zlib.compress(json.dumps(info, ensure_ascii=False).encode("utf-8"))
+
+    @staticmethod
+    def _unpack(blob):
+        return json.loads(zlib.decompress(blob).decode("utf-8"))
+
+    def get(self, key, need_streams=True):
+        now = time.time()
+
+        with self.lock:
+            db = self._db()
+            row = db.execute(
+                "SELECT meta, meta_expires, streams, streams_expires FROM info WHERE key = ?",
+                (key,),
+            ).fetchone()
+
+            if row is None:
+                self.stats["miss"] += 1
+                return None
+
+            meta, meta_expires, streams, streams_expires = row
+
+            if streams is not None and streams_expires > now:
+                blob = streams
+                self.stats["hit"] += 1
+            elif not need_streams and meta is not None and meta_expires > now:
+                blob = meta
+                self.stats["meta_hit"] += 1
+            else:
+                self.stats["expired"] += 1
+                if meta_expires <= now:
+                    db.execute("DELETE FROM info WHERE key = ?", (key,))
+                    db.commit()
+                return None
+
+            db.execute("UPDATE info SET last_access = ? WHERE key = ?", (now, key))
+            db.commit()
+
+        return self._unpack(blob)
+
+    def put(self, key, info):
+        now = time.time()
+        meta = self._pack(strip_fields(info, STREAM_FIELDS))
+        streams = self._pack(info)
+        streams_expires = stream_expire_time(info, now + self.ttl["streams"])
+
+        with self.lock:
+            db = self._db()
+            db.execute(
+                "INSERT OR REPLACE INTO info VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, meta, now + self.ttl["meta"], streams, streams_expires,
+                 len(meta) + len(streams), now),
+            )
+            self.stats["store"] += 1
+            self._evict(db)
+            db.commit()
+
+    def invalidate(self, key, streams_only=True):
+        with self.lock:
+            db = self._db()
+            if streams_only:
+                db.execute("UPDATE info SET streams = NULL, size = LENGTH(meta) WHERE key = ?", (key,))
+            else:
+                db.execute("DELETE FROM info WHERE key = ?", (key,))
+            db.commit()
+
+    def _evict(self, db):
+        total = db.execute("SELECT COALESCE(SUM(size), 0) FROM info").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        # 오래 사용하지 않은 항목부터 제거 (LRU)
+        victims = []
+        for key, size in db.execute("SELECT key, size FROM info ORDER BY last_access"):
+            if total <= self.max_bytes:
+                break
+            victims.append((key,))
+            total -= size
+
+        db.executemany("DELETE FROM info WHERE key = ?", victims)
+        self.stats["evict"] += len(victims)
+
+    def summary(self):
+        with self.lock:
+            stats = dict(self.stats)
+        lookups = stats["hit"] + stats["meta_hit"] + stats["miss"] + stats["expired"]
+        stats["hit_rate"] = round((stats["hit"] + stats["meta_hit"]) / lookups, 3) if lookups else 0.0
+        return stats
+
+
+info_cache = InfoCache(INFO_CACHE_PATH)
+
+# ------------------------------------------------------------
+# 다운로드 보관 목록 (archive) / 중복 제거
+# ------------------------------------------------------------
+# extractor + video ID 기준으로 이미 받은 파일을 기록
+# - 추출/다운로드 전에 조회 → 이미 받은 영상은 네트워크 사용 없음
+# - 다른 플레이리스트 폴더에 이미 있으면 hardlink/reflink로 연결
+ARCHIVE_ENABLED = True
+ARCHIVE_PATH = os.path.join(STATE_DIR, "archive.sqlite3")
+MEDIA_EXTS = (".mp4", ".mkv", ".webm", ".m4a", ".mp3", ".opus", ".ogg", ".flac", ".wav", ".mov", ".aac")
+YOUTUBE_TAG_RE = re.compile(r"\[([0-9A-Za-z_-]{11})\]")
+STREAM_FILE_RE = re.compile(r"\.f\d+(-\w+)?$")      # 병합 전 개별 스트림 (title.f137.mp4)
+
+def archive_key(extractor, video_id):
+    # yt-dlp --download-archive 와 같은 형식 ("youtube dQw4w9WgXcQ")
+    if not extractor or not video_id:
+        return None
+    return f"{extractor.lower()} {video_id}"
+
+def archive_key_from_url(url):
+    key = extract_video_key(url)
+    if key.startswith("youtube:") and not key.startswith("youtube:playlist:"):
+        return archive_key("youtube", key.split(":", 1)[1])
+    return None
+
+def archive_key_from_info(info):
+    return archive_key(info.get("extractor_key") or info.get("ie_key"), info.get("id"))
+
+def archive_variant(convert_to, video_fmt=None, audio_fmt=None, preset=None):
+    # 포맷을 직접 지정한 다운로드는 따로 보관 (기본 선택으로 받은 파일로 대신하지 않음)
+    variant = convert_to or "original"
+    fmt = "+".join(f for f in (video_fmt, audio_fmt) if f) or (preset and f"preset={preset}")
+    return f"{variant}:{fmt}" if fmt else variant
+
+def job_archive_variant(job):
+    return archive_variant(job.get("convert"), job.get("video_fmt"), job.get("audio_fmt"), job.get("preset"))
+
+def link_or_clone(src, dst):
+    # 1. hardlink (같은 파일시스템)
+    try:
+        os.link(src, dst)
+        return "hardlink"
+    except OSError:
+        pass
+
+    # 2. reflink (btrfs/xfs/APFS 등 copy-on-write 파일시스템)
+    try:
+        if platform.system() == "Linux":
+            import fcntl
+            FICLONE = 0x40049409
+            with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+                fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+            return "reflink"
+        if platform.system() == "Darwin":
+            subprocess.check_call(["cp", "-c", src, dst], stderr=subprocess.DEVNULL)
+            return "reflink"
+    except Exception:
+        if os.path.exists(dst) and os.path.getsize(dst) != os.path.getsize(src):
+            os.remove(dst)
+
+    # 3. 로컬 복사 (네트워크 사용 없음)
+    if not os.path.exists(dst):
+        shutil.copy2(src, dst)
+    return "copy"
+
+class DownloadArchive:
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self._conn = None
+
+    def _db(self):
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS archive ("
+                " key TEXT, variant TEXT, path TEXT, size INTEGER, added REAL,"
+                " PRIMARY KEY (key, variant))"
+            )
+            self._conn = conn
+        return self._conn
+
+    def lookup(self, key, variant):
+        if not key:
+            return None
+
+        # mp4 변환 요청은 원본이 이미 mp4인 경우도 인정
+        variants = (variant, "original") if variant == "mp4" else (variant,)
+
+        with self.lock:
+            db = self._db()
+            for v in variants:
+                row = db.execute(
+                    "SELECT path, size FROM archive WHERE key = ? AND variant = ?", (key, v)
+                ).fetchone()
+                if row is None:
+                    continue
+
+                path, size = row
+                if v != variant and not path.endswith(".mp4"):
+                    continue
+
+                # 파일이 삭제/변경되었으면 목록에서 제거
+                if not os.path.isfile(path) or os.path.getsize(path) != size:
+                    db.execute("DELETE FROM archive WHERE key = ? AND variant = ?", (key, v))
+                    db.commit()
+                    continue
+
+                return path
+
+        return None
+
+    def add(self, key, variant, path):
+        if not key or not path or not os.path.isfile(path):
+            return
+
+        with self.lock:
+            db = self._db()
+            db.execute(
+                "INSERT OR REPLACE INTO archive VALUES (?, ?, ?, ?, ?)",
+                (key, variant, os.path.abspath(path), os.path.getsize(path), time.time()),
+            )
+            db.commit()
+
+    def count(self):
+        with self.lock:
+            return self._db().execute("SELECT COUNT(*) FROM archive").fetchone()[0]
+
+archive = DownloadArchive(ARCHIVE_PATH)
+
+def satisfy_from_archive(key, variant, target_dir):
+    # 보관 목록에 있으면 target_dir에 연결하고 그 경로 반환 (없으면 None)
+    if not ARCHIVE_ENABLED:
+        return None
+
+    path = archive.lookup(key, variant)
+    if path is None:
+        return None
+
+    target = os.path.join(target_dir, os.path.basename(path))
+
+    if os.path.abspath(target) == path or os.path.exists(target):
+        print(f"[INFO] 이미 다운로드됨: {target}")
+        return target
+
+    os.makedirs(target_dir, exist_ok=True)
+    method = link_or_clone(path, target)
+    print(f"[INFO] 보관된 파일 재사용 ({method}): {path} → {target}")
+    return target
+
+def record_downloads(result, variant):
+    # process_ie_result 결과에서 최종 파일 경로를 보관 목록에 기록
+    if not ARCHIVE_ENABLED or not result:
+        return
+
+    if result.get("_type") == "playlist":
+        for entry in result.get("entries") or []:
+            if entry:
+                record_downloads(entry, variant)
+        return
+
+    for d in result.get("requested_downloads") or []:
+        archive.add(archive_key_from_info(result), variant, d.get("filepath"))
+
+def title_index_from_cache():
+    # 메타데이터 캐시의 제목 → archive key (import 시 파일명 매칭용)
+    from yt_dlp.utils import sanitize_filename
+
+    index = {}
+    with info_cache.lock:
+        rows = info_cache._db().execute("SELECT meta FROM info WHERE meta IS NOT NULL").fetchall()
+
+    for (blob,) in rows:
+        meta = InfoCache._unpack(blob)
+        for item in [meta] + [e for e in meta.get("entries") or [] if isinstance(e, dict)]:
+            key = archive_key_from_info(item)
+            if key and item.get("title"):
+                index[sanitize_filename(item["title"])] = key
+
+    return index
+
+def import_archive(roots):
+    # 기존 다운로드 폴더를 스캔해서 보관 목록 생성
+    # 1. <파일>.info.json  2. 파일명의 [video_id]  3. 캐시된 제목과 파일명 일치
+    load_yt_dlp()
+    titles = title_index_from_cache()
+    imported, unknown = 0, 0
+
+    for root_dir in roots:
+        for root, dirs, files in os.walk(root_dir):
+            dirs[:] = [d for d in dirs if not d.startswith(".")]
+
+            for name in files:
+                base, ext = os.path.splitext(name)
+                if ext.lower() not in MEDIA_EXTS or STREAM_FILE_RE.search(base):
+                    continue
+
+                path = os.path.join(root, name)
+                key = None
+
+                info_json = os.path.join(root, base + ".info.json")
+                if os.path.exists(info_json):
+                    try:
+                        with open(info_json, encoding="utf-8") as f:
+                            key = archive_key_from_info(json.load(f))
+                    except Exception:
+                        pass
+
+                if key is None:
+                    m = YOUTUBE_TAG_RE.search(base)
+                    key = archive_key("youtube", m.group(1)) if m else titles.get(base)
+
+                if key is None:
+                    unknown += 1
+                    continue
+
+                archive.add(key, "mp3" if ext.lower() == ".mp3" else "original", path)
+                imported += 1
+
+    print(f"[INFO] 보관 목록 가져오기 완료: {imported}개 등록, {unknown}개 식별 불가 (전체 {archive.count()}개)")
+    return imported
+
+# ------------------------------------------------------------
 #  유튜브 정보 조회
 # ------------------------------------------------------------
 
-def fetch_video_info(url):
-    opts = {
+def build_info_opts(flat=False):
+    return {
         **ydl_base_opts,
         "dump_single_json": True,
-        "extract_flat": False,
+        # flat=True → 플레이리스트 항목의 ID/URL만 빠르게 조회
+        "extract_flat": "in_playlist" if flat else False,
+    }
+
+def resolve_ie_result(ydl, url):
+    # process=False → 플레이리스트 항목을 추출하지 않고 (entries는 지연 조회 상태로) 반환
+    info = ydl.extract_info(url, download=False, process=False)
+    overrides = {}
+
+    for _ in range(URL_MAX_REDIRECTS):
+        if not info or info.get("_type") not in ("url", "url_transparent"):
+            break
+        # url_transparent: 중간 결과의 제목 등이 최종 결과보다 우선 (yt-dlp와 동일)
+        if info["_type"] == "url_transparent":
+            overrides = {
+                **{k: v for k, v in info.items()
+                   if v is not None and k not in ("_type", "url", "id", "extractor", "extractor_key", "ie_key")},
+                **overrides,
+            }
+        info = ydl.extract_info(info["url"], ie_key=info.get("ie_key"), download=False, process=False)
+
+    return {**info, **overrides} if info and overrides else info
+
+def iter_playlist_entries(ydl, info):
+    # (1부터 시작하는 순번, 항목) - 페이지 단위로 조회하므로 항목 수와 관계없이 메모리 일정
+    from yt_dlp.utils import PlaylistEntries
+
+    for index, entry in PlaylistEntries(ydl, info)[:]:
+        if entry:
+            yield index, entry
+
+def playlist_meta(info):
+    # 항목 info에 덮어쓸 플레이리스트 필드 (%(playlist_title)s 폴더 등)
+    return {
+        "playlist": info.get("title") or info.get("id"),
+        "playlist_id": info.get("id"),
+        "playlist_title": info.get("title"),
+        "playlist_uploader": info.get("uploader"),
+        "playlist_uploader_id": info.get("uploader_id"),
     }
 
-    with YoutubeDL(opts) as ydl:
-        info = ydl.extract_info(url, download=False)
+def fetch_video_info(url, need_streams=True, refresh=False, flat=False, errors=None, on_playlist=None):
+    # on_playlist(ydl, info): 플레이리스트면 항목을 한꺼번에 추출하지 않고 여기로 넘김
+    # (반환값은 entries 없는 플레이리스트 정보, 캐시하지 않음)
+    opts = build_info_opts(flat)
+    key = info_cache_key(url, opts)
+
+    # 캐시 우선 조회 (need_streams=False 이면 메타데이터만 있어도 충분)
+    if INFO_CACHE_ENABLED and not refresh:
+        info = info_cache.get(key, need_streams)
+        if info is not None and not (on_playlist and info.get("_type") == "playlist"):
+            return info
+
+    with metrics.span("extract", url=url, flat=flat) as span, sessions.session(opts) as ydl:
+        if on_playlist is None:
+            info = ydl.extract_info(url, download=False)
+        else:
+            info = resolve_ie_result(ydl, url)
+            if info and info.get("_type") == "playlist":
+                on_playlist(ydl, info)
+                return {k: v for k, v in info.items() if k != "entries"}
+            if info:
+                info = ydl.process_ie_result(info, download=False)
+
+        # JSON 직렬화 가능한 형태로 정리
+        info = ydl.sanitize_info(info)
+
+        span["retries"] = ydl.params["logger"].retries
+        if info is None:
+            span["outcome"] = "error"
+            span["error"] = "; ".join(ydl.params["logger"].errors)
+            if errors is not None:
+                errors.extend(ydl.params["logger"].errors)
+
+    if info is not None and INFO_CACHE_ENABLED:
+        info_cache.put(key, info)
 
     return info
 
-def list_formats(info):
+def download_with_info(ydl, url, variant="original"):
+    # 캐시된 info로 다운로드 → 같은 실행에서 두 번 추출하지 않음
+    key = info_cache_key(url, build_info_opts())
+    info = fetch_video_info(url)
+
+    # 추출 실패 (삭제/비공개 등) → 같은 추출을 반복하지 않음
+    if info is None:
+        return 1
+
+    result = ydl.process_ie_result(strip_fields(info, PROCESSED_FIELDS), download=True)
+
+    retcode = ydl._download_retcode
+    if retcode and INFO_CACHE_ENABLED:
+        # 서명 URL 만료 등 → 스트림 캐시 무효화
+        info_cache.invalidate(key)
+
+        # 단일 영상은 새로 추출(캐시에도 저장 → 다음 작업도 새 스트림 URL 사용)해서 한 번 더 시도
+        if info.get("_type", "video") == "video":
+            info = fetch_video_info(url, refresh=True)
+            if info is None:
+                return retcode
+            ydl._download_retcode = 0
+            result = ydl.process_ie_result(strip_fields(info, PROCESSED_FIELDS), download=True)
+            retcode = ydl._download_retcode
+
+    record_downloads(result, variant)
+    return retcode
+
+# 포맷 목록 표시 / 선택에 쓰는 필드만 담은 레코드
+# (__slots__ → 포맷마다 URL/헤더/조각 목록이 들어있는 원본 dict 대비 수십 분의 1)
+# list_formats()의 반환값: 원본 dict처럼 f.get(name, default) / f[name] / name in f 로 읽음
+# (원본에 없던 필드는 비워 둠 → get()은 default, f[name]은 KeyError. URL 등 다른 필드는 없음)
+FORMAT_RECORD_FIELDS = (
+    "format_id", "format", "format_note", "ext", "protocol", "vcodec", "acodec",
+    "width", "height", "fps", "audio_channels", "tbr", "vbr", "abr", "asr", "filesize", "filesize_approx",
+)
+
+class FormatRecord:
+    __slots__ = FORMAT_RECORD_FIELDS
+
+    def __init__(self, f):
+        for name in FORMAT_RECORD_FIELDS:
+            if name in f:
+                setattr(self, name, f[name])
+
+    def get(self, name, default=None):
+        # dict 처럼 조회 (FormatTable 에 그대로 사용)
+        return getattr(self, name, default) if name in FORMAT_RECORD_FIELDS else default
+
+    def __getitem__(self, name):
+        if name not in self:
+            raise KeyError(name)
+        return getattr(self, name)
+
+    def __contains__(self, name):
+        return name in FORMAT_RECORD_FIELDS and hasattr(self, name)
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in FORMAT_RECORD_FIELDS if hasattr(self, name)}
+
+def format_records(info):
+    return [FormatRecord(f) for f in (info or {}).get("formats") or []]
+
+def list_formats(info, preset=None):
     RESET = "\033[0m"
     GREEN = "\033[92m"     # audio
     CYAN = "\033[96m"      # video
     YELLOW = "\033[93m"    # storyboard or other
 
-    formats = info.get("formats", [])
+    # URL이 넘어오면 캐시를 통해 조회
+    if isinstance(info, str):
+        info = fetch_video_info(info)
+
+    # 레코드만 남기고 큰 info는 놓음
+    formats = format_records(info)
+    duration = (info or {}).get("duration")
+    info = None
     if not formats:
         print("포맷 정보를 찾을 수 없습니다.")
         return []
@@ -478,164 +1540,4656 @@ def list_formats(info):
             + RESET
         )
 
+    if preset:
+        chosen = FormatTable({"duration": duration, "formats": formats}).select(preset)
+        print(f"\n[INFO] 프리셋 '{preset}' 선택: {'+'.join(chosen) or '없음'}")
+
     return formats
 
 # ------------------------------------------------------------
-#  다운로드 처리
+# 포맷 선택 정책 (프리셋)
 # ------------------------------------------------------------
+# 이미 추출된 info["formats"]만으로 정책에 맞는 스트림 선택 (네트워크 없음).
+# 정책 키:
+#   max_height / max_fps          : 상한 (반드시 지킴)
+#   exclude_protocols             : 제외할 프로토콜 접두사 (예: ["m3u8"])
+#   max_mib_per_min / min_abr     : 만족하는 스트림이 없으면 완화
+#   prefer_vcodec / prefer_acodec : 코덱 우선순위 (같은 해상도 안에서)
+#   audio_only                    : 오디오 스트림만
+# storyboard / mhtml 은 항상 제외. .state/presets.json 으로 프리셋 추가/덮어쓰기 가능.
+FORMAT_PRESETS = {
+    "best": {},
+    "1080p": {"max_height": 1080},
+    "720p": {"max_height": 720},
+    "480p": {"max_height": 480},
+    "compact": {
+        "max_height": 1080, "max_mib_per_min": 20, "min_abr": 128,
+        "prefer_vcodec": ["av01", "vp9"], "prefer_acodec": ["opus"],
+    },
+    "compatible": {"max_height": 1080, "prefer_vcodec": ["h264"], "prefer_acodec": ["aac"]},
+    "audio": {"audio_only": True, "min_abr": 128, "prefer_acodec": ["opus", "aac"]},
+}
+FORMAT_PRESETS_PATH = os.path.join(STATE_DIR, "presets.json")
+
+# 코덱 문자열 접두사 → 코덱 계열
+CODEC_FAMILIES = (
+    ("av01", "av01"), ("vp09", "vp9"), ("vp9", "vp9"), ("vp8", "vp8"),
+    ("avc", "h264"), ("h264", "h264"), ("hev1", "h265"), ("hvc1", "h265"), ("h265", "h265"),
+    ("mp4a", "aac"), ("aac", "aac"), ("opus", "opus"), ("vorbis", "vorbis"),
+    ("mp3", "mp3"), ("ac-3", "ac3"), ("ec-3", "eac3"), ("flac", "flac"),
+)
+
+def codec_family(codec):
+    if not codec or codec == "none":
+        return None
 
-def build_download_opts(download_dir, video_fmt=None, audio_fmt=None, convert_to=None):
-    opts = {
-        **ydl_base_opts,
-        "outtmpl": os.path.join(download_dir, "%(title)s.%(ext)s"),
-        "progress_hooks": [progress_hook],
+    codec = codec.lower()
+    for prefix, family in CODEC_FAMILIES:
+        if codec.startswith(prefix):
+            return family
+    return codec.split(".")[0]
+
+def load_format_presets(path=None):
+    path = path or FORMAT_PRESETS_PATH
+    try:
+        with open(path, encoding="utf-8") as f:
+            user = json.load(f)
+    except FileNotFoundError:
+        return FORMAT_PRESETS
+    except (OSError, ValueError) as e:
+        print(f"[WARN] 프리셋 파일 읽기 실패: {path} ({e})")
+        return FORMAT_PRESETS
+
+    FORMAT_PRESETS.update({name: p for name, p in user.items() if isinstance(p, dict)})
+    _compiled_policies.clear()
+    return FORMAT_PRESETS
+
+_compiled_policies = {}
+
+def compile_format_policy(policy):
+    # 프리셋 이름 → 필터/정렬 키를 한 번만 만들어 재사용 (대량 평가용)
+    if isinstance(policy, str):
+        if policy in _compiled_policies:
+            return _compiled_policies[policy]
+        if policy not in FORMAT_PRESETS:
+            raise ValueError(f"알 수 없는 프리셋: {policy}")
+        compiled = _compiled_policies[policy] = compile_format_policy(FORMAT_PRESETS[policy])
+        return compiled
+
+    max_height = policy.get("max_height")
+    max_fps = policy.get("max_fps")
+    max_mpm = policy.get("max_mib_per_min")
+    min_abr = policy.get("min_abr")
+    excluded = tuple(policy.get("exclude_protocols") or ())
+
+    common = [lambda r: not r["protocol"].startswith(excluded)] if excluded else []
+    hard = list(common)
+    if max_height:
+        hard.append(lambda r: r["height"] <= max_height)
+    if max_fps:
+        hard.append(lambda r: r["fps"] <= max_fps)
+
+    # 크기 정보가 없는 스트림은 통과
+    size_ok = [lambda r: r["mib_per_min"] is None or r["mib_per_min"] <= max_mpm] if max_mpm else []
+    abr_ok = [lambda r: r["abr"] >= min_abr] if min_abr else []
+
+    vrank = {c: i for i, c in enumerate(policy.get("prefer_vcodec") or ())}
+    arank = {c: i for i, c in enumerate(policy.get("prefer_acodec") or ())}
+
+    return {
+        "audio_only": bool(policy.get("audio_only")),
+        "video": (hard + size_ok, hard),
+        "audio": (common + abr_ok, common),
+        "video_key": lambda r: (-r["height"], vrank.get(r["vcodec"], len(vrank)), -r["fps"], -r["vbr"], r["format_id"]),
+        "audio_key": lambda r: (arank.get(r["acodec"], len(arank)), -r["abr"], r["format_id"]),
     }
 
-    # 특정 포맷 선택
-    if video_fmt or audio_fmt:
-        if audio_fmt:
-            fmt = f"{video_fmt}+{audio_fmt}" if video_fmt else audio_fmt
+class FormatTable:
+    def __init__(self, info):
+        duration = info.get("duration") or 0
+        self.video = []
+        self.audio = []
+        self.muxed = []
+
+        for f in info.get("formats") or [info]:
+            row = self._row(f, duration)
+            if row:
+                getattr(self, row["kind"]).append(row)
+
+        # 품질 순 (해상도 → fps → 비트레이트 → ID) 고정 → 같은 입력이면 항상 같은 선택
+        for rows in (self.video, self.muxed):
+            rows.sort(key=lambda r: (-r["height"], -r["fps"], -r["vbr"], r["format_id"]))
+        self.audio.sort(key=lambda r: (-r["abr"], r["format_id"]))
+        self.by_id = {r["format_id"]: r for r in self.video + self.audio + self.muxed}
+
+    @staticmethod
+    def _row(f, duration):
+        vcodec = f.get("vcodec")
+        acodec = f.get("acodec")
+        protocol = f.get("protocol") or ""
+
+        if "storyboard" in (f.get("format_note") or "") or f.get("ext") == "mhtml" or protocol == "mhtml":
+            return None
+        if vcodec == "none" and acodec == "none":
+            return None
+
+        # 코덱 정보가 없으면 (generic 등) 영상+오디오 단일 파일로 취급
+        if vcodec == "none":
+            kind = "audio"
+        elif acodec == "none":
+            kind = "video"
         else:
-            fmt = video_fmt
-        opts["format"] = fmt
-    else:
-        # 자동 best 매핑
-        opts["format"] = "bv*+ba/best"
+            kind = "muxed"
 
-    # 변환 옵션 (mp3/mp4)
-    if convert_to == "mp3":
-        opts["postprocessors"] = [
-            {"key": "FFmpegExtractAudio", "preferredcodec": "mp3", "preferredquality": "192"},
-        ]
-    elif convert_to == "mp4":
-        opts["postprocessors"] = [
-            {"key": "FFmpegVideoConvertor", "preferedformat": "mp4"},
-        ]
+        tbr = f.get("tbr") or 0
+        size = f.get("filesize") or f.get("filesize_approx")
+        if not size and tbr and duration:
+            size = tbr * 1000 / 8 * duration
+
+        return {
+            "format_id": f.get("format_id") or "",
+            "kind": kind,
+            "height": f.get("height") or 0,
+            "fps": f.get("fps") or 0,
+            "vbr": f.get("vbr") or tbr,
+            "abr": f.get("abr") or (tbr if kind == "audio" else 0),
+            "vcodec": codec_family(vcodec),
+            "acodec": codec_family(acodec),
+            "protocol": protocol,
+            "ext": f.get("ext"),
+            "size": size,
+            "mib_per_min": size / (1024 * 1024) / (duration / 60) if size and duration else None,
+        }
+
+    @staticmethod
+    def _best(rows, filters, key):
+        # 조건을 모두 만족하는 후보가 없으면 완화된 조건으로 다시
+        for checks in filters:
+            candidates = [r for r in rows if all(check(r) for check in checks)]
+            if candidates:
+                return min(candidates, key=key)
+        return None
 
-    return opts
+    def select(self, policy, merge=True):
+        p = compile_format_policy(policy)
+        audio = self._best(self.audio, p["audio"], p["audio_key"])
 
-def progress_hook(d):
-    if d["status"] == "downloading":
-        p = d.get("downloaded_bytes", 0)
-        t = d.get("total_bytes") or d.get("total_bytes_estimate") or 1
-        percent = (p / t) * 100
-        sys.stdout.write(f"\r다운로드 중... {percent:5.1f}%")
-        sys.stdout.flush()
-    elif d["status"] == "finished":
-        print("\n병합 및 후처리 중...")
-
-def download_video(url, download_dir, video_fmt=None, audio_fmt=None, convert_to=None):
-    os.makedirs(download_dir, exist_ok=True)
-    print_header(f"다운로드 시작: {url}")
+        if p["audio_only"]:
+            if audio:
+                return [audio["format_id"]]
+            muxed = self._best(self.muxed, p["audio"], p["audio_key"])
+            return [muxed["format_id"]] if muxed else []
 
-    opts = build_download_opts(download_dir, video_fmt, audio_fmt, convert_to)
+        # 병합 가능(ffmpeg 있음) → 영상 + 오디오 개별 스트림
+        if merge and audio:
+            video = self._best(self.video, p["video"], p["video_key"])
+            if video:
+                return [video["format_id"], audio["format_id"]]
 
-    with YoutubeDL(opts) as ydl:
-        ydl.download([url])
+        muxed = self._best(self.muxed, p["video"], p["video_key"])
+        if muxed:
+            return [muxed["format_id"]]
 
-    print("\n다운로드 완료.")
+        video = self._best(self.video, p["video"], p["video_key"])
+        return [video["format_id"]] if video else []
 
 # ------------------------------------------------------------
-# 플레이리스트 전체 다운로드
+# 출력 형식 기반 다운로드 계획
 # ------------------------------------------------------------
+# 요청한 출력(mp3/mp4)과 사용 가능한 스트림을 보고
+#   1. 받을 스트림을 최소로 (mp3 → 오디오 스트림만)
+#   2. 스트림별로 가장 싼 ffmpeg 작업 (copy → remux → transcode 순)
+# 을 고른다. 같은 해상도라면 컨테이너에 그대로 넣을 수 있는 코덱을 우선.
+OUTPUT_POLICIES = {
+    "mp3": {"audio_only": True, "prefer_acodec": ["mp3"]},
+    "mp4": {"prefer_vcodec": ["h264"], "prefer_acodec": ["aac"]},
+}
+# 재인코딩 없이 넣을 수 있는 코덱 (mp4는 VP9/AV1/Opus도 -c copy로 remux 가능)
+OUTPUT_COPY_CODECS = {
+    "mp3": {"video": (), "audio": ("mp3",)},
+    "mp4": {"video": ("h264", "h265", "vp9", "av01"), "audio": ("aac", "mp3", "opus")},
+}
+# 미디어 1초당 트랜스코딩 CPU 시간 (초) - 영상은 1080p 기준, 화소 수에 비례
+TRANSCODE_CPU_PER_SEC = {"video": 1.5, "audio": 0.02}
+
+def stream_ops(rows, convert):
+    copy = OUTPUT_COPY_CODECS[convert]
+    ops = {}
+
+    for r in rows:
+        if r["kind"] in ("video", "muxed") and convert != "mp3":
+            ops["video"] = "copy" if r["vcodec"] in copy["video"] else "transcode"
+        if r["kind"] in ("audio", "muxed"):
+            ops["audio"] = "copy" if r["acodec"] in copy["audio"] else "transcode"
+
+    return ops
+
+def transcode_cpu(rows, ops, duration):
+    cpu = 0.0
+    for r in rows:
+        if ops.get("video") == "transcode" and r["kind"] in ("video", "muxed"):
+            cpu += duration * TRANSCODE_CPU_PER_SEC["video"] * ((r["height"] or 1080) / 1080) ** 2
+        if ops.get("audio") == "transcode" and r["kind"] in ("audio", "muxed"):
+            cpu += duration * TRANSCODE_CPU_PER_SEC["audio"]
+    return cpu
+
+def plan_output(info, convert=None, merge=True):
+    table = FormatTable(info)
+    default_ids = table.select("best", merge=merge)
+
+    if convert not in OUTPUT_POLICIES:
+        return {"convert": None, "format_ids": default_ids, "ops": {}, "operation": "copy",
+                "avoided_bytes": 0, "avoided_cpu": 0.0}
+
+    format_ids = table.select(OUTPUT_POLICIES[convert], merge=merge) or default_ids
+    rows = [table.by_id[i] for i in format_ids if i in table.by_id]
+    ops = stream_ops(rows, convert)
+
+    if all(op == "copy" for op in ops.values()):
+        # 단일 파일이 이미 목표 형식이면 ffmpeg 불필요
+        operation = "copy" if len(rows) == 1 and rows[0]["ext"] == convert else "remux"
+    else:
+        operation = "transcode"
+
+    # 기준: 기존 경로(bv*+ba를 받아 mp4는 copy 병합, mp3는 오디오 추출)가 실제로 하던 작업
+    duration = info.get("duration") or 0
+    default_rows = [table.by_id[i] for i in default_ids if i in table.by_id]
+    default_ops = stream_ops(default_rows, convert)
+
+    avoided_bytes = sum(r["size"] or 0 for r in default_rows) - sum(r["size"] or 0 for r in rows)
+    avoided_cpu = transcode_cpu(default_rows, default_ops, duration) - transcode_cpu(rows, ops, duration)
+
+    return {
+        "convert": convert,
+        "format_ids": format_ids,
+        "ops": ops,
+        "operation": operation,
+        "avoided_bytes": max(0, int(avoided_bytes)),
+        "avoided_cpu": max(0.0, avoided_cpu),
+    }
 
-def download_playlist(url, download_dir, convert_to=None):
-    print_header("플레이리스트 전체 다운로드 시작")
+def log_plan(plan, title=None):
+    if not plan["convert"]:
+        return
 
-    opts = {
-        **ydl_base_opts,
-        "outtmpl": os.path.join(download_dir, "%(playlist_title)s/%(title)s.%(ext)s"),
-        "progress_hooks": [progress_hook],
-        "format": "bv*+ba/best",
-    }
+    ops = ", ".join(f"{kind} {op}" for kind, op in plan["ops"].items())
+    print(
+        f"\n[INFO] {plan['convert']} 계획{f' ({title})' if title else ''}: "
+        f"{'+'.join(plan['format_ids'])} → {plan['operation']} [{ops}] "
+        f"(절약: 다운로드 {format_size(plan['avoided_bytes'])}, CPU 약 {plan['avoided_cpu']:.0f}s)"
+    )
 
-    if convert_to == "mp3":
-        opts["postprocessors"] = [
-            {"key": "FFmpegExtractAudio", "preferredcodec": "mp3", "preferredquality": "192"},
-        ]
+def output_postprocessors(convert, plan=None):
+    if convert == "mp3":
+        # 이미 mp3면 FFmpegExtractAudio가 재인코딩 없이 복사
+        return [{"key": "FFmpegExtractAudio", "preferredcodec": "mp3", "preferredquality": "192"}]
+
+    if convert == "mp4":
+        # 재인코딩이 필요 없는 스트림 → 컨테이너만 변경
+        key = "FFmpegVideoConvertor" if not plan or plan["operation"] == "transcode" else "FFmpegVideoRemuxer"
+        return [{"key": key, "preferedformat": "mp4"}]
 
-    with YoutubeDL(opts) as ydl:
-        ydl.download([url])
+    return []
 
-    print("\n플레이리스트 다운로드 완료.")
+def apply_output_plan(ydl, plan):
+    # 재사용 중인 YoutubeDL에 작업별 포맷/후처리 적용
+    from yt_dlp.postprocessor import get_postprocessor
+
+    ydl.format_selector = ydl.build_format_selector("+".join(plan["format_ids"]))
+    pps = []
+    for pp in output_postprocessors(plan["convert"], plan):
+        pp = dict(pp)
+        pps.append(get_postprocessor(pp.pop("key"))(ydl, **pp))
+    ydl._pps["post_process"] = pps
 
 # ------------------------------------------------------------
-# 멀티 다운로드 큐
+#  진행 상태 표시 (동시 다운로드 집계)
 # ------------------------------------------------------------
-
-def worker_download(q, download_dir):
-    while True:
-        try:
-            task = q.get_nowait()
-        except queue.Empty:
+# progress_hook은 이벤트만 큐에 넣고, 화면 출력은 렌더러 스레드 하나가 담당
+# - TTY      : 일정 주기로 작업별 줄 + 전체 합계를 다시 그림
+# - TTY 아님 : (cron 등) 일정 주기로 한 줄 로그 출력
+PROGRESS_REFRESH = 0.25         # TTY 갱신 주기 (초)
+PROGRESS_LOG_INTERVAL = 30      # TTY가 아닐 때 로그 주기 (초)
+PROGRESS_MAX_LINES = 8          # 화면에 표시할 최대 작업 수
+PROGRESS_STALE = 3              # 이 시간(초) 동안 이벤트가 없으면 속도 집계에서 제외
+
+def format_eta(seconds):
+    if seconds is None:
+        return "--:--"
+    seconds = int(seconds)
+    if seconds >= 3600:
+        return f"{seconds // 3600}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+    return f"{seconds // 60:02d}:{seconds % 60:02d}"
+
+def fit_width(text, width):
+    # 한글 등 전각 문자는 2칸 → 줄바꿈되면 블록 위치 계산이 틀어지므로 화면 폭에 맞게 자름
+    import unicodedata
+
+    used = 0
+    for i, ch in enumerate(text):
+        used += 2 if unicodedata.east_asian_width(ch) in ("W", "F") else 1
+        if used > width:
+            return text[:i]
+    return text
+
+class _ProgressStdout:
+    # 렌더러가 켜져 있는 동안 sys.stdout 대체
+    # 일반 출력은 진행 블록을 지운 뒤 쓰고, 블록은 다시 그림
+
+    def __init__(self, renderer, stream):
+        self._renderer = renderer
+        self._stream = stream
+        self._buffer = ""
+
+    def write(self, text):
+        with self._renderer.lock:
+            self._buffer += text
+            if "\n" not in self._buffer:
+                return len(text)
+            lines, self._buffer = self._buffer.rsplit("\n", 1)
+            self._renderer._clear()
+            self._stream.write(lines + "\n")
+            self._stream.flush()
+            self._renderer._draw()
+        return len(text)
+
+    def flush(self):
+        with self._renderer.lock:
+            if self._buffer:
+                self._renderer._clear()
+                self._stream.write(self._buffer)
+                self._buffer = ""
+                self._stream.flush()
+                self._renderer._draw()
+            self._stream.flush()
+
+    def __getattr__(self, name):
+        return getattr(self._stream, name)
+
+class ProgressRenderer:
+
+    def __init__(self):
+        self.events = queue.SimpleQueue()
+        self.lock = threading.RLock()
+        self.active = False
+        self.users = 0
+        self.jobs = {}
+        self.done_jobs = 0
+        self.done_bytes = 0
+        self.pending = None
+        self.started = None
+        self._lines = []
+        self._drawn = 0
+        self._thread = None
+        self._stop = threading.Event()
+        self._stdout = None
+        self._stderr = None
+        self._tty = False
+
+    # -------- hook 쪽 (가벼운 작업만) --------
+    def push(self, d):
+        if not self.active:
             return
+        info = d.get("info_dict") or {}
+        self.events.put((
+            d.get("filename") or info.get("id"),
+            d["status"],
+            info.get("title") or info.get("id") or "",
+            d.get("downloaded_bytes") or 0,
+            d.get("total_bytes") or d.get("total_bytes_estimate"),
+            d.get("speed"),
+            time.monotonic(),
+        ))
+
+    def set_pending(self, fn):
+        # 대기 작업 수를 돌려주는 함수 (queue ETA 계산용)
+        self.pending = fn
+
+    # -------- 시작 / 종료 --------
+    def start(self):
+        with self.lock:
+            self.users += 1
+            if self.users > 1:
+                return
 
-        url = task["url"]
-        convert = task["convert"]
-
-        download_video(url, download_dir, convert_to=convert)
-        q.task_done()
-
-def process_download_queue(tasks, download_dir, threads=3):
-    print_header("멀티 다운로드 큐 실행")
-    q = queue.Queue()
+            self.jobs.clear()
+            self.done_jobs = 0
+            self.done_bytes = 0
+            self.started = time.monotonic()
+            self._stop.clear()
+            self._tty = sys.stdout.isatty()
+
+            if self._tty:
+                self._stdout = sys.stdout
+                sys.stdout = _ProgressStdout(self, self._stdout)
+                # stderr도 같은 터미널이면 블록을 지운 뒤 출력
+                if sys.stderr.isatty():
+                    self._stderr = sys.stderr
+                    sys.stderr = _ProgressStdout(self, self._stderr)
+
+            self.active = True
+
+        self._thread = threading.Thread(target=self._run, name="progress", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        with self.lock:
+            self.users -= 1
+            if self.users > 0:
+                return
+            self.active = False
+
+        self._stop.set()
+        self._thread.join()
+        self._drain()
+
+        with self.lock:
+            if self._tty:
+                sys.stdout.flush()
+                self._clear()
+                sys.stdout = self._stdout
+                if self._stderr:
+                    sys.stderr.flush()
+                    sys.stderr, self._stderr = self._stderr, None
+                self._lines = []
+            self.pending = None
+
+        if self.done_jobs:
+            print(self._total_line(time.monotonic()))
+
+    # -------- 렌더러 스레드 --------
+    def _run(self):
+        interval = PROGRESS_REFRESH if self._tty else PROGRESS_LOG_INTERVAL
+
+        while not self._stop.wait(interval):
+            self._drain()
+            if self._tty:
+                with self.lock:
+                    self._clear()
+                    self._lines = self._build_lines()
+                    self._draw()
+            else:
+                print(self._total_line(time.monotonic()), flush=True)
 
-    for t in tasks:
-        q.put(t)
+    def _drain(self):
+        while True:
+            try:
+                key, status, title, downloaded, total, speed, ts = self.events.get_nowait()
+            except queue.Empty:
+                return
 
-    for _ in range(threads):
-        th = threading.Thread(target=worker_download, args=(q, download_dir))
-        th.daemon = True
-        th.start()
+            if status == "downloading":
+                job = self.jobs.setdefault(key, {"title": title})
+                job.update(downloaded=downloaded, total=total, speed=speed, ts=ts)
+            else:
+                job = self.jobs.pop(key, None)
+                if status == "finished":
+                    self.done_jobs += 1
+                    self.done_bytes += total or downloaded or (job or {}).get("downloaded") or 0
+
+    def _totals(self, now):
+        active = [j for j in self.jobs.values() if now - j["ts"] < PROGRESS_STALE]
+        speed = sum(j["speed"] or 0 for j in active)
+        active_done = sum(j["downloaded"] for j in self.jobs.values())
+        remaining = sum(max((j["total"] or 0) - j["downloaded"], 0) for j in self.jobs.values())
+
+        # 대기 작업은 완료된 작업의 평균 크기로 추정
+        pending = self.pending() if self.pending else 0
+        if pending and self.done_jobs:
+            remaining += pending * self.done_bytes / self.done_jobs
+
+        eta = remaining / speed if speed else None
+        return speed, self.done_bytes + active_done, remaining, eta, pending
+
+    def _total_line(self, now):
+        speed, done, remaining, eta, pending = self._totals(now)
+        return (
+            f"[진행] 다운로드 {len(self.jobs)} | 완료 {self.done_jobs} | 대기 {pending} | "
+            f"{format_size(speed)}/s | {format_size(done)} 완료 | {format_size(remaining)} 남음 | "
+            f"ETA {format_eta(eta)} | 경과 {format_eta(now - self.started)}"
+        )
 
-    q.join()
-    print("모든 다운로드가 완료되었습니다.")
+    def _build_lines(self):
+        now = time.monotonic()
+        width = shutil.get_terminal_size((100, 20)).columns - 1
+        jobs = sorted(self.jobs.values(), key=lambda j: -j["ts"])
+
+        lines = []
+        for job in jobs[:PROGRESS_MAX_LINES]:
+            total = job["total"]
+            percent = f"{job['downloaded'] / total * 100:5.1f}%" if total else "  ?  %"
+            eta = (total - job["downloaded"]) / job["speed"] if total and job["speed"] else None
+            line = (
+                f"  {percent} {format_size(job['downloaded']):>10} / {format_size(total):>10} "
+                f"{format_size(job['speed']):>10}/s ETA {format_eta(eta)}  {job['title']}"
+            )
+            lines.append(fit_width(line, width))
+
+        if len(jobs) > PROGRESS_MAX_LINES:
+            lines.append(f"  ... 외 {len(jobs) - PROGRESS_MAX_LINES}개")
+
+        lines.append(fit_width(self._total_line(now), width))
+        return lines
+
+    # 아래 두 함수는 self.lock 안에서만 호출
+    def _clear(self):
+        if self._drawn:
+            self._stdout.write(f"\033[{self._drawn}A\r\033[J")
+            self._stdout.flush()
+            self._drawn = 0
+
+    def _draw(self):
+        if self._lines:
+            self._stdout.write("\n".join(self._lines) + "\n")
+            self._stdout.flush()
+            self._drawn = len(self._lines)
+
+progress = ProgressRenderer()
+
+class progress_display:
+    # with progress_display(): ... (중첩 사용 가능)
+
+    def __enter__(self):
+        progress.start()
+        return progress
+
+    def __exit__(self, *exc):
+        progress.stop()
 
 # ------------------------------------------------------------
-# 다운로드 저장 위치 선택
+#  대역폭 관리 (전체 워커 공유)
 # ------------------------------------------------------------
-def select_download_path():
+# 모든 YoutubeDL 인스턴스의 progress_hook에서 호출 → 다운로드 스레드를 잠시 재워 속도 제한
+# - 시간대별 프로필 (예: 09:00~18:00 20Mbit/s, 그 외 무제한)
+# - 프로필 파일이 바뀌면 실행 중에도 바로 반영 (작업 재시작 없음)
+# - 활성 작업 간 공정 분배: 제한보다 느린 작업의 남는 몫은 나머지 작업이 나눠 씀
+#
+# bandwidth.json 예시
+#   {"default": null,
+#    "profiles": [{"start": "09:00", "end": "18:00", "rate": "20M"}]}
+#   rate: bit/s ("20M" = 20 Mbit/s, "500K", 숫자, null = 무제한)
+BANDWIDTH_PROFILE_PATH = os.path.join(STATE_DIR, "bandwidth.json")
+BANDWIDTH_RELOAD_INTERVAL = 5   # 프로필 파일 변경 확인 주기 (초)
+BANDWIDTH_ACTIVE_WINDOW = 2     # 이 시간(초) 안에 진행 이벤트가 있으면 활성 작업
+BANDWIDTH_MAX_SLEEP = 5         # 한 번에 최대 대기 시간 (초) - 설정 변경이 빨리 반영되도록
+BANDWIDTH_BLOCK_SIZE = 256 * 1024
+
+def parse_rate(value):
+    # bit/s 표기 → bytes/s (None = 무제한)
+    if value in (None, "", "unlimited", 0):
+        return None
+    if isinstance(value, (int, float)):
+        return value / 8
+
+    m = re.fullmatch(r"\s*([\d.]+)\s*([kKmMgG]?)(?:bit|bps|b)?(?:/s)?\s*", str(value))
+    if not m:
+        raise ValueError(f"잘못된 대역폭 값: {value}")
+
+    scale = {"": 1, "k": 1e3, "m": 1e6, "g": 1e9}[m.group(2).lower()]
+    return float(m.group(1)) * scale / 8
+
+def parse_clock(text):
+    hour, minute = text.split(":")
+    return int(hour) * 60 + int(minute)
+
+class BandwidthManager:
+
+    def __init__(self, profile_path=BANDWIDTH_PROFILE_PATH):
+        self.profile_path = profile_path
+        self.lock = threading.Lock()
+        self.override = None            # set_rate()로 지정한 값 (프로필보다 우선)
+        self.default = None
+        self.profiles = []
+        self.jobs = {}
+        self._mtime = None
+        self._checked = 0
+
+    # -------- 설정 --------
+    def set_rate(self, rate):
+        # 실행 중 즉시 변경 (bit/s 표기, None = 프로필 사용)
+        with self.lock:
+            self.override = parse_rate(rate) if rate is not None else None
+
+    def load_profiles(self, path=None):
+        if path:
+            self.profile_path = path
+        self._checked = 0
+        self._reload(time.monotonic())
+
+    def configured(self):
+        self._reload(time.monotonic())
+        return bool(self.override or self.default or self.profiles)
+
+    def _reload(self, now):
+        if now - self._checked < BANDWIDTH_RELOAD_INTERVAL:
+            return
+        self._checked = now
 
-    paths = build_download_paths()
+        try:
+            mtime = os.path.getmtime(self.profile_path)
+        except OSError:
+            return
+        if mtime == self._mtime:
+            return
 
-    print("\n다운로드 저장 위치를 선택하세요:\n")
+        try:
+            with open(self.profile_path, encoding="utf-8") as f:
+                config = json.load(f)
+            profiles = [
+                (parse_clock(p["start"]), parse_clock(p["end"]), parse_rate(p.get("rate")))
+                for p in config.get("profiles", [])
+            ]
+            default = parse_rate(config.get("default"))
+        except Exception as e:
+            print(f"[WARN] 대역폭 프로필 읽기 실패: {e}")
+            return
 
-    for i, (path, free, label) in enumerate(paths):
+        with self.lock:
+            self.profiles, self.default, self._mtime = profiles, default, mtime
+        print(f"[INFO] 대역폭 프로필 적용: {self.profile_path}")
+
+    def current_rate(self):
+        if self.override:
+            return self.override
+
+        t = time.localtime()
+        minute = t.tm_hour * 60 + t.tm_min
+        for start, end, rate in self.profiles:
+            # 자정을 넘는 구간 (예: 22:00~06:00) 지원
+            inside = start <= minute < end if start <= end else (minute >= start or minute < end)
+            if inside:
+                return rate
+
+        return self.default
+
+    # -------- progress_hook --------
+    def throttle(self, d, owner=None):
+        # owner: 진행 이벤트를 보낸 YoutubeDL (id) - 오류로 끝나 finished 이벤트가 없는 항목은 release()로 제거
+        key = (owner, d.get("filename"))
+        if d["status"] != "downloading":
+            with self.lock:
+                self.jobs.pop(key, None)
+            return
 
-        label_str = f"[{label}] " if label else ""
-        print(f"{i+1}. {label_str}{path} ({format_size(free)} free)")
+        now = time.monotonic()
+        self._reload(now)
+        rate = self.current_rate()
+        downloaded = d.get("downloaded_bytes") or 0
 
-    custom_index = len(paths) + 1
-    print(f"{custom_index}. 직접 입력")
+        with self.lock:
+            job = self.jobs.get(key)
+            if job is None or downloaded < job["bytes"]:
+                self.jobs[key] = {"bytes": downloaded, "next": now, "ts": now, "rate": 0, "throttled": False}
+                return
 
-    print("\n번호를 입력하세요 (엔터=기본값): ", end="")
-    choice = safe_input().strip()
+            delta = downloaded - job["bytes"]
+            elapsed = now - job["ts"]
+            job["bytes"], job["ts"] = downloaded, now
+            if elapsed > 0:
+                job["rate"] = 0.7 * job["rate"] + 0.3 * delta / elapsed
 
-    if not choice:
-        return paths[0][0]
+            if not rate:
+                job["throttled"] = False
+                return
 
-    if choice.isdigit():
+            share = self._fair_share(rate, now, key)
+            job["next"] = max(job["next"], now) + delta / share
+            wait = job["next"] - now
+            job["throttled"] = wait > 0
 
-        index = int(choice)
+        if wait > 0:
+            time.sleep(min(wait, BANDWIDTH_MAX_SLEEP))
 
-        if 1 <= index <= len(paths):
-            return paths[index - 1][0]
+    def release(self, ydl):
+        # 이 인스턴스의 다운로드가 끝남 (정상 / 오류 / 취소) → 남은 항목 제거
+        owner = id(ydl)
+        with self.lock:
+            for key in [key for key in self.jobs if key[0] == owner]:
+                del self.jobs[key]
 
-        if index == custom_index:
-            custom = safe_input("다운로드 경로 : ").strip()
-            if custom:
-                return custom
+    def _fair_share(self, rate, now, key):
+        # max-min 공정 분배: 제한에 걸리지 않은(느린) 작업은 실제 속도만큼, 나머지는 균등
+        active = [(k, j) for k, j in self.jobs.items() if now - j["ts"] < BANDWIDTH_ACTIVE_WINDOW]
+        slow = sorted(j["rate"] for k, j in active if k != key and not j["throttled"])
+        count = len(active)
 
-    print("잘못된 입력입니다. 기본값을 사용합니다.")
-    return paths[0][0]
+        remaining = rate
+        for r in slow:
+            if r >= remaining / count:
+                break
+            remaining -= r
+            count -= 1
+
+        return max(remaining / max(count, 1), 1024)
+
+bandwidth = BandwidthManager()
 
 # ------------------------------------------------------------
-# 초기화
-# ------------------------------------------------------------
-def initialize_environment():
-    global YoutubeDL
+#  다운로드 자동 튜닝 (조각 동시 다운로드 수 / HTTP 청크 크기)
+# ------------------------------------------------------------
+# 스트림 하나를 받을 때마다 처리량을 재서 호스트/프로토콜별로 설정값을 조정:
+#   처리량이 좋아지면 한 단계 올려서 다시 시도, 나빠지거나 재시도/오류가 나면 최고 기록값으로 후퇴.
+#   더 나아지지 않으면 최고 기록값에 머물다가 TUNE_SETTLE_STREAMS 개마다 한 단계 위를 다시 확인.
+# DASH/HLS(native)  → concurrent_fragment_downloads (조각 동시 다운로드 수)
+# 단일 파일(http)   → http_chunk_size (긴 요청 하나가 속도 제한에 걸리지 않도록 Range 단위로 나눔)
+# 결과는 .state/tuning.json 에 저장 → 다음 실행의 같은 호스트/프로토콜에 바로 적용.
+# 옵션에 직접 지정한 값이 있으면 튜닝하지 않음.
+TUNE_ENABLED = os.environ.get("YTDL_AUTOTUNE", "1") != "0"
+TUNE_STATE_PATH = os.path.join(STATE_DIR, "tuning.json")
+TUNE_MIN_BYTES = 2 * 1024 * 1024   # 이보다 작은 스트림은 처리량 측정에서 제외 (연결 시간에 좌우됨)
+TUNE_GAIN = 0.08                   # 최고 기록보다 8% 이상 빨라야 개선으로 봄
+TUNE_THROTTLE_RATIO = 0.5          # 최고 기록의 절반 미만 → 속도 제한으로 보고 후퇴
+TUNE_SETTLE_STREAMS = 20           # 최고값에 머문 뒤 다시 한 단계 위를 확인하기까지의 스트림 수
+TUNE_EWMA = 0.3                    # 같은 설정값의 처리량 기록 갱신 비율
+
+# 프로토콜 계열 → (yt-dlp 옵션, 최소, 최대, 시작값)
+TUNE_PARAMS = {
+    "fragment": ("concurrent_fragment_downloads", 1, 16, 2),
+    "http": ("http_chunk_size", 1024 * 1024, 64 * 1024 * 1024, 8 * 1024 * 1024),
+}
+TUNE_PROTOCOLS = {
+    "http": "http",
+    "https": "http",
+    "http_dash_segments": "fragment",
+    "m3u8_native": "fragment",
+}
+
+def tune_key(info):
+    # 반환: (호스트/프로토콜 키, 프로토콜 계열) - 튜닝 대상이 아니면 (None, None)
+    family = TUNE_PROTOCOLS.get(info.get("protocol"))
+    url = info.get("fragment_base_url") or info.get("url") or ""
+    host = urllib.parse.urlsplit(url).hostname
+    if family is None or not host:
+        return None, None
+
+    # rr3---sn-xxxx.googlevideo.com 처럼 스트림마다 바뀌는 하위 호스트는 묶음
+    if not re.fullmatch(r"[\d.]+|[0-9a-f:]+", host):
+        host = ".".join(host.split(".")[-2:])
+    return f"{host}/{family}", family
+
+class DownloadTuner:
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.enabled = TUNE_ENABLED
+        self.state = None
+
+    def _load(self):
+        if self.state is None:
+            try:
+                with open(self.path, encoding="utf-8") as f:
+                    self.state = json.load(f)
+            except (OSError, ValueError):
+                self.state = {}
+        return self.state
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.state, f, indent=2, sort_keys=True)
+        os.replace(tmp, self.path)
+
+    def _entry(self, key, family):
+        _, low, high, start = TUNE_PARAMS[family]
+        entry = self._load().setdefault(key, {"value": start, "best": start, "best_rate": 0.0, "settle": 0})
+        entry["value"] = min(high, max(low, entry["value"]))
+        return entry
+
+    def settings(self, key, family):
+        with self.lock:
+            return self._entry(key, family)["value"]
+
+    def record(self, key, family, value, nbytes, elapsed, failed):
+        _, low, high, _ = TUNE_PARAMS[family]
+        rate = nbytes / elapsed if elapsed > 0 else 0.0
+
+        # 작은 스트림은 처리량이 의미 없음 (실패는 반영)
+        if not failed and nbytes < TUNE_MIN_BYTES:
+            return
+
+        with self.lock:
+            entry = self._entry(key, family)
+            before = entry["value"]
+
+            throttled = entry["best_rate"] and rate < entry["best_rate"] * TUNE_THROTTLE_RATIO
+            if failed or throttled:
+                # 재시도/오류/급격한 속도 저하 → 최고 기록값으로 (최고값에서 났으면 절반으로) 후퇴
+                if value > entry["best"]:
+                    entry["value"] = entry["best"]
+                else:
+                    entry["value"] = entry["best"] = max(low, value // 2)
+                    entry["best_rate"] = 0.0
+                entry["settle"] = -TUNE_SETTLE_STREAMS     # 한동안 올리지 않음
+            elif rate > entry["best_rate"] * (1 + TUNE_GAIN):
+                # 올린 값이 더 빠름 → 기록하고 한 단계 더 위를 시도
+                # (최고값 그대로인데 빨라진 것은 네트워크 변동 → 기록만)
+                probing = value != entry["best"] or not entry["best_rate"]
+                entry["best"], entry["best_rate"] = value, rate
+                entry["value"] = value
+                if probing and entry["settle"] >= 0:
+                    entry["value"] = min(high, value * 2)
+                    entry["settle"] = 0
+                else:
+                    entry["settle"] += 1
+            else:
+                if value == entry["best"]:
+                    entry["best_rate"] += (rate - entry["best_rate"]) * TUNE_EWMA
+
+                # 개선 없음 → 최고 기록값에 머물다가 주기적으로 한 단계 위 재확인
+                entry["value"] = entry["best"]
+                entry["settle"] += 1
+                if entry["settle"] >= TUNE_SETTLE_STREAMS and entry["best"] < high:
+                    entry["value"] = min(high, entry["best"] * 2)
+                    entry["settle"] = 0
+
+            entry["updated"] = time.time()
+            changed = entry["value"] != before
+            self._save()
+
+        if changed:
+            name = TUNE_PARAMS[family][0]
+            shown = format_size(entry["value"]) if family == "http" else entry["value"]
+            print(f"\n[INFO] 자동 튜닝 {key}: {name} → {shown} ({format_size(rate)}/s)")
+
+    def attach(self, ydl):
+        # 스트림 다운로드(YoutubeDL.dl) 직전에 설정값 적용, 끝나면 처리량 기록
+        if not self.enabled:
+            return
+
+        dl = ydl.dl
+
+        def tuned_dl(name, info, subtitle=False, test=False):
+            key, family = tune_key(info)
+            param = TUNE_PARAMS[family][0] if family else None
+            if key is None or subtitle or test or name == "-" or ydl.params.get(param):
+                return dl(name, info, subtitle, test)
+
+            value = self.settings(key, family)
+            part = f"{name}.part"
+            resumed = os.path.getsize(part) if os.path.exists(part) else 0
+            logger = ydl.params.get("logger")
+            retries = getattr(logger, "retries", 0)
+
+            ydl.params[param] = value
+            start = time.perf_counter()
+            ok = False
+            try:
+                ok = dl(name, info, subtitle, test)
+                return ok
+            finally:
+                ydl.params.pop(param, None)
+                elapsed = time.perf_counter() - start
+                nbytes = max(0, os.path.getsize(name) - resumed) if ok and os.path.exists(name) else 0
+                failed = not ok or getattr(logger, "retries", 0) > retries
+                self.record(key, family, value, nbytes, elapsed, failed)
+
+        ydl.dl = tuned_dl
+
+    def summary(self):
+        with self.lock:
+            state = dict(self._load())
+
+        result = {}
+        for key, entry in sorted(state.items()):
+            family = key.rsplit("/", 1)[-1]
+            value = format_size(entry["best"]) if family == "http" else entry["best"]
+            result[key] = f"{value} ({format_size(entry['best_rate'])}/s)"
+        return result
+
+tuner = DownloadTuner(TUNE_STATE_PATH)
+
+# ------------------------------------------------------------
+#  성능 지표 (metrics)
+# ------------------------------------------------------------
+# 작업의 단계(phase)별 span 기록
+#   extract / download(스트림별) / merge / convert / postprocess / job / playlist
+# - JSONL 파일 : span 한 줄씩 기록 (--metrics)
+# - HTTP       : Prometheus 텍스트 형식 counter/histogram (--metrics-port)
+METRICS_DURATION_BUCKETS = (0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800)
+METRICS_THROUGHPUT_BUCKETS = (
+    128 * 1024, 512 * 1024, 1024 ** 2, 4 * 1024 ** 2, 16 * 1024 ** 2, 64 * 1024 ** 2,
+)
+PP_PHASES = {"Merger": "merge", "ExtractAudio": "convert", "VideoConvertor": "convert"}
+
+class MetricsRecorder:
+
+    def __init__(self):
+        self.enabled = False
+        self.lock = threading.Lock()
+        self.file = None
+        self.counters = {}
+        self.histograms = {}
+        self.streams = {}
+        self.pps = {}
+
+    def configure(self, path=None, port=None):
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self.file = open(path, "a", encoding="utf-8", buffering=1)
+        if port:
+            self.serve(port)
+        self.enabled = bool(path or port)
+
+    # -------- span 기록 --------
+    def record(self, phase, start, outcome="ok", duration=None, **attrs):
+        if not self.enabled:
+            return
+
+        if duration is None:
+            duration = time.time() - start
+        span = {"ts": round(start, 3), "phase": phase, "duration": round(duration, 3), "outcome": outcome, **attrs}
+
+        nbytes = attrs.get("bytes")
+        if nbytes and duration > 0:
+            span["avg_bps"] = round(nbytes / duration)
+
+        with self.lock:
+            if self.file:
+                self.file.write(json.dumps(span, ensure_ascii=False) + "\n")
+
+            self._inc("ytdl_spans_total", (phase, outcome))
+            self._inc("ytdl_bytes_total", (phase,), nbytes or 0)
+            self._inc("ytdl_retries_total", (phase,), attrs.get("retries") or 0)
+            self._observe("ytdl_phase_duration_seconds", phase, duration, METRICS_DURATION_BUCKETS)
+            if span.get("avg_bps"):
+                self._observe("ytdl_throughput_bytes_per_second", phase, span["avg_bps"], METRICS_THROUGHPUT_BUCKETS)
+
+    class _Span:
+
+        def __init__(self, recorder, phase, attrs):
+            self.recorder = recorder
+            self.phase = phase
+            self.attrs = attrs
+
+        def __enter__(self):
+            self.start = time.time()
+            return self.attrs
+
+        def __exit__(self, exc_type, exc, tb):
+            outcome = self.attrs.pop("outcome", None) or ("error" if exc_type else "ok")
+            if exc_type:
+                self.attrs["error"] = f"{exc_type.__name__}: {exc}"
+            self.recorder.record(self.phase, self.start, outcome, **self.attrs)
+
+    def span(self, phase, **attrs):
+        # with metrics.span("extract", url=url) as attrs: attrs["bytes"] = ...
+        return self._Span(self, phase, attrs)
+
+    # -------- yt-dlp hook --------
+    def on_progress(self, d, logger):
+        key = d.get("filename")
+        info = d.get("info_dict") or {}
+
+        with self.lock:
+            stream = self.streams.get(key)
+            if stream is None:
+                stream = self.streams[key] = {"start": time.time(), "peak": 0, "retries": logger.retries}
+            stream["peak"] = max(stream["peak"], d.get("speed") or 0)
+
+        if d["status"] in ("finished", "error"):
+            with self.lock:
+                self.streams.pop(key, None)
+            self.record(
+                "download", stream["start"], "ok" if d["status"] == "finished" else "error",
+                video_id=info.get("id"), url=info.get("webpage_url"),
+                format_id=info.get("format_id"), protocol=info.get("protocol"),
+                bytes=d.get("total_bytes") or d.get("downloaded_bytes") or 0,
+                peak_bps=round(stream["peak"]), retries=logger.retries - stream["retries"],
+            )
+
+    def on_postprocess(self, d, logger):
+        # 파일 이동(MoveFiles)은 단계로 보지 않음
+        if d.get("postprocessor") == "MoveFiles":
+            return
+
+        info = d.get("info_dict") or {}
+        key = (d.get("postprocessor"), info.get("id"), threading.get_ident())
+
+        if d["status"] == "started":
+            with self.lock:
+                self.pps[key] = time.time()
+            return
+
+        with self.lock:
+            start = self.pps.pop(key, None)
+        if start is None:
+            return
+
+        path = info.get("filepath")
+        self.record(
+            PP_PHASES.get(d.get("postprocessor"), "postprocess"), start,
+            video_id=info.get("id"), url=info.get("webpage_url"), postprocessor=d.get("postprocessor"),
+            bytes=os.path.getsize(path) if path and os.path.exists(path) else 0,
+        )
+
+    # -------- Prometheus --------
+    def _inc(self, name, labels, value=1):
+        self.counters[(name, labels)] = self.counters.get((name, labels), 0) + value
+
+    def _observe(self, name, phase, value, buckets):
+        hist = self.histograms.setdefault((name, phase), {"buckets": [0] * len(buckets), "le": buckets, "sum": 0, "count": 0})
+        for i, bound in enumerate(buckets):
+            if value <= bound:
+                hist["buckets"][i] += 1
+        hist["sum"] += value
+        hist["count"] += 1
+
+    def prometheus_text(self):
+        label_names = {"ytdl_spans_total": ("phase", "outcome")}
+        lines = []
+
+        with self.lock:
+            for name in sorted({n for n, _ in self.counters}):
+                lines.append(f"# TYPE {name} counter")
+                for (n, labels), value in sorted(self.counters.items()):
+                    if n != name:
+                        continue
+                    names = label_names.get(name, ("phase",))
+                    label_text = ",".join(f'{k}="{v}"' for k, v in zip(names, labels))
+                    lines.append(f"{name}{{{label_text}}} {value}")
+
+            for name in sorted({n for n, _ in self.histograms}):
+                lines.append(f"# TYPE {name} histogram")
+                for (n, phase), hist in sorted(self.histograms.items()):
+                    if n != name:
+                        continue
+                    for bound, count in zip(hist["le"], hist["buckets"]):
+                        lines.append(f'{name}_bucket{{phase="{phase}",le="{bound}"}} {count}')
+                    lines.append(f'{name}_bucket{{phase="{phase}",le="+Inf"}} {hist["count"]}')
+                    lines.append(f'{name}_sum{{phase="{phase}"}} {hist["sum"]}')
+                    lines.append(f'{name}_count{{phase="{phase}"}} {hist["count"]}')
+
+        return "\n".join(lines) + "\n"
+
+    def serve(self, port, host="127.0.0.1"):
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        recorder = self
+
+        class Handler(BaseHTTPRequestHandler):
+
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = recorder.prometheus_text().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+        print(f"[INFO] metrics: http://{host}:{port}/metrics")
+        return server
+
+metrics = MetricsRecorder()
+
+# ------------------------------------------------------------
+# 저장 공간 자동 배치
+# ------------------------------------------------------------
+# 작업별 예상 크기(선택 포맷의 filesize + 병합 임시 파일 여유분)를 볼륨에 예약.
+# 지정 경로에 들어가지 않으면 남은 공간(여유 - 예약)이 가장 큰 볼륨으로 이동,
+# 어디에도 없으면 진행 중인 작업이 끝날 때까지 대기.
+SPACE_MARGIN = int(os.environ.get("YTDL_SPACE_MARGIN", 1 << 30))   # 볼륨마다 항상 남겨둘 공간
+SPACE_CRITICAL = 256 << 20        # 다운로드 중 이 이하로 떨어지면 중단 → 다른 볼륨
+SPACE_MERGE_FACTOR = 2.0          # 병합/변환 중에는 입력 + 출력이 동시에 존재
+SPACE_UNKNOWN_SIZE = 512 << 20    # 크기 정보가 없는 작업의 예상 크기
+SPACE_WAIT_TIMEOUT = 30 * 60
+SPACE_POLL_INTERVAL = 10
+SPACE_GUARD_INTERVAL = 2
+MP3_BYTES_PER_SEC = 192_000 // 8
+
+class DiskSpaceError(Exception):
+    pass
+
+def existing_parent(path):
+    path = os.path.abspath(path)
+    while not os.path.exists(path):
+        parent = os.path.dirname(path)
+        if parent == path:
+            break
+        path = parent
+    return path
+
+def format_stream_size(fmt, duration):
+    size = fmt.get("filesize") or fmt.get("filesize_approx")
+    if not size and fmt.get("tbr") and duration:
+        size = fmt["tbr"] * 1000 / 8 * duration
+    return size or 0
+
+def estimate_job_size(info, format_ids=None, convert=None):
+    duration = info.get("duration") or 0
+
+    if format_ids:
+        by_id = {f.get("format_id"): f for f in info.get("formats") or []}
+        fmts = [by_id.get(fid) or {} for fid in format_ids]
+    else:
+        fmts = info.get("requested_formats") or [info]
+
+    streams = sum(format_stream_size(f, duration) for f in fmts)
+    if not streams:
+        return SPACE_UNKNOWN_SIZE
+
+    peak = streams * SPACE_MERGE_FACTOR if len(fmts) > 1 else streams
+    if convert == "mp3":
+        peak = max(peak, streams + duration * MP3_BYTES_PER_SEC)
+    elif convert == "mp4":
+        peak = max(peak, streams * SPACE_MERGE_FACTOR)
+
+    return int(peak)
+
+class VolumePlacer:
+    def __init__(self):
+        self.cond = threading.Condition()
+        self.roots = []         # 자동 배치 후보 (비어 있으면 지정 경로만 사용)
+        self.reserved = {}      # st_dev → 예약 바이트
+        self.tokens = {}        # 예약 ID → (st_dev, 바이트)
+        self.next_token = 1
+
+    def configure(self, roots):
+        self.roots = list(dict.fromkeys(roots or []))
+
+    def enabled(self):
+        return bool(self.roots)
+
+    def available(self, path):
+        base = existing_parent(path)
+        free = get_free_space(base)
+        if free is None:
+            return None, None
+        dev = os.stat(base).st_dev
+        # 예약/여유 공간은 자동 배치에서만 (그 외에는 지금 남은 공간에 들어가는지만 확인)
+        if not self.enabled():
+            return dev, free
+        return dev, free - self.reserved.get(dev, 0) - SPACE_MARGIN
+
+    def _pick(self, nbytes, preferred, exclude):
+        if preferred and preferred not in exclude:
+            dev, avail = self.available(preferred)
+            # 공간 조회 불가 (네트워크 드라이브 등) → 검사 생략
+            if avail is None or avail >= nbytes:
+                return preferred, dev
+
+        best = None
+        for root in self.roots:
+            if root in exclude or root == preferred:
+                continue
+            dev, avail = self.available(root)
+            if avail is not None and avail >= nbytes and (best is None or avail > best[2]):
+                best = (root, dev, avail)
+
+        return best[:2] if best else (None, None)
+
+    def place(self, nbytes, preferred=None, exclude=()):
+        deadline = time.monotonic() + SPACE_WAIT_TIMEOUT
+        waiting = False
+
+        with self.cond:
+            while True:
+                root, dev = self._pick(nbytes, preferred, exclude)
+
+                if root:
+                    token = self.next_token
+                    self.next_token += 1
+                    self.tokens[token] = (dev, nbytes)
+                    if dev is not None:
+                        self.reserved[dev] = self.reserved.get(dev, 0) + nbytes
+                    if preferred and root != preferred:
+                        print(f"\n[WARN] 저장 공간 부족: {preferred} → {root} 로 이동")
+                    return root, token
+
+                # 자동 배치가 아니면 바로 실패 (대화형 다운로드가 30분 동안 멈춰 있지 않도록)
+                if not self.enabled():
+                    free = get_free_space(existing_parent(preferred)) if preferred else None
+                    raise DiskSpaceError(
+                        f"저장 공간 부족: {preferred} (필요 {format_size(nbytes)}"
+                        f"{f', 남은 공간 {format_size(free)}' if free is not None else ''})"
+                        f" → 다른 폴더를 선택하거나 --auto-place 사용"
+                    )
+
+                # 진행 중인 작업이 없으면 기다려도 공간이 생기지 않음
+                remaining = deadline - time.monotonic()
+                if not self.tokens or remaining <= 0:
+                    raise DiskSpaceError(f"저장 공간 부족 (필요 {format_size(nbytes)})")
+
+                if not waiting:
+                    print(f"\n[WARN] 저장 공간 부족 → 진행 중인 작업 완료까지 대기 (필요 {format_size(nbytes)})")
+                    waiting = True
+                self.cond.wait(min(SPACE_POLL_INTERVAL, remaining))
+
+    def release(self, token):
+        with self.cond:
+            dev, nbytes = self.tokens.pop(token, (None, 0))
+            if dev is not None:
+                self.reserved[dev] -= nbytes
+            self.cond.notify_all()
+
+placer = VolumePlacer()
+
+def space_guard(partial=None):
+    state = {"checked": 0.0}
+
+    # 다운로드 중 공간이 임계치 아래로 떨어지면 디스크가 차기 전에 중단
+    def hook(d):
+        path = d.get("tmpfilename") or d.get("filename")
+        if partial is not None:
+            partial.update(p for p in (d.get("tmpfilename"), d.get("filename")) if p)
+
+        if d["status"] != "downloading" or not path:
+            return
+
+        now = time.monotonic()
+        if now - state["checked"] < SPACE_GUARD_INTERVAL:
+            return
+        state["checked"] = now
+
+        free = get_free_space(existing_parent(os.path.dirname(path)))
+        if free is not None and free < SPACE_CRITICAL:
+            # yt-dlp가 예외를 삼켜도 호출한 쪽에서 확인할 수 있도록 남겨둠
+            hook.error = DiskSpaceError(f"{os.path.dirname(path)}: 남은 공간 {format_size(free)}")
+            raise hook.error
+
+    hook.error = None
+    return hook
+
+def remove_partial(paths):
+    for p in paths:
+        for candidate in (p, p + ".part"):
+            try:
+                os.remove(candidate)
+            except OSError:
+                pass
+
+# ------------------------------------------------------------
+# 스테이징 (빠른 로컬 디스크에서 받고 → 느린 외장/NAS 볼륨으로 이동)
+# ------------------------------------------------------------
+# --staging DIR: 멀티 다운로드 큐의 다운로드(.part / 조각)와 병합/변환을 빠른 로컬 디스크에서 하고,
+# 끝난 파일만 백그라운드 이동 스레드가 최종 위치로 큰 단위 순차 쓰기로 복사.
+#   - 복사: copy_file_range → sendfile → read/write 중 되는 방법 (앞의 둘은 커널 안에서 복사)
+#   - 확인: 크기 + 체크섬(BLAKE2b, 복사본은 페이지 캐시를 비우고 디스크에서 다시 읽음) → 일치하면 원본 삭제
+#   - 이동 스레드는 대상 디스크(st_dev)마다 하나 → 같은 디스크에는 순차 쓰기, 다른 디스크끼리는 동시에
+#   - 스테이징 공간 한도(--staging-limit): 예약 합계가 한도를 넘으면 이동이 끝날 때까지 대기,
+#     STAGING_WAIT_TIMEOUT 안에 자리가 나지 않으면 그 작업은 최종 위치에 바로 받음
+# 최종 위치가 스테이징과 같은 디스크면 스테이징하지 않음.
+STAGING_DIR = os.environ.get("YTDL_STAGING") or None
+STAGING_VERIFY = os.environ.get("YTDL_STAGING_VERIFY", "checksum")     # checksum / size
+STAGING_COPY_CHUNK = 64 * 1024 * 1024
+STAGING_HASH_BLOCK = 8 * 1024 * 1024
+STAGING_COPY_ATTEMPTS = 2
+STAGING_WAIT_TIMEOUT = 10 * 60
+# 커널 안 복사가 안 되는 조합 (다른 파일 시스템, 지원 안 하는 FS/커널) → 다음 복사 방법으로
+COPY_FALLBACK_ERRNOS = {errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP, errno.EBADF}
+
+def parse_size(value):
+    # "50G", "512M", "1.5T", 숫자(바이트) → 바이트 (1024 단위)
+    m = re.fullmatch(r"\s*([\d.]+)\s*([kKmMgGtT]?)(?:i?[bB])?\s*", str(value))
+    if not m:
+        raise ValueError(f"잘못된 크기 값: {value}")
+    return int(float(m.group(1)) * 1024 ** " kmgt".index(m.group(2).lower() or " "))
+
+def file_digest(path, drop_cache=False):
+    digest = hashlib.blake2b()
+    with open(path, "rb", buffering=0) as f:
+        if drop_cache and hasattr(os, "posix_fadvise"):
+            os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_DONTNEED)
+        for block in iter(lambda: f.read(STAGING_HASH_BLOCK), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def copy_file_fast(src, dst):
+    # 반환: 마지막으로 사용한 복사 방법
+    size = os.path.getsize(src)
+    methods = [name for name in ("copy_file_range", "sendfile") if hasattr(os, name)] + ["read"]
+    offset = 0
+
+    with open(src, "rb", buffering=0) as fin, open(dst, "wb", buffering=0) as fout:
+        while offset < size:
+            method = methods[0]
+            count = min(STAGING_COPY_CHUNK, size - offset)
+            try:
+                if method == "copy_file_range":
+                    copied = os.copy_file_range(fin.fileno(), fout.fileno(), count, offset, offset)
+                elif method == "sendfile":
+                    fout.seek(offset)
+                    copied = os.sendfile(fout.fileno(), fin.fileno(), offset, count)
+                else:
+                    fin.seek(offset)
+                    fout.seek(offset)
+                    copied = fout.write(fin.read(count))
+            except OSError as e:
+                if method == "read" or e.errno not in COPY_FALLBACK_ERRNOS:
+                    raise
+                methods.pop(0)
+                continue
+
+            if not copied:
+                raise OSError(f"복사 중단 ({offset}/{size} 바이트)")
+            offset += copied
+
+        os.fsync(fout.fileno())
+    return methods[0]
+
+class StagingArea:
+
+    def __init__(self):
+        self.root = None
+        self.limit = None       # 바이트 (None = 디스크 여유 공간 - SPACE_MARGIN)
+        self.cond = threading.Condition()
+        self.used = 0
+        self.tokens = {}        # 예약 ID → 바이트
+        self.next_token = 1
+        self.movers = {}        # 대상 st_dev → 이동 대기열
+        self.pending = 0
+        self.stats = {"files": 0, "bytes": 0, "seconds": 0.0, "failed": 0, "methods": collections.Counter()}
+
+    def enabled(self):
+        return self.root is not None
+
+    def configure(self, root, limit=None):
+        self.root = os.path.abspath(root)
+        self.limit = limit
+        os.makedirs(self.root, exist_ok=True)
+
+    def stage_dir(self, download_dir):
+        # 최종 위치별 작업 폴더 (다시 실행해도 같은 경로 → .part 이어받기). 같은 디스크면 None
+        if os.stat(self.root).st_dev == os.stat(existing_parent(download_dir)).st_dev:
+            return None
+        return os.path.join(self.root, hashlib.sha1(os.path.abspath(download_dir).encode()).hexdigest()[:12])
+
+    def _available(self):
+        free = get_free_space(self.root)
+        avail = None if free is None else free - SPACE_MARGIN - self.used
+        if self.limit is not None:
+            avail = self.limit - self.used if avail is None else min(avail, self.limit - self.used)
+        return avail
+
+    def reserve(self, nbytes):
+        # 반환: 예약 ID, 또는 None (한도보다 큰 작업 / 대기 시간 초과 → 최종 위치에 바로 받음)
+        deadline = time.monotonic() + STAGING_WAIT_TIMEOUT
+        waiting = False
+
+        with self.cond:
+            while True:
+                avail = self._available()
+                if avail is None or avail >= nbytes:
+                    token = self.next_token
+                    self.next_token += 1
+                    self.tokens[token] = nbytes
+                    self.used += nbytes
+                    return token
+
+                # 진행 중인 작업이 없으면 기다려도 자리가 생기지 않음
+                remaining = deadline - time.monotonic()
+                if not self.tokens or remaining <= 0:
+                    return None
+
+                if not waiting:
+                    print(f"\n[INFO] 스테이징 공간 부족 → 이동 완료까지 대기 (필요 {format_size(nbytes)})")
+                    waiting = True
+                self.cond.wait(min(SPACE_POLL_INTERVAL, remaining))
+
+    def release(self, token):
+        with self.cond:
+            self.used -= self.tokens.pop(token, 0)
+            self.cond.notify_all()
+
+    def submit(self, src, stage_dir, download_dir, token, done):
+        # src(스테이징) → download_dir 아래 같은 상대 경로. done(최종 경로, 오류)은 이동 스레드에서 호출
+        dst = os.path.join(download_dir, os.path.relpath(src, stage_dir))
+        dev = os.stat(existing_parent(download_dir)).st_dev
+
+        with self.cond:
+            self.pending += 1
+            q = self.movers.get(dev)
+            if q is None:
+                q = self.movers[dev] = queue.Queue()
+                threading.Thread(target=self._mover, args=(q,), name=f"mover-{len(self.movers)}", daemon=True).start()
+        q.put((src, dst, stage_dir, token, done))
+
+    def _mover(self, q):
+        while True:
+            src, dst, stage_dir, token, done = q.get()
+            path, error = dst, None
+            try:
+                self.move(src, dst)
+                self._prune(os.path.dirname(src), stage_dir)
+            except Exception as e:
+                # 스테이징 파일은 남겨 둠 (직접 옮기거나 다시 실행)
+                path, error = None, f"이동 실패: {type(e).__name__}: {e} (스테이징 파일: {src})"
+                with self.cond:
+                    self.stats["failed"] += 1
+            finally:
+                self.release(token)
+
+            try:
+                done(path, error)
+            except Exception as e:
+                print(f"\n[ERROR] 이동 후 처리 실패: {dst} → {e}")
+            finally:
+                with self.cond:
+                    self.pending -= 1
+                    self.cond.notify_all()
+
+    def move(self, src, dst):
+        os.makedirs(os.path.dirname(dst), exist_ok=True)
+        tmp = os.path.join(os.path.dirname(dst), f".{os.path.basename(dst)}.moving")
+        size = os.path.getsize(src)
+        start = time.time()
+
+        try:
+            for attempt in range(1, STAGING_COPY_ATTEMPTS + 1):
+                method = copy_file_fast(src, tmp)
+
+                copied = os.path.getsize(tmp)
+                if copied != size:
+                    error = f"크기 불일치 ({copied} / {size} 바이트)"
+                elif STAGING_VERIFY == "checksum" and file_digest(src) != file_digest(tmp, drop_cache=True):
+                    error = "체크섬 불일치"
+                else:
+                    break
+                print(f"\n[WARN] 이동 확인 실패 ({error}, {attempt}/{STAGING_COPY_ATTEMPTS}): {dst}")
+            else:
+                raise OSError(error)
+
+            os.replace(tmp, dst)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+        os.remove(src)
+
+        duration = time.time() - start
+        with self.cond:
+            self.stats["files"] += 1
+            self.stats["bytes"] += size
+            self.stats["seconds"] += duration
+            self.stats["methods"][method] += 1
+        metrics.record("move", start, duration=duration, bytes=size, method=method)
+
+    def _prune(self, path, stage_dir):
+        # 비어 있는 하위 폴더(플레이리스트 폴더 등) 정리 - 작업 폴더 자체는 남김
+        while path != stage_dir and path.startswith(stage_dir + os.sep):
+            try:
+                os.rmdir(path)
+            except OSError:
+                return
+            path = os.path.dirname(path)
+
+    def drain(self):
+        with self.cond:
+            while self.pending:
+                self.cond.wait()
+
+    def summary(self):
+        with self.cond:
+            seconds = self.stats["seconds"]
+            return {
+                **self.stats,
+                "methods": dict(self.stats["methods"]),
+                "seconds": round(seconds, 3),
+                "mib_per_s": round(self.stats["bytes"] / seconds / (1 << 20), 2) if seconds else None,
+            }
+
+staging = StagingArea()
+
+# ------------------------------------------------------------
+#  다운로드 처리
+# ------------------------------------------------------------
+
+def build_download_opts(download_dir, video_fmt=None, audio_fmt=None, convert_to=None, plan=None):
+    opts = {
+        **ydl_base_opts,
+        "outtmpl": os.path.join(download_dir, "%(title)s.%(ext)s"),
+        "progress_hooks": [progress_hook],
+    }
+
+    # 특정 포맷 선택
+    if video_fmt or audio_fmt:
+        if audio_fmt:
+            fmt = f"{video_fmt}+{audio_fmt}" if video_fmt else audio_fmt
+        else:
+            fmt = video_fmt
+        opts["format"] = fmt
+    elif plan and plan["format_ids"]:
+        # 출력 형식 기준으로 계획된 최소 스트림
+        opts["format"] = "+".join(plan["format_ids"])
+    else:
+        # 자동 best 매핑
+        opts["format"] = "bv*+ba/best"
+
+    # 변환 옵션 (mp3/mp4)
+    if convert_to:
+        opts["postprocessors"] = output_postprocessors(convert_to, plan)
+
+    return opts
+
+def progress_hook(d):
+    # 출력은 렌더러가 담당 (여러 워커 스레드에서 호출되어도 안전)
+    progress.push(d)
+
+def download_video(url, download_dir, video_fmt=None, audio_fmt=None, convert_to=None, hooks=None):
+    os.makedirs(download_dir, exist_ok=True)
+    print_header(f"다운로드 시작: {url}")
+
+    # 이미 받은 영상 → 추출/다운로드 없이 완료
+    variant = archive_variant(convert_to, video_fmt, audio_fmt)
+    if satisfy_from_archive(archive_key_from_url(url), variant, download_dir):
+        return 0
+
+    info = fetch_video_info(url)
+    format_ids = [f for f in (video_fmt, audio_fmt) if f]
+    plan = None
+
+    if info and convert_to and not format_ids and info.get("_type", "video") == "video":
+        plan = plan_output(info, convert_to, merge=bool(resolve_ffmpeg()))
+        format_ids = plan["format_ids"]
+        log_plan(plan)
+
+    nbytes = estimate_job_size(info, format_ids, convert_to) if info else SPACE_UNKNOWN_SIZE
+    info = None     # 다운로드 중에는 들고 있지 않음 (download_with_info가 캐시에서 다시 읽음)
+    exclude = set()
+
+    while True:
+        try:
+            target, token = placer.place(nbytes, download_dir, exclude)
+        except DiskSpaceError as e:
+            print(f"[ERROR] {e}")
+            return 1
+
+        partial = set()
+        opts = build_download_opts(target, video_fmt, audio_fmt, convert_to, plan)
+        opts["progress_hooks"] = opts["progress_hooks"] + [space_guard(partial)] + list(hooks or [])
+
+        try:
+            with metrics.span("job", url=url) as span, progress_display(), sessions.session(opts) as ydl:
+                retcode = download_with_info(ydl, url, variant)
+                span["outcome"] = "error" if retcode else "ok"
+            break
+        except DiskSpaceError as e:
+            # 디스크가 차기 전에 중단 → 받던 파일 삭제 후 다른 볼륨에서 다시
+            print(f"\n[WARN] {e} → 다른 볼륨으로 이동")
+            remove_partial(partial)
+            exclude.add(target)
+        finally:
+            placer.release(token)
+
+    print("\n다운로드 완료.")
+    return retcode
+
+# ------------------------------------------------------------
+# 플레이리스트 전체 다운로드
+# ------------------------------------------------------------
+
+PLAYLIST_WORKERS = 4
+
+def build_playlist_opts(download_dir, convert_to=None):
+    opts = {
+        **ydl_base_opts,
+        "outtmpl": os.path.join(download_dir, "%(playlist_title)s/%(title)s.%(ext)s"),
+        "progress_hooks": [progress_hook],     # 공간 감시는 항목별로 (download_playlist_entry)
+        "format": "bv*+ba/best",
+    }
+
+    if convert_to:
+        opts["postprocessors"] = output_postprocessors(convert_to)
+
+    return opts
+
+def download_playlist_entry(ydl, entry, extra_info, variant="original", download_dir=None):
+    # 다른 플레이리스트에서 이미 받은 영상 → 이 플레이리스트 폴더에 연결
+    key = archive_key(entry.get("ie_key"), entry.get("id"))
+    if key:
+        target_dir = os.path.dirname(ydl.prepare_filename({**extra_info, "id": entry["id"], "title": "_", "ext": "_"}))
+        if satisfy_from_archive(key, variant, target_dir):
+            return True
+
+    entry_url = entry.get("url") or entry.get("webpage_url")
+    info = fetch_video_info(entry_url)
+
+    if info is None:
+        return False
+
+    # 항목별로 필요한 스트림/후처리만 (mp3 → 오디오만, 이미 H.264/AAC → remux)
+    convert = None if variant == "original" else variant
+    plan = plan_output(info, convert, merge=bool(resolve_ffmpeg()))
+
+    # 워커의 YoutubeDL은 항목 간 재사용 → 항목별 포맷/후처리/공간 감시는 끝나면 원래대로
+    selector, pps = ydl.format_selector, ydl._pps["post_process"]
+    partial = set()
+    guard = space_guard(partial)
+    ydl.add_progress_hook(guard)
+
+    try:
+        if plan["convert"] and plan["format_ids"]:
+            apply_output_plan(ydl, plan)
+            log_plan(plan, extra_info.get("playlist_index"))
+
+        nbytes = estimate_job_size(info, plan["format_ids"], convert)
+        exclude = set()
+
+        while True:
+            # 지정 경로에 공간이 없으면 다른 볼륨의 같은 폴더 구조로 이동
+            target, token = placer.place(nbytes, download_dir, exclude)
+            try:
+                return download_entry_to(ydl, info, extra_info, plan, variant, guard,
+                                         target if download_dir and target != download_dir else None, download_dir)
+            except DiskSpaceError as e:
+                # 디스크가 차기 전에 중단 → 받던 파일 삭제 후 다른 볼륨에서 다시
+                print(f"\n[WARN] {e} → 다른 볼륨으로 이동: {entry_url}")
+                remove_partial(partial)
+                partial.clear()
+                exclude.add(target)
+            finally:
+                placer.release(token)
+    finally:
+        ydl.format_selector, ydl._pps["post_process"] = selector, pps
+        ydl._progress_hooks.remove(guard)
+
+def download_entry_to(ydl, info, extra_info, plan, variant, guard, target=None, download_dir=None):
+    # target: 지정 경로 대신 쓸 볼륨 (outtmpl의 download_dir 부분만 바꿈)
+    convert = plan["convert"]
+    outtmpl = ydl.params["outtmpl"]
+    if target:
+        ydl.params["outtmpl"] = {**outtmpl, "default": os.path.join(target, os.path.relpath(outtmpl["default"], download_dir))}
+    guard.error = None
+
+    try:
+        # 단일 스트림 변환 → 받으면서 바로 ffmpeg로 (실패하면 아래 2단계로)
+        stream_fmt = convert and resolve_ffmpeg() and streamable_format(info, plan["format_ids"], convert, plan["ops"])
+        if stream_fmt:
+            entry_info = {**info, **extra_info}
+            try:
+                path = stream_transcode(ydl, entry_info, stream_fmt, convert, plan["ops"],
+                                        os.path.splitext(ydl.prepare_filename(entry_info))[0])
+                record_downloads({**entry_info, "requested_downloads": [{"filepath": path}]}, variant)
+                return True
+            except StreamFallback as e:
+                print(f"\n[WARN] 스트리밍 변환 불가 → 다운로드 후 변환: {info.get('webpage_url')} ({e})")
+
+        # 캐시된 info에 playlist_* 필드가 None으로 남아있을 수 있어 직접 덮어씀
+        ydl._download_retcode = 0
+        result = ydl.process_ie_result({**strip_fields(info, PROCESSED_FIELDS), **extra_info}, download=True)
+    finally:
+        ydl.params["outtmpl"] = outtmpl
+        # 한 인스턴스로 여러 항목을 받음 → 항목마다 대역폭 몫을 돌려줌
+        bandwidth.release(ydl)
+
+    # 공간 감시 중단이 항목 오류로 처리됨 → 다른 볼륨으로 넘어가도록 다시 올림
+    if guard.error:
+        raise guard.error
+    if ydl._download_retcode:
+        return False
+
+    record_downloads(result, variant)
+    return True
+
+def download_playlist(url, download_dir, convert_to=None, workers=PLAYLIST_WORKERS):
+    print_header("플레이리스트 전체 다운로드 시작")
+
+    opts = build_playlist_opts(download_dir, convert_to)
+
+    # 1. 항목 ID만 페이지 단위로 조회 (extract_flat + process=False)
+    #    → 목록 전체를 만들지 않고 워커에 바로 넘김 (항목 수와 관계없이 메모리 일정)
+    with sessions.session(build_info_opts(flat=True)) as lister:
+        playlist = resolve_ie_result(lister, url)
+
+        if not playlist or playlist.get("_type") != "playlist":
+            with progress_display(), sessions.session({**opts, "progress_hooks": [progress_hook, space_guard()]}) as ydl:
+                retcode = download_with_info(ydl, url, archive_variant(convert_to))
+            print("\n플레이리스트 다운로드 완료.")
+            return retcode
+
+        # 기존 outtmpl(%(playlist_title)s/...)과 playlist_index가 그대로 적용되도록 전달
+        playlist_extra = {**playlist_meta(playlist), "playlist_count": playlist.get("playlist_count")}
+
+        q = queue.Queue(maxsize=workers * 2)
+        failures = []
+        total = 0
+
+        # 2. 항목별로 워커에 분배 (항목 실패는 해당 항목만 스킵)
+        def worker():
+            with sessions.session(opts) as ydl:
+                while True:
+                    item = q.get()
+                    if item is None:
+                        return
+
+                    index, entry = item
+                    extra = {**playlist_extra, "playlist_index": index, "playlist_autonumber": index}
+                    try:
+                        ok = download_playlist_entry(ydl, entry, extra, archive_variant(convert_to), download_dir)
+                    except Exception as e:
+                        print(f"\n[ERROR] 항목 {index} 실패: {e}")
+                        ok = False
+
+                    if not ok:
+                        failures.append(entry.get("url") or entry.get("id"))
+
+        threads = [threading.Thread(target=worker, daemon=True) for _ in range(max(1, workers))]
+
+        with metrics.span("playlist", url=url) as span, progress_display() as display:
+            display.set_pending(q.qsize)
+            for th in threads:
+                th.start()
+            try:
+                for index, entry in iter_playlist_entries(lister, playlist):
+                    q.put((index, entry))
+                    total += 1
+            finally:
+                for _ in threads:
+                    q.put(None)
+            for th in threads:
+                th.join()
+            span["entries"] = total
+            span["failed"] = len(failures)
+
+    print(f"\n플레이리스트 다운로드 완료. (성공 {total - len(failures)}/{total})")
+    return 1 if failures else 0
+
+# ------------------------------------------------------------
+# 멀티 다운로드 큐
+# ------------------------------------------------------------
+
+class QueueSummary:
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.started = time.time()
+        self.counts = {"total": 0, "ok": 0, "skipped": 0, "failed": 0, "invalid": 0}
+        self.bytes = 0
+        self.failures = []
+        self.input_errors = []      # 입력을 끝까지 읽지 못함 (파일 읽기 오류 등)
+
+    def input_error(self, error):
+        with self.lock:
+            self.input_errors.append(error)
+
+    def record(self, url, error=None, nbytes=0, invalid=False, skipped=False):
+        with self.lock:
+            self.counts["total"] += 1
+            self.bytes += nbytes
+
+            if invalid:
+                self.counts["invalid"] += 1
+            elif skipped:
+                self.counts["skipped"] += 1
+            elif error:
+                self.counts["failed"] += 1
+            else:
+                self.counts["ok"] += 1
+
+            if error:
+                self.failures.append({"url": url, "error": error})
+
+    def to_dict(self):
+        with self.lock:
+            return {
+                **self.counts,
+                "bytes": self.bytes,
+                "wall_time": round(time.time() - self.started, 3),
+                "failures": list(self.failures),
+                **({"input_errors": list(self.input_errors)} if self.input_errors else {}),
+            }
+
+# ------------------------------------------------------------
+# 작업 저널 (재시작 시 이어서 실행)
+# ------------------------------------------------------------
+# 작업마다 상태 전이를 저장소에 기록:
+#   queued → extracting → downloading → postprocessing → done / failed
+# 플레이리스트 작업은 항목을 하위 작업으로 펼친 뒤 expanded 상태로 남고,
+# 모든 항목이 done이 되면 done 처리.
+# 같은 작업(URL + 옵션)을 다시 넣으면 done은 건너뛰고 실패/취소된 작업은 처음부터 다시 실행.
+# 대기/실행 중인 작업은 그대로 둠 - 이전 실행이 중단되면서 남은 작업(--resume)만 남은 단계부터 다시 실행.
+# 받다 만 스트림은 .part 파일에서 이어받음 (continuedl).
+# node / lease 컬럼은 분산 모드(여러 노드가 저널 하나를 공유)에서 작업을 가져간 노드와 임대 만료 시각.
+# 저장소: 파일 경로 → SQLite(WAL, 한 머신) / postgresql:// URL → PostgreSQL (여러 머신이 공유)
+# 시각(created / updated / lease / heartbeat)은 모두 저장소의 시계로 기록 → 노드마다 시계가 달라도 같은 기준으로 임대 만료 판단
+JOURNAL_ENABLED = True
+JOURNAL_PATH = os.path.join(STATE_DIR, "jobs.sqlite3")
+JOURNAL_MAX_ATTEMPTS = 3
+JOURNAL_URL_SCHEMES = ("postgres://", "postgresql://")
+JOB_ACTIVE_STATES = ("queued", "extracting", "downloading", "postprocessing")
+JOB_TASK_FIELDS = ("url", "output", "auto_place", "convert", "video_fmt", "audio_fmt", "preset")
+# 저장은 하지만 같은 작업 판별에는 쓰지 않음 (플레이리스트 항목 정보는 다른 노드가 항목을 실행할 때, sync는 --resume 후 동기화 완료 표시에 필요)
+JOB_EXTRA_FIELDS = ("priority", "deadline", "source", "playlist", "playlist_extra", "sync")
+JOB_COLUMNS = "id, parent, url, task, state, attempts, error, path, bytes, created, updated"
+
+def job_key(task):
+    fields = {k: task.get(k) for k in JOB_TASK_FIELDS}
+    return hashlib.sha1(json.dumps(fields, sort_keys=True).encode()).hexdigest()
+
+def is_store_url(path):
+    return (path or "").startswith(JOURNAL_URL_SCHEMES)
+
+class SqliteStore:
+    # 한 머신 전용: WAL은 공유 메모리 파일을 쓰므로 네트워크 파일 시스템/다른 머신에서는 잠금이 깨짐
+    clock = "((julianday('now') - 2440587.5) * 86400.0)"
+    errors = (sqlite3.Error,)
+    shared = False
+
+    def __init__(self, path):
+        self.path = path
+
+    def describe(self):
+        return self.path
+
+    def connect(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            " id INTEGER PRIMARY KEY, key TEXT UNIQUE, parent INTEGER, url TEXT, task TEXT,"
+            " state TEXT, attempts INTEGER DEFAULT 0, error TEXT, path TEXT, bytes INTEGER,"
+            " created REAL, updated REAL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS jobs_state ON jobs (state, updated)")
+        conn.execute("CREATE INDEX IF NOT EXISTS jobs_parent ON jobs (parent)")
+
+        # 이전 버전 저널 → 분산 모드 컬럼 추가 (여러 노드가 동시에 열 수 있음)
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(jobs)")}
+        for column, kind in (("node", "TEXT"), ("lease", "REAL"), ("rank", "INTEGER")):
+            if column not in columns:
+                try:
+                    conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} {kind}")
+                except sqlite3.OperationalError:
+                    pass
+        conn.execute("CREATE INDEX IF NOT EXISTS jobs_claim ON jobs (state, rank, id)")
+        conn.execute("CREATE INDEX IF NOT EXISTS jobs_node ON jobs (node, state)")
+        conn.execute("CREATE INDEX IF NOT EXISTS jobs_lease ON jobs (lease)")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS nodes (name TEXT PRIMARY KEY, host TEXT, started REAL, heartbeat REAL, stopped REAL)"
+        )
+        conn.commit()
+        return conn
+
+    def begin(self, db):
+        # 작업 임대 트랜잭션: 쓰기 잠금을 먼저 잡아서 두 노드가 같은 작업을 가져가지 않도록
+        db.execute("BEGIN IMMEDIATE")
+
+class PostgresConnection:
+    # sqlite3 연결과 같은 방식으로 사용 (? 자리표시자 → %s)
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def execute(self, sql, params=()):
+        return self.conn.execute(sql.replace("?", "%s"), params)
+
+    def commit(self):
+        self.conn.commit()
+
+    def rollback(self):
+        self.conn.rollback()
+
+class PostgresStore:
+    # 여러 머신의 노드가 공유 (PostgreSQL 프로토콜 호환 DB) - psycopg 필요
+    clock = "EXTRACT(EPOCH FROM now())::float8"
+    shared = True
+
+    def __init__(self, url):
+        import psycopg
+
+        self.url = url
+        self.psycopg = psycopg
+        self.errors = (psycopg.Error,)
+
+    def describe(self):
+        # 비밀번호는 출력하지 않음
+        parts = urllib.parse.urlsplit(self.url)
+        if parts.password is None:
+            return self.url
+        netloc = f"{parts.username}:***@{parts.hostname}" + (f":{parts.port}" if parts.port else "")
+        return urllib.parse.urlunsplit(parts._replace(netloc=netloc))
+
+    def connect(self):
+        # autocommit: 문장마다 바로 반영 (작업 임대만 begin()으로 트랜잭션)
+        conn = self.psycopg.connect(self.url, autocommit=True)
+        with conn.transaction():
+            # 여러 노드가 동시에 처음 시작해도 테이블을 한 번만 만들도록
+            conn.execute("SELECT pg_advisory_xact_lock(hashtext('youtube_downloader_jobs'))")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                " id BIGSERIAL PRIMARY KEY, key TEXT UNIQUE, parent BIGINT, url TEXT, task TEXT,"
+                " state TEXT, attempts INTEGER DEFAULT 0, error TEXT, path TEXT, bytes BIGINT,"
+                " created DOUBLE PRECISION, updated DOUBLE PRECISION, node TEXT, lease DOUBLE PRECISION, rank INTEGER)"
+            )
+            for name, columns in (("jobs_state", "state, updated"), ("jobs_parent", "parent"),
+                                  ("jobs_claim", "state, rank, id"), ("jobs_node", "node, state"),
+                                  ("jobs_lease", "lease")):
+                conn.execute(f"CREATE INDEX IF NOT EXISTS {name} ON jobs ({columns})")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS nodes (name TEXT PRIMARY KEY, host TEXT,"
+                " started DOUBLE PRECISION, heartbeat DOUBLE PRECISION, stopped DOUBLE PRECISION)"
+            )
+        return PostgresConnection(conn)
+
+    def begin(self, db):
+        # BEGIN IMMEDIATE 대신: 임대하는 동안 다른 노드의 임대/상태 기록을 막음 (조회는 막지 않음)
+        db.execute("BEGIN")
+        db.execute("LOCK TABLE jobs IN SHARE ROW EXCLUSIVE MODE")
+
+def open_store(path):
+    return PostgresStore(path) if is_store_url(path) else SqliteStore(path)
+
+class JobJournal:
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.store = None
+        self._conn = None
+        self.node = None        # 분산 모드: 이 노드 이름 (다른 노드가 가져간 작업은 기록하지 않음)
+
+    def _db(self):
+        if self._conn is None:
+            self.store = open_store(self.path)
+            self._conn = self.store.connect()
+        return self._conn
+
+    def describe(self):
+        return open_store(self.path).describe() if self.store is None else self.store.describe()
+
+    def enqueue(self, task, parent=None, resume=False):
+        # 반환: (작업 ID, 이전 상태, 실행 여부) - done / 재시도 횟수를 넘긴 failed는 다시 실행하지 않음
+        # resume: 이전 실행에서 중단된 작업 (pending()) → 대기/실행 중 상태로 남은 작업도 다시 실행
+        key = job_key(task)
+        fields = {k: task[k] for k in JOB_TASK_FIELDS + JOB_EXTRA_FIELDS if task.get(k) is not None}
+        rank = SCHED_PRIORITIES.index(task.get("priority") or SCHED_DEFAULT_PRIORITY)
+
+        with self.lock:
+            db = self._db()
+            now = self.store.clock
+            row = db.execute(
+                f"SELECT id, state, attempts, node, COALESCE(lease, 0) > {now} FROM jobs WHERE key = ?", (key,)
+            ).fetchone()
+
+            if row is None:
+                db.execute(
+                    "INSERT INTO jobs (key, parent, url, task, state, attempts, rank, created, updated)"
+                    f" VALUES (?, ?, ?, ?, 'queued', 1, ?, {now}, {now})",
+                    (key, parent, task["url"], json.dumps(fields, ensure_ascii=False), rank),
+                )
+                job_id = db.execute("SELECT id FROM jobs WHERE key = ?", (key,)).fetchone()[0]
+                db.commit()
+                return job_id, None, True
+
+            job_id, state, attempts, node, leased = row
+
+            # 이미 대기 중이거나 실행 중인 작업 → 그대로 둠 (같은 작업을 두 번 실행하지 않음)
+            # 분산 모드: 임대가 끝난 작업(멈춘 노드)만 다시 / 그 외: 중단된 작업을 이어서 실행할 때만 다시
+            if state in JOB_ACTIVE_STATES and (
+                (node is None or leased) if self.node is not None else not resume
+            ):
+                return job_id, state, False
+
+            # 하위 항목이 모두 끝난 플레이리스트 → done
+            if state == "expanded" and not db.execute(
+                "SELECT 1 FROM jobs WHERE parent = ? AND state != 'done' LIMIT 1", (job_id,)
+            ).fetchone():
+                state = "done"
+                db.execute(f"UPDATE jobs SET state = 'done', updated = {now} WHERE id = ?", (job_id,))
+
+            if state == "done" or (state == "failed" and attempts >= JOURNAL_MAX_ATTEMPTS):
+                db.commit()
+                return job_id, state, False
+
+            db.execute(
+                "UPDATE jobs SET state = 'queued', attempts = attempts + 1, error = NULL, node = NULL, lease = NULL,"
+                f" parent = COALESCE(parent, ?), updated = {now} WHERE id = ?",
+                (parent, job_id),
+            )
+            db.commit()
+            return job_id, state, True
+
+    def update(self, job_id, state, error=None, path=None, nbytes=None):
+        # 반환: False = 분산 모드에서 다른 노드로 넘어간 작업 (기록하지 않음)
+        if job_id is None:
+            return True
+
+        with self.lock:
+            db = self._db()
+            cur = db.execute(
+                "UPDATE jobs SET state = ?, error = COALESCE(?, error), path = COALESCE(?, path),"
+                f" bytes = COALESCE(?, bytes), updated = {self.store.clock}"
+                " WHERE id = ? AND (CAST(? AS TEXT) IS NULL OR node = ?)",
+                (state, error, path, nbytes, job_id, self.node, self.node),
+            )
+            db.commit()
+
+        if not cur.rowcount:
+            return False
+
+        events.publish({"type": "state", "job": job_id, "state": state, "error": error, "path": path})
+        return True
+
+    def _rows(self, sql, params=()):
+        with self.lock:
+            cur = self._db().execute(sql, params)
+            columns = [c[0] for c in cur.description]
+            rows = cur.fetchall()
+
+        jobs = []
+        for row in rows:
+            job = dict(zip(columns, row))
+            job["task"] = json.loads(job["task"] or "{}")
+            jobs.append(job)
+        return jobs
+
+    def get(self, job_id):
+        jobs = self._rows(f"SELECT {JOB_COLUMNS} FROM jobs WHERE id = ?", (job_id,))
+        return jobs[0] if jobs else None
+
+    def recent(self, limit=50, state=None):
+        if state:
+            return self._rows(f"SELECT {JOB_COLUMNS} FROM jobs WHERE state = ? ORDER BY updated DESC LIMIT ?",
+                              (state, limit))
+        return self._rows(f"SELECT {JOB_COLUMNS} FROM jobs ORDER BY updated DESC LIMIT ?", (limit,))
+
+    def pending(self):
+        # 이전 실행에서 끝나지 않은 최상위 작업 (플레이리스트 항목은 상위 작업이 다시 펼침)
+        # resumed: enqueue()가 대기/실행 중 상태로 남은 작업을 다시 실행하도록 (저장하지 않는 표시)
+        with self.lock:
+            rows = self._db().execute(
+                "SELECT task FROM jobs WHERE parent IS NULL AND"
+                f" state IN ({', '.join('?' * len(JOB_ACTIVE_STATES))}, 'expanded') ORDER BY id",
+                JOB_ACTIVE_STATES,
+            ).fetchall()
+        return [{**json.loads(task), "resumed": True} for (task,) in rows]
+
+    def counts(self):
+        with self.lock:
+            return dict(self._db().execute("SELECT state, COUNT(*) FROM jobs GROUP BY state").fetchall())
+
+    # --- 분산 모드 (ClusterNode) ---
+    # 임대 만료 / 하트비트 시각은 저장소의 시계(store.clock)로 계산 - 노드의 time.time()은 쓰지 않음
+
+    def _lease_rows(self, db, node, ids):
+        # 작업 임대 → 작업 목록 반환 (store.begin() 트랜잭션 안에서 호출)
+        if not ids:
+            return []
+        marks = ", ".join("?" * len(ids))
+        db.execute(f"UPDATE jobs SET node = ?, lease = {self.store.clock} + ? WHERE id IN ({marks})",
+                   (node, CLUSTER_LEASE, *ids))
+        cur = db.execute(f"SELECT {JOB_COLUMNS} FROM jobs WHERE id IN ({marks}) ORDER BY rank, id", ids)
+        columns = [c[0] for c in cur.description]
+        jobs = []
+        for row in cur.fetchall():
+            job = dict(zip(columns, row))
+            job["task"] = json.loads(job["task"] or "{}")
+            jobs.append(job)
+        return jobs
+
+    def claim(self, node, limit):
+        # 임대가 끝난 작업(멈춘 노드) → 아무도 안 가져간 작업 순으로 limit 개까지 임대
+        # 실행 중에 노드가 멈춘 작업은 처음부터 다시 (JOURNAL_MAX_ATTEMPTS 번 넘게 멈추면 failed)
+        active = ", ".join("?" * len(JOB_ACTIVE_STATES))
+
+        with self.lock:
+            db = self._db()
+            now = self.store.clock
+            self.store.begin(db)
+            try:
+                ids = []
+                expired = db.execute(
+                    f"SELECT id, state, attempts FROM jobs WHERE lease < {now} AND node != ? AND state IN ({active})"
+                    " LIMIT ?", (node, *JOB_ACTIVE_STATES, limit),
+                ).fetchall()
+                for job_id, state, attempts in expired:
+                    if state == "queued":
+                        ids.append(job_id)
+                    elif attempts >= JOURNAL_MAX_ATTEMPTS:
+                        db.execute("UPDATE jobs SET state = 'failed', error = ?, node = NULL, lease = NULL,"
+                                   f" updated = {now} WHERE id = ?", ("실행 중 노드 중단 (재시도 횟수 초과)", job_id))
+                    else:
+                        db.execute(f"UPDATE jobs SET state = 'queued', attempts = attempts + 1, updated = {now}"
+                                   " WHERE id = ?", (job_id,))
+                        ids.append(job_id)
+
+                if len(ids) < limit:
+                    ids += [job_id for (job_id,) in db.execute(
+                        "SELECT id FROM jobs WHERE state = 'queued' AND node IS NULL ORDER BY rank, id LIMIT ?",
+                        (limit - len(ids),),
+                    )]
+
+                jobs = self._lease_rows(db, node, ids)
+                db.commit()
+            except BaseException:
+                db.rollback()
+                raise
+        return jobs
+
+    def steal(self, node, limit):
+        # 시작 전 작업을 가장 많이 쥔 노드에서 절반(limit 이하)을 가져옴 - 그 노드가 마지막에 실행할 작업부터
+        with self.lock:
+            db = self._db()
+            self.store.begin(db)
+            try:
+                row = db.execute(
+                    "SELECT node, COUNT(*) FROM jobs WHERE state = 'queued' AND node IS NOT NULL AND node != ?"
+                    " GROUP BY node ORDER BY COUNT(*) DESC LIMIT 1", (node,),
+                ).fetchone()
+                ids = []
+                if row and row[1] >= 2:
+                    ids = [job_id for (job_id,) in db.execute(
+                        "SELECT id FROM jobs WHERE state = 'queued' AND node = ? ORDER BY rank DESC, id DESC LIMIT ?",
+                        (row[0], min(limit, row[1] // 2)),
+                    )]
+                jobs = self._lease_rows(db, node, ids)
+                db.commit()
+            except BaseException:
+                db.rollback()
+                raise
+        return jobs, row[0] if jobs else None
+
+    def renew(self, node, ids):
+        # 하트비트: 이 노드가 쥔 작업의 임대 연장
+        # 반환: (다른 노드로 넘어간 작업, 끝난 작업) - ids = 이 노드가 실행 중이라고 알고 있는 작업
+        active = ", ".join("?" * len(JOB_ACTIVE_STATES))
+        lost, finished = [], []
+
+        with self.lock:
+            db = self._db()
+            now = self.store.clock
+            db.execute(f"UPDATE jobs SET lease = {now} + ? WHERE node = ? AND state IN ({active})",
+                       (CLUSTER_LEASE, node, *JOB_ACTIVE_STATES))
+            db.execute(f"UPDATE nodes SET heartbeat = {now} WHERE name = ?", (node,))
+            db.commit()
+
+            ids = list(ids)
+            for i in range(0, len(ids), 500):
+                chunk = ids[i:i + 500]
+                for job_id, owner, state in db.execute(
+                    f"SELECT id, node, state FROM jobs WHERE id IN ({', '.join('?' * len(chunk))})", chunk
+                ):
+                    if owner != node:
+                        lost.append(job_id)
+                    elif state not in JOB_ACTIVE_STATES:
+                        finished.append(job_id)
+        return lost, finished
+
+    def join_cluster(self, node, host):
+        # 같은 이름으로 다시 시작한 노드 → 이전 실행이 쥐고 있던 작업을 바로 풀어 줌
+        active = ", ".join("?" * len(JOB_ACTIVE_STATES))
+
+        with self.lock:
+            db = self._db()
+            now = self.store.clock
+            released = db.execute(
+                f"UPDATE jobs SET node = NULL, lease = NULL, state = 'queued', updated = {now}"
+                f" WHERE node = ? AND state IN ({active})", (node, *JOB_ACTIVE_STATES),
+            ).rowcount
+            db.execute(
+                f"INSERT INTO nodes (name, host, started, heartbeat) VALUES (?, ?, {now}, {now})"
+                " ON CONFLICT (name) DO UPDATE SET host = excluded.host, started = excluded.started,"
+                " heartbeat = excluded.heartbeat, stopped = NULL",
+                (node, host),
+            )
+            db.commit()
+        return released
+
+    def live_hosts(self, host):
+        # 실행 중인 다른 머신의 노드 (host 제외)
+        with self.lock:
+            rows = self._db().execute(
+                f"SELECT DISTINCT host FROM nodes WHERE stopped IS NULL AND heartbeat > {self.store.clock} - ?"
+                " AND host != ?", (CLUSTER_LEASE, host),
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def has_active_children(self, job_id):
+        with self.lock:
+            return self._db().execute(
+                f"SELECT 1 FROM jobs WHERE parent = ? AND state IN ({', '.join('?' * len(JOB_ACTIVE_STATES))}) LIMIT 1",
+                (job_id, *JOB_ACTIVE_STATES),
+            ).fetchone() is not None
+
+    def leave_cluster(self, node):
+        with self.lock:
+            db = self._db()
+            now = self.store.clock
+            db.execute(f"UPDATE nodes SET heartbeat = {now}, stopped = {now} WHERE name = ?", (node,))
+            db.commit()
+
+    def active(self):
+        with self.lock:
+            return self._db().execute(
+                f"SELECT COUNT(*) FROM jobs WHERE state IN ({', '.join('?' * len(JOB_ACTIVE_STATES))})",
+                JOB_ACTIVE_STATES,
+            ).fetchone()[0]
+
+    def node_stats(self):
+        # 노드별 (실행 시작 이후) 완료 작업 수 / 받은 바이트 / 처리량
+        with self.lock:
+            db = self._db()
+            now = db.execute(f"SELECT {self.store.clock}").fetchone()[0]
+            rows = db.execute(
+                "SELECT n.name, n.host, n.started, n.heartbeat, n.stopped, COUNT(j.id), COALESCE(SUM(j.bytes), 0)"
+                " FROM nodes n LEFT JOIN jobs j ON j.node = n.name AND j.state = 'done' AND j.updated >= n.started"
+                " GROUP BY n.name, n.host, n.started, n.heartbeat, n.stopped ORDER BY n.started"
+            ).fetchall()
+
+        stats = {}
+        for name, host, started, heartbeat, stopped, done, nbytes in rows:
+            # 실행 중인 노드는 지금까지, 끝났거나 멈춘 노드는 마지막 하트비트까지
+            alive = stopped is None and now - heartbeat < CLUSTER_LEASE
+            elapsed = max((now if alive else heartbeat) - started, 1e-3)
+            nbytes = int(nbytes)
+            stats[name] = {
+                "host": host,
+                "alive": alive,
+                "done": done,
+                "bytes": nbytes,
+                "jobs_per_min": round(done * 60 / elapsed, 2),
+                "mib_per_s": round(nbytes / elapsed / (1 << 20), 2),
+            }
+        return stats
+
+journal = JobJournal(JOURNAL_PATH)
+
+# ------------------------------------------------------------
+# 작업 이벤트 / 취소
+# ------------------------------------------------------------
+# 상태 전이(저널)와 다운로드 진행률을 구독자(데몬 API 클라이언트)에게 전달.
+# 구독자가 없으면 아무 일도 하지 않음.
+EVENT_QUEUE_SIZE = 1000
+EVENT_PROGRESS_INTERVAL = 0.5
+
+class JobCancelled(Exception):
+    pass
+
+class LeaseLost(JobCancelled):
+    # 분산 모드: 임대가 끝나 다른 노드가 가져간 작업
+    pass
+
+class EventBus:
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.subscribers = []
+        self.last_progress = {}
+
+    def subscribe(self):
+        q = queue.Queue(maxsize=EVENT_QUEUE_SIZE)
+        with self.lock:
+            self.subscribers.append(q)
+        return q
+
+    def unsubscribe(self, q):
+        with self.lock:
+            if q in self.subscribers:
+                self.subscribers.remove(q)
+
+    def publish(self, event):
+        if not self.subscribers:
+            return
+
+        event = {"ts": round(time.time(), 3), **event}
+        with self.lock:
+            subscribers = list(self.subscribers)
+
+        for q in subscribers:
+            try:
+                q.put_nowait(event)
+            except queue.Full:
+                pass    # 느린 클라이언트 → 이벤트 누락 (다운로드는 막지 않음)
+
+    def progress(self, job_id, d):
+        if job_id is None or not self.subscribers:
+            return
+
+        # 진행률은 작업당 EVENT_PROGRESS_INTERVAL 간격으로만
+        now = time.monotonic()
+        if d["status"] == "downloading":
+            if now - self.last_progress.get(job_id, 0) < EVENT_PROGRESS_INTERVAL:
+                return
+            self.last_progress[job_id] = now
+        else:
+            self.last_progress.pop(job_id, None)
+
+        self.publish({
+            "type": "progress",
+            "job": job_id,
+            "status": d["status"],
+            "filename": os.path.basename(d.get("filename") or ""),
+            "downloaded": d.get("downloaded_bytes"),
+            "total": d.get("total_bytes") or d.get("total_bytes_estimate"),
+            "speed": d.get("speed"),
+            "eta": d.get("eta"),
+        })
+
+events = EventBus()
+cancelled_jobs = set()
+
+def check_cancelled(job):
+    if cluster.lost and job.get("job_id") in cluster.lost:
+        raise LeaseLost("다른 노드로 넘어감")
+    if cancelled_jobs and (job.get("job_id") in cancelled_jobs or job.get("parent_id") in cancelled_jobs):
+        raise JobCancelled("취소됨")
+
+def retire_cancelled(job):
+    # 파이프라인에서 빠진 작업 → 취소 목록에서 제거 (플레이리스트는 실행 중인 하위 항목이 없을 때)
+    # 데몬이 오래 실행돼도 목록이 커지지 않도록
+    if not cancelled_jobs:
+        return
+    for job_id in (job.get("job_id"), job.get("parent_id")):
+        if job_id in cancelled_jobs and not journal.has_active_children(job_id):
+            cancelled_jobs.discard(job_id)
+
+def cancel_job(job_id):
+    # 반환: (HTTP 상태, 작업) - 이미 끝난 작업은 취소 불가
+    job = journal.get(job_id)
+    if job is None:
+        return 404, None
+    if job["state"] in ("done", "failed", "cancelled"):
+        return 409, job
+
+    cancelled_jobs.add(job_id)
+    if job["state"] == "queued":
+        journal.update(job_id, "cancelled")
+    return 202, journal.get(job_id)
+
+# ------------------------------------------------------------
+# 분산 작업 큐 (여러 노드가 작업 저널 하나를 공유)
+# ------------------------------------------------------------
+# --cluster DB: 여러 인스턴스(노드)가 같은 저널 DB에서 작업을 나눠 가져감.
+#   - 입력(--batch)은 저널에 등록만 → 어느 노드든 가져가서 실행 (같은 작업은 한 노드에서 한 번만)
+#   - 가져간 작업은 임대(lease): 하트비트마다 연장, CLUSTER_LEASE 동안 연장이 없으면(노드 중단)
+#     다른 노드가 회수해서 추출부터 다시 실행
+#   - 노드는 동시 실행 수의 몇 배만큼만 미리 가져감. 가져갈 작업이 없으면 시작 전 작업을
+#     가장 많이 쥔 노드에서 절반을 가져옴 (work stealing)
+#   - 넘어간 작업은 원래 노드의 추출 시작 시점 / 하트비트에서 확인 → 같은 작업을 두 노드가 실행하지 않음
+# 저장 위치를 지정하지 않은 작업은 실행하는 노드의 -o 경로에 저장.
+# 저장소 (JobJournal):
+#   - postgresql://... URL → 여러 머신의 노드가 공유. 임대 만료는 DB 서버의 시계로 판단
+#   - 파일 경로 → SQLite(WAL). 공유 메모리 파일을 쓰므로 한 머신의 노드만 (시작 시 확인)
+CLUSTER_LEASE = 60              # 임대 기간 (초) - 이 시간 동안 하트비트가 없으면 노드 중단으로 봄
+CLUSTER_HEARTBEAT = 10
+CLUSTER_POLL = 1                # 가져갈 작업이 없을 때 다시 확인하는 주기 (초)
+CLUSTER_PREFETCH_FACTOR = 2     # 미리 가져가는 작업 수 = (추출 + 다운로드 동시 실행 수) * factor
+NETWORK_FS_TYPES = ("nfs", "nfs4", "cifs", "smb3", "smbfs", "fuse.sshfs", "9p", "afs", "ceph", "glusterfs", "lustre")
+
+def filesystem_type(path):
+    # Linux: path가 속한 마운트의 파일 시스템 종류 (알 수 없으면 None)
+    path = os.path.realpath(existing_parent(path))
+    best, fstype = "", None
+    try:
+        with open("/proc/mounts") as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) < 3:
+                    continue
+                mount_point = parts[1].replace("\\040", " ")
+                inside = path == mount_point or path.startswith(mount_point.rstrip("/") + "/")
+                if inside and len(mount_point) >= len(best):
+                    best, fstype = mount_point, parts[2]
+    except OSError:
+        return None
+    return fstype
+
+class ClusterNode:
+
+    def __init__(self):
+        self.name = None
+        self.lock = threading.Lock()
+        self.held = set()       # 이 노드가 가져간 작업 ID
+        self.lost = set()       # 임대가 끝나 다른 노드로 넘어간 작업 ID
+        self.stolen = 0
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def enabled(self):
+        return self.name is not None
+
+    def configure(self, path, name=None):
+        import socket
+
+        if is_store_url(path):
+            ensure_python_package("psycopg[binary]", "psycopg")
+
+        self.name = name or f"{socket.gethostname()}-{os.getpid()}"
+        journal.path = path
+        journal.node = self.name
+
+    def check_host(self):
+        # 반환: 오류 메시지 또는 None - SQLite 저널은 한 머신에서만 공유 가능 (여러 머신은 postgresql:// 사용)
+        import socket
+
+        if is_store_url(journal.path):
+            return None
+
+        fstype = filesystem_type(journal.path)
+        if fstype in NETWORK_FS_TYPES:
+            return (f"SQLite 저널은 로컬 디스크에 있어야 합니다 ({journal.path}: {fstype})"
+                    " - 여러 머신에서 나눠 받으려면 --cluster postgresql://... 사용")
+
+        others = journal.live_hosts(socket.gethostname())
+        if others:
+            return (f"다른 머신의 노드가 같은 SQLite 저널을 사용 중: {', '.join(others)}"
+                    " - 여러 머신에서 나눠 받으려면 --cluster postgresql://... 사용")
+        return None
+
+    def start(self):
+        import socket
+
+        released = journal.join_cluster(self.name, socket.gethostname())
+        print(f"[INFO] 분산 모드: 노드 {self.name} ({journal.describe()})")
+        if released:
+            print(f"[INFO] 이전 실행에서 가져간 작업 {released}개 반환")
+
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self._heartbeat, name="cluster-heartbeat", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread:
+            self.thread.join()
+            self.thread = None
+        self.beat()
+        journal.leave_cluster(self.name)
+
+    def _heartbeat(self):
+        while not self.stop_event.wait(CLUSTER_HEARTBEAT):
+            try:
+                self.beat()
+            except journal.store.errors as e:
+                print(f"\n[WARN] 하트비트 실패: {e}")
+
+    def beat(self):
+        with self.lock:
+            held = list(self.held)
+
+        lost, finished = journal.renew(self.name, held)
+
+        with self.lock:
+            self.held.difference_update(finished)
+            self.held.difference_update(lost)
+            self.lost.update(lost)
+        if lost:
+            print(f"\n[WARN] 임대 만료로 다른 노드로 넘어간 작업: {len(lost)}개")
+
+    def submit(self, t):
+        # 입력 → 저널에 등록만 (저장 위치 / 자동 배치는 실행하는 노드가 정함)
+        job_id, previous, runnable = journal.enqueue(t)
+        return {**t, "job_id": job_id}, previous, runnable
+
+    def _dispatch(self, q, retry, jobs, download_dir):
+        for row in jobs:
+            task = row["task"]
+            with self.lock:
+                self.held.add(row["id"])
+            retry.add()
+            q.put({
+                **task,
+                "output": task.get("output") or download_dir,
+                "auto_place": placer.enabled() and not task.get("output"),
+                "shared_output": task.get("output"),
+                "job_id": row["id"],
+                "parent_id": row["parent"],
+                "admitted": True,
+                "queued_at": time.time(),
+            })
+
+    def pull(self, q, retry, window, download_dir, input_done):
+        # 입력 등록이 끝났고, 이 노드에 진행 중인 작업이 없고, 저널 전체에 남은 작업이 없으면 종료
+        while True:
+            free = window - retry.outstanding
+            if free > 0:
+                jobs = journal.claim(self.name, free)
+                if not jobs:
+                    jobs, victim = journal.steal(self.name, free)
+                    if jobs:
+                        self.stolen += len(jobs)
+                        print(f"\n[INFO] {victim} 의 대기 작업 {len(jobs)}개를 가져옴")
+                if jobs:
+                    self._dispatch(q, retry, jobs, download_dir)
+                    continue
+
+                if input_done.is_set() and retry.outstanding == 0 and journal.active() == 0:
+                    return
+
+            time.sleep(CLUSTER_POLL)
+
+    def summary(self):
+        return {"stolen": self.stolen, "lost": len(self.lost), "nodes": journal.node_stats()}
+
+cluster = ClusterNode()
+
+# ------------------------------------------------------------
+# 실패 분류 / 재시도 / 서킷 브레이커
+# ------------------------------------------------------------
+# 실패 메시지로 종류를 나눠 처리:
+#   throttle    : 요청 제한 (429 등)  → 호스트 전체 일시 중지 + 긴 백오프 후 재시도
+#   transient   : 일시적 네트워크 오류 → 지수 백오프(지터) 후 큐 맨 뒤로 재투입
+#   auth        : 로그인/멤버십/연령 확인 필요 → 재시도 없이 기록
+#   unavailable : 삭제/비공개/지역 차단 등 → 재시도 없이 기록
+#   unknown     : 분류 안 됨 → 한 번만 재시도
+# 대기 중인 작업은 워커를 붙잡지 않음 (타이머가 시간이 되면 추출 큐에 다시 넣음).
+# auth / unavailable 은 .state/failures.sqlite3 에 남겨서 다음 실행에서도 건너뜀 (--retry-failed 로 무시).
+FAILURE_LOG_PATH = os.path.join(STATE_DIR, "failures.sqlite3")
+FAILURE_SKIP = True
+FAILURE_PERMANENT = ("auth", "unavailable")
+FAILURE_PATTERNS = (
+    ("throttle", re.compile(r"HTTP Error 429|Too Many Requests|rate.?limit|not a bot|try again later", re.I)),
+    ("auth", re.compile(
+        r"members?[- ]only|Join this channel|Private video|Sign in to confirm your age|age.?restricted"
+        r"|login required|requires? (?:authentication|login)|HTTP Error 401|--cookies", re.I)),
+    ("unavailable", re.compile(
+        r"Video unavailable|has been removed|no longer available|not available in your country"
+        r"|blocked it in your country|geo.?restrict|copyright (?:claim|grounds|strike)|account .* terminated"
+        r"|(?:video|channel|playlist) does not exist|HTTP Error 410|Unsupported URL", re.I)),
+    ("transient", re.compile(
+        r"timed? ?out|Connection (?:reset|refused|aborted)|Temporary failure|Name or service not known"
+        r"|HTTP Error 5\d\d|HTTP Error 403|IncompleteRead|Remote end closed|EOF occurred|urlopen error"
+        r"|Unable to download|ContentTooShort|Did not get any data", re.I)),
+)
+
+# 종류 → (최대 재시도 횟수, 첫 대기(초), 최대 대기(초))
+RETRY_POLICIES = {
+    "transient": (4, 10, 300),
+    "throttle": (6, 60, 1800),
+    "unknown": (1, 30, 30),
+}
+RETRY_STAGES = ("extract", "download")    # 후처리(ffmpeg) 실패는 다시 받아도 같음
+# 404: 추출 중 = 없는 영상 (영구) / 다운로드 중 = 서명 URL 만료 가능 → 다시 추출해서 재시도
+NOT_FOUND_PATTERN = re.compile(r"HTTP Error 404", re.I)
+
+BREAKER_COOLDOWN = 60           # 요청 제한 감지 시 호스트 전체 중지 시간 (연속 감지마다 2배)
+BREAKER_MAX_COOLDOWN = 1800
+HOST_ALIASES = {"youtu.be": "youtube.com", "googlevideo.com": "youtube.com", "ytimg.com": "youtube.com"}
+
+def classify_failure(message, stage="extract"):
+    for kind, pattern in FAILURE_PATTERNS:
+        # 404는 일시적 오류 패턴보다 먼저 (404 메시지에 "Unable to download"도 포함)
+        if kind == "transient" and NOT_FOUND_PATTERN.search(message or ""):
+            return "unavailable" if stage == "extract" else "transient"
+        if pattern.search(message or ""):
+            return kind
+    return "unknown"
+
+def backoff_delay(kind, attempt):
+    # 지수 백오프 + 지터 (대기 시간의 절반은 무작위 → 같은 시각에 몰리지 않도록)
+    _, base, cap = RETRY_POLICIES[kind]
+    delay = min(cap, base * 2 ** (attempt - 1))
+    return delay / 2 + random.uniform(0, delay / 2)
+
+def host_key(url):
+    host = urllib.parse.urlsplit(url or "").hostname or ""
+    if not re.fullmatch(r"[\d.]+|[0-9a-f:]+", host):
+        host = ".".join(host.split(".")[-2:])
+    return HOST_ALIASES.get(host, host)
+
+class FailureLog:
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self._conn = None
+
+    def _db(self):
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS failures ("
+                " key TEXT PRIMARY KEY, url TEXT, kind TEXT, error TEXT, count INTEGER,"
+                " first REAL, last REAL)"
+            )
+            self._conn = conn
+        return self._conn
+
+    def record(self, url, kind, error):
+        now = time.time()
+        with self.lock:
+            db = self._db()
+            db.execute(
+                "INSERT INTO failures (key, url, kind, error, count, first, last) VALUES (?, ?, ?, ?, 1, ?, ?)"
+                " ON CONFLICT (key) DO UPDATE SET kind = excluded.kind, error = excluded.error,"
+                " count = count + 1, last = excluded.last",
+                (extract_video_key(url), url, kind, error, now, now),
+            )
+            db.commit()
+
+    def lookup(self, url):
+        # 반환: (종류, 오류) 또는 None
+        if not FAILURE_SKIP:
+            return None
+        with self.lock:
+            return self._db().execute(
+                "SELECT kind, error FROM failures WHERE key = ?", (extract_video_key(url),)
+            ).fetchone()
+
+    def forget(self, url):
+        with self.lock:
+            db = self._db()
+            db.execute("DELETE FROM failures WHERE key = ?", (extract_video_key(url),))
+            db.commit()
+
+failures = FailureLog(FAILURE_LOG_PATH)
+
+class CircuitBreaker:
+    # 호스트별 요청 제한 감지 → 그 호스트로 가는 모든 작업을 잠시 중지
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.hosts = {}     # 호스트 → {"until": 재개 시각, "trips": 연속 감지 횟수}
+        self.trips = 0
+
+    def trip(self, url):
+        host = host_key(url)
+        now = time.monotonic()
+
+        with self.lock:
+            state = self.hosts.setdefault(host, {"until": 0, "trips": 0})
+            # 이미 중지 중 (같은 제한으로 실패한 다른 작업) → 연장하지 않음
+            if state["until"] > now:
+                return
+            cooldown = min(BREAKER_MAX_COOLDOWN, BREAKER_COOLDOWN * 2 ** state["trips"])
+            state["until"] = now + cooldown
+            state["trips"] += 1
+            self.trips += 1
+
+        print(f"\n[WARN] {host} 요청 제한 감지 → {cooldown:.0f}초 동안 이 호스트의 모든 작업 일시 중지")
+
+    def success(self, url):
+        state = self.hosts.get(host_key(url))
+        if state and state["trips"] and state["until"] <= time.monotonic():
+            with self.lock:
+                state["trips"] = 0
+
+    def paused(self, url):
+        state = self.hosts.get(host_key(url))
+        return bool(state) and state["until"] > time.monotonic()
+
+    def wait(self, job):
+        # 중지 중이면 재개될 때까지 대기 (대기 중에도 취소 요청 확인)
+        state = self.hosts.get(host_key(job["url"]))
+        while state:
+            remaining = state["until"] - time.monotonic()
+            if remaining <= 0:
+                return
+            check_cancelled(job)
+            time.sleep(min(remaining, 1))
+
+breaker = CircuitBreaker()
+
+class RetryScheduler:
+    # 재시도 대기 작업을 시간이 되면 큐 맨 뒤에 다시 넣음 + 진행 중인 작업 수 추적
+    # (입력이 끝나도 진행/대기 중인 작업이 남아 있으면 파이프라인을 닫지 않음)
+
+    def __init__(self, target_q):
+        self.target_q = target_q
+        self.cond = threading.Condition()
+        self.heap = []
+        self.seq = itertools.count()
+        self.outstanding = 0
+        self.thread = None
+        self.stats = {"retried": 0, "permanent": 0}
+
+    def add(self, count=1):
+        with self.cond:
+            self.outstanding += count
+
+    def done(self):
+        with self.cond:
+            self.outstanding -= 1
+            self.cond.notify_all()
+
+    def wait_idle(self):
+        with self.cond:
+            while self.outstanding > 0:
+                self.cond.wait()
+
+    def schedule(self, job, delay):
+        with self.cond:
+            heapq.heappush(self.heap, (time.monotonic() + delay, next(self.seq), job))
+            self.stats["retried"] += 1
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name="retry", daemon=True)
+                self.thread.start()
+            self.cond.notify_all()
+
+    def _run(self):
+        while True:
+            with self.cond:
+                while not self.heap or self.heap[0][0] > time.monotonic():
+                    self.cond.wait(self.heap[0][0] - time.monotonic() if self.heap else None)
+                _, _, job = heapq.heappop(self.heap)
+            self.target_q.put(job)
+
+    def handle_failure(self, stage, job, error):
+        # 반환: True = 재시도 예약됨
+        kind = classify_failure(error, stage)
+
+        if kind == "throttle":
+            breaker.trip(job["url"])
+
+        if kind in FAILURE_PERMANENT:
+            failures.record(job["url"], kind, error)
+            with self.cond:
+                self.stats["permanent"] += 1
+            return False
+
+        attempts = job.get("retries", {}).get(kind, 0) + 1
+        if stage not in RETRY_STAGES or attempts > RETRY_POLICIES[kind][0]:
+            return False
+
+        delay = backoff_delay(kind, attempts)
+        print(f"\n[INFO] 재시도 예약 ({kind} {attempts}/{RETRY_POLICIES[kind][0]}, {delay:.0f}초 후): {job['url']}")
+        journal.update(job.get("job_id"), "queued", error=f"{stage}: {error}")
+        self.schedule({
+            **job,
+            "info": None,
+            "retries": {**job.get("retries", {}), kind: attempts},
+            # 다운로드 중 실패 → 서명 URL 만료 가능성, 다시 추출
+            "refresh": stage == "download",
+        }, delay)
+        return True
+
+# ------------------------------------------------------------
+# 가용성 사전 확인 (pre-flight)
+# ------------------------------------------------------------
+# 배치/동기화 입력을 큐에 넣기 전에 YouTube 영상 URL을 묶음 단위로 동시에 가볍게 확인:
+#   oEmbed (수백 바이트)  200 → 사용 가능 / 404 → 삭제/없는 영상 / 401·403 → 아래 페이지 확인
+#   영상 페이지의 재생 상태 → 퍼가기 금지(재생 가능) / 로그인·멤버십·연령 확인 필요 / 재생 불가
+# 판정:
+#   available   : 큐에 넣음 (판단 불가 unknown 도 큐에 넣음 - 추출 단계에서 기존 방식으로 처리)
+#   auth        : 쿠키 필요 → 쿠키(cookiefile / cookiesfrombrowser)를 설정했으면 큐에 넣음
+#   unavailable : 삭제/비공개 전환/재생 불가
+# auth / unavailable 은 큐 입력 단계에서 건너뛰고 요약/보고서에 표시 (--retry-failed 로 무시).
+# 판정은 .state/preflight.sqlite3 에만 보관 (PREFLIGHT_TTL 동안 같은 영상은 다시 확인하지 않음, 지나면 다시 확인)
+# → 만료 없는 실패 기록(failures.sqlite3)에는 추출/다운로드에서 실제로 실패한 영상만 남음.
+# 지역 제한은 oEmbed로 알 수 없음 → 추출 단계에서 기록.
+PREFLIGHT_ENABLED = os.environ.get("YTDL_PREFLIGHT", "1") != "0"
+PREFLIGHT_PATH = os.path.join(STATE_DIR, "preflight.sqlite3")
+PREFLIGHT_WORKERS = 16
+PREFLIGHT_BATCH = 32            # 입력을 이 개수씩 읽어서 동시에 확인
+PREFLIGHT_TTL = {"available": 24 * 3600, "auth": 24 * 3600, "unavailable": 30 * 24 * 3600}
+PREFLIGHT_OEMBED_URL = "https://www.youtube.com/oembed?format=json&url="
+PREFLIGHT_WATCH_URL = "https://www.youtube.com/watch?v="
+PLAYABILITY_RE = re.compile(r'"playabilityStatus":\{"status":"(\w+)"(?:,"reason":"((?:[^"\\]|\\.)*)")?')
+COOKIE_OPTS = ("cookiefile", "cookiesfrombrowser")
+
+def probe_video(ydl, video_id):
+    # 반환: (판정, 설명)
+    from yt_dlp.networking import Request
+    from yt_dlp.networking.exceptions import HTTPError, RequestError
+
+    watch_url = PREFLIGHT_WATCH_URL + video_id
+    try:
+        with ydl.urlopen(Request(PREFLIGHT_OEMBED_URL + urllib.parse.quote(watch_url, safe=""))) as response:
+            response.read()
+        return "available", "oEmbed 200"
+    except HTTPError as e:
+        if e.status == 429:
+            breaker.trip(watch_url)
+            return "unknown", "요청 제한 (HTTP 429)"
+        if e.status in (400, 404, 410):
+            return "unavailable", f"삭제되었거나 없는 영상 (oEmbed {e.status})"
+        if e.status not in (401, 403):
+            return "unknown", f"oEmbed {e.status}"
+    except RequestError as e:
+        return "unknown", f"{type(e).__name__}: {e}"
+
+    # 401/403: 비공개·로그인 필요 또는 퍼가기 금지 → 영상 페이지의 재생 상태로 구분 (영문 메시지로 분류)
+    try:
+        with ydl.urlopen(Request(watch_url + "&hl=en", headers={"Accept-Language": "en-US,en"})) as response:
+            page = response.read().decode("utf-8", "replace")
+    except (HTTPError, RequestError) as e:
+        return "unknown", f"{type(e).__name__}: {e}"
+
+    m = PLAYABILITY_RE.search(page)
+    if not m:
+        return "unknown", "재생 상태 없음"
+
+    status, reason = m.group(1), m.group(2) or m.group(1)
+    if status == "OK":
+        return "available", "퍼가기 금지 (재생 가능)"
+    if status in ("LOGIN_REQUIRED", "AGE_CHECK_REQUIRED", "CONTENT_CHECK_REQUIRED") or classify_failure(reason) == "auth":
+        return "auth", reason
+    if status in ("ERROR", "UNPLAYABLE"):
+        return "unavailable", reason
+    return "unknown", reason
+
+class PreflightChecker:
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self._conn = None
+        self.enabled = PREFLIGHT_ENABLED
+        self.counts = collections.Counter()
+        self.rejected = []
+
+    def _db(self):
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS verdicts (key TEXT PRIMARY KEY, verdict TEXT, detail TEXT, checked REAL)"
+            )
+            self._conn = conn
+        return self._conn
+
+    def lookup(self, key):
+        with self.lock:
+            row = self._db().execute("SELECT verdict, detail, checked FROM verdicts WHERE key = ?", (key,)).fetchone()
+        if row and time.time() - row[2] < PREFLIGHT_TTL.get(row[0], 0):
+            return row[0], row[1]
+        return None
+
+    def store(self, key, verdict, detail):
+        with self.lock:
+            db = self._db()
+            db.execute("INSERT OR REPLACE INTO verdicts (key, verdict, detail, checked) VALUES (?, ?, ?, ?)",
+                       (key, verdict, detail, time.time()))
+            db.commit()
+
+    def check(self, url):
+        # 반환: 걸러낼 영상이면 (판정, 설명), 큐에 넣을 영상이면 None
+        key = extract_video_key(url)
+        cached = self.lookup(key)
+
+        if cached:
+            verdict, detail = cached
+            source = "cached"
+        elif breaker.paused(url):
+            # 요청 제한 중 → 확인하지 않고 통과 (추출 단계가 제한 해제를 기다림)
+            verdict, detail, source = "unknown", "요청 제한 대기 중", "skipped"
+        else:
+            with sessions.session(build_info_opts()) as ydl:
+                verdict, detail = probe_video(ydl, key.split(":", 1)[1])
+            source = "probed"
+            if verdict != "unknown":
+                self.store(key, verdict, detail)
+
+        # 쿠키가 있으면 로그인 필요 영상도 받을 수 있음 / --retry-failed 면 모두 다시 시도
+        viable = verdict in ("available", "unknown") or not FAILURE_SKIP or \
+            (verdict == "auth" and any(ydl_base_opts.get(k) for k in COOKIE_OPTS))
+
+        with self.lock:
+            self.counts[verdict] += 1
+            self.counts[source] += 1
+            if not viable:
+                self.rejected.append({"url": url, "verdict": verdict, "detail": detail})
+        return None if viable else (verdict, detail)
+
+    def screen(self, tasks):
+        # 입력을 PREFLIGHT_BATCH 개씩 읽어 동시에 확인한 뒤 순서대로 넘김
+        # 걸러낸 영상은 "preflight" 항목에 판정 → feed_queue 가 건너뛰고 요약에 기록
+        import concurrent.futures
+
+        tasks = iter(tasks)
+        with concurrent.futures.ThreadPoolExecutor(PREFLIGHT_WORKERS, thread_name_prefix="preflight") as pool:
+            while True:
+                batch = list(itertools.islice(tasks, PREFLIGHT_BATCH))
+                if not batch:
+                    return
+
+                # 영상 URL만 (플레이리스트/다른 사이트는 추출 단계에서), 이미 실패 기록이 있으면 확인하지 않음
+                targets = {}
+                for t in batch:
+                    if t.get("invalid"):
+                        continue
+                    key = extract_video_key(t["url"])
+                    if key.startswith("youtube:") and not key.startswith("youtube:playlist:") \
+                            and key not in targets and not failures.lookup(t["url"]):
+                        targets[key] = t["url"]
+
+                futures = {key: pool.submit(self.check, url) for key, url in targets.items()}
+                rejected = {}
+                for key, future in futures.items():
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        print(f"\n[WARN] 사전 확인 실패: {type(e).__name__}: {e}")
+                        continue
+                    if result:
+                        rejected[key] = result
+
+                for t in batch:
+                    result = not t.get("invalid") and rejected.get(extract_video_key(t["url"]))
+                    yield {**t, "preflight": result} if result else t
+
+    def summary(self):
+        with self.lock:
+            return {**self.counts, "rejected": len(self.rejected)}
+
+    def write_report(self, path):
+        # 큐에 넣지 않은 영상 목록 (JSONL)
+        with self.lock:
+            rejected = list(self.rejected)
+        with open(path, "w", encoding="utf-8") as f:
+            for item in rejected:
+                f.write(json.dumps(item, ensure_ascii=False) + "\n")
+        print(f"[INFO] 사전 확인 보고서: {path} ({len(rejected)}개)")
+
+preflight = PreflightChecker(PREFLIGHT_PATH)
+
+# ------------------------------------------------------------
+# 작업 스케줄러 (우선순위 / 공정 분배 / 마감 시각 / 채널별 동시 실행 제한)
+# ------------------------------------------------------------
+# 추출/다운로드 단계의 입력 큐. 꺼낼 때 순서:
+#   1. 마감 시각이 SCHED_DEADLINE_WINDOW 안으로 들어온 작업 (마감이 빠른 순)
+#   2. 우선순위 등급 순 (urgent → high → normal → low)
+#   3. 같은 등급 안에서는 출처(배치 파일, 플레이리스트, API 제출자)별로 돌아가며 하나씩
+# → 800개짜리 플레이리스트 뒤에 들어온 영상도 다음 차례에 실행됨.
+# 채널별 동시 실행 제한에 걸린 작업은 잠시 빼 두었다가 같은 채널 작업이 끝나면 다시 후보로.
+# 넣기/꺼내기 모두 O(1) ~ O(log n) (마감 시각 힙) - 수십만 개가 대기해도 일정.
+SCHED_PRIORITIES = ("urgent", "high", "normal", "low")
+SCHED_DEFAULT_PRIORITY = "normal"
+SCHED_MAX_QUEUED = 1000         # 추출 대기 최대 작업 수 = 입력을 앞서 읽는 범위 (우선순위/공정 분배는 이 범위 안에서,
+                                # 읽은 작업은 저널에 등록되므로 입력 전체를 미리 읽지 않도록 작게)
+SCHED_DOWNLOAD_WINDOW = 64      # 다운로드 대기 최대 작업 수 (추출 결과 info를 들고 있으므로 작게)
+SCHED_DEADLINE_WINDOW = 1800    # 마감 30분 전부터 다른 작업보다 먼저
+SCHED_WAIT_SAMPLES = 1000       # 등급별 대기 시간 분위수 계산용 최근 표본 수
+
+def parse_priority(value):
+    if value in (None, ""):
+        return SCHED_DEFAULT_PRIORITY
+    if value not in SCHED_PRIORITIES:
+        raise ValueError(f"알 수 없는 우선순위: {value} (사용 가능: {', '.join(SCHED_PRIORITIES)})")
+    return value
+
+def parse_deadline(value):
+    # 절대 시각(ISO 8601 / epoch) 또는 지금부터 상대 시간("90s", "30m", "2h", "1d", 초 단위 숫자)
+    from datetime import datetime
+
+    if value in (None, ""):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value) if value > 1e9 else time.time() + value
+
+    text = str(value).strip()
+    m = re.fullmatch(r"(\d+(?:\.\d+)?)([smhd]?)", text)
+    if m:
+        return parse_deadline(float(m.group(1)) * {"": 1, "s": 1, "m": 60, "h": 3600, "d": 86400}[m.group(2)])
+    return datetime.fromisoformat(text).timestamp()
+
+def job_source(job):
+    return job.get("source") or job["url"]
+
+def job_channel(job):
+    info = job.get("info") or {}
+    return info.get("channel_id") or info.get("uploader_id") or info.get("channel")
+
+class JobScheduler:
+
+    def __init__(self, maxsize=0, channel_limit=0):
+        self.maxsize = maxsize
+        self.channel_limit = channel_limit
+        self.cond = threading.Condition()
+        self.seq = itertools.count()
+        # 등급별: 출처 순환 목록 + 출처별 FIFO
+        self.classes = [{"ring": collections.deque(), "sources": {}} for _ in SCHED_PRIORITIES]
+        self.deadlines = []             # (마감 시각, 순번, 항목) 힙
+        self.parked = {}                # 채널 → 제한에 걸려 빼 둔 항목
+        self.ready = collections.deque()    # 자리가 나서 다시 후보가 된 항목
+        self.running = collections.Counter()
+        self.size = 0
+        self.forced = 0                 # 한도를 넘겨 넣은 항목 수 (한도 계산에서 제외)
+        self.closing = 0
+        self.stats = [
+            {"waiting": 0, "dispatched": 0, "wait_total": 0.0, "wait_max": 0.0, "missed": 0,
+             "samples": collections.deque(maxlen=SCHED_WAIT_SAMPLES)}
+            for _ in SCHED_PRIORITIES
+        ]
+
+    def put(self, job, force=False):
+        # None = 종료 신호 (대기 중인 작업이 모두 나간 뒤 전달)
+        # force / urgent → 가득 차도 바로 넣고 한도 계산에서 제외
+        # (플레이리스트 항목 펼치기가 추출 워커를 붙잡거나 뒤에 오는 작업을 막지 않도록)
+        with self.cond:
+            if job is None:
+                self.closing += 1
+                self.cond.notify_all()
+                return
+
+            level = SCHED_PRIORITIES.index(job.get("priority") or SCHED_DEFAULT_PRIORITY)
+            force = force or level == 0
+            if force:
+                self.forced += 1
+            else:
+                while self.maxsize and self.size - self.forced >= self.maxsize:
+                    self.cond.wait()
+
+            # 항목: [작업, 꺼냄 여부, 넣은 시각, 등급, 한도 제외 여부]
+            entry = [job, False, time.time(), level, force]
+            cls = self.classes[level]
+            source = job_source(job)
+            pending = cls["sources"].get(source)
+            if pending is None:
+                pending = cls["sources"][source] = collections.deque()
+                cls["ring"].append(source)
+            pending.append(entry)
+
+            if job.get("deadline"):
+                heapq.heappush(self.deadlines, (job["deadline"], next(self.seq), entry))
+
+            self.size += 1
+            self.stats[level]["waiting"] += 1
+            self.cond.notify_all()
+
+    def _candidate(self):
+        if self.ready:
+            return self.ready.popleft()
+
+        # 마감이 가까운 작업 (이미 꺼낸 항목은 힙에서 버림)
+        while self.deadlines:
+            deadline, _, entry = self.deadlines[0]
+            if entry[1]:
+                heapq.heappop(self.deadlines)
+                continue
+            if deadline - time.time() > SCHED_DEADLINE_WINDOW:
+                break
+            heapq.heappop(self.deadlines)
+            entry[1] = True
+            return entry
+
+        for cls in self.classes:
+            while cls["ring"]:
+                source = cls["ring"].popleft()
+                pending = cls["sources"][source]
+                while pending and pending[0][1]:
+                    pending.popleft()
+                if not pending:
+                    del cls["sources"][source]
+                    continue
+
+                entry = pending.popleft()
+                entry[1] = True
+                if pending:
+                    cls["ring"].append(source)
+                else:
+                    del cls["sources"][source]
+                return entry
+        return None
+
+    def get(self):
+        with self.cond:
+            while True:
+                entry = self._candidate()
+                while entry is not None:
+                    channel = job_channel(entry[0]) if self.channel_limit else None
+                    if not channel or self.running[channel] < self.channel_limit:
+                        break
+                    self.parked.setdefault(channel, collections.deque()).append(entry)
+                    entry = self._candidate()
+
+                if entry is not None:
+                    return self._dispatch(entry, channel)
+
+                if self.closing and not self.size:
+                    self.closing -= 1
+                    return None
+
+                self.cond.wait()
+
+    def _dispatch(self, entry, channel):
+        job, _, queued, level, forced = entry
+        now = time.time()
+        wait = now - queued
+
+        stats = self.stats[level]
+        stats["waiting"] -= 1
+        stats["dispatched"] += 1
+        stats["wait_total"] += wait
+        stats["wait_max"] = max(stats["wait_max"], wait)
+        stats["samples"].append(wait)
+        if job.get("deadline") and now > job["deadline"]:
+            stats["missed"] += 1
+
+        if channel:
+            self.running[channel] += 1
+        if forced:
+            self.forced -= 1
+        self.size -= 1
+        self.cond.notify_all()
+        return job
+
+    def release(self, job):
+        # 작업 처리가 끝나면 호출 → 같은 채널의 빼 둔 작업을 다시 후보로
+        channel = job_channel(job) if self.channel_limit else None
+        if not channel:
+            return
+
+        with self.cond:
+            self.running[channel] -= 1
+            if self.running[channel] <= 0:
+                del self.running[channel]
+
+            parked = self.parked.get(channel)
+            if parked:
+                self.ready.append(parked.popleft())
+                if not parked:
+                    del self.parked[channel]
+            self.cond.notify_all()
+
+    def qsize(self):
+        return self.size
+
+    def summary(self):
+        with self.cond:
+            result = {}
+            for name, stats in zip(SCHED_PRIORITIES, self.stats):
+                if not stats["dispatched"] and not stats["waiting"]:
+                    continue
+
+                samples = sorted(stats["samples"])
+                result[name] = {
+                    "waiting": stats["waiting"],
+                    "dispatched": stats["dispatched"],
+                    "mean_wait": round(stats["wait_total"] / stats["dispatched"], 2) if stats["dispatched"] else 0.0,
+                    "p95_wait": round(samples[int(len(samples) * 0.95)], 2) if samples else 0.0,
+                    "max_wait": round(stats["wait_max"], 2),
+                    "missed_deadlines": stats["missed"],
+                }
+            return result
 
-    print("[INFO] 실행 환경 점검 중...")
+# 실행 중인 파이프라인의 스케줄러 (데몬 /health 에서 대기 시간 조회)
+pipeline_queues = {}
+
+# ------------------------------------------------------------
+# 스트리밍 변환 (다운로드 → ffmpeg 파이프)
+# ------------------------------------------------------------
+# mp3/mp4 변환 작업의 스트림이 하나(오디오만 / 영상+오디오 단일 파일)이고 앞에서부터 읽을 수 있는
+# 컨테이너(webm, DASH 조각 m4a 등)면, 받는 데이터를 디스크에 쓰지 않고 바로 ffmpeg stdin으로 넘김.
+# → 변환이 다운로드와 동시에 진행되고 디스크에는 최종 결과만 씀 (스트림 파일 쓰기/다시 읽기 없음).
+# 끝에 인덱스(moov)가 있을 수 있는 mp4/m4a, 조각(DASH/HLS) 프로토콜, 여러 스트림 병합은 기존 2단계.
+# ffmpeg가 파이프 입력을 처리하지 못하면 같은 작업을 2단계로 다시 실행.
+STREAM_TRANSCODE = os.environ.get("YTDL_STREAM_TRANSCODE", "1") != "0"
+STREAM_PROTOCOLS = ("http", "https")
+STREAM_SEEK_EXTS = ("mp4", "m4a", "mov", "3gp")
+STREAM_CHUNK_SIZE = 10 * 1024 * 1024    # Range 요청 크기 (YouTube는 큰 단일 요청을 느리게 보냄)
+STREAM_BLOCK_SIZE = 256 * 1024
+
+class StreamFallback(Exception):
+    pass
+
+def streamable_format(info, format_ids, convert, ops):
+    # 스트리밍 변환할 포맷 dict (대상이 아니면 None)
+    if not STREAM_TRANSCODE or convert not in OUTPUT_POLICIES or not ops or len(format_ids) != 1:
+        return None
+
+    fmt = next((f for f in info.get("formats") or [info] if f.get("format_id") == format_ids[0]), None)
+    if not fmt or fmt.get("protocol") not in STREAM_PROTOCOLS or not fmt.get("url"):
+        return None
+
+    # 이미 목표 형식 → 이름만 변경 (ffmpeg 불필요)
+    if all(op == "copy" for op in ops.values()) and fmt.get("ext") == convert:
+        return None
+    # 앞에서부터 읽을 수 없을 수 있는 컨테이너 (DASH 조각 형식은 가능)
+    if fmt.get("ext") in STREAM_SEEK_EXTS and not (fmt.get("container") or "").endswith("_dash"):
+        return None
+    return fmt
+
+def stream_transcode(ydl, info, fmt, convert, ops, output_base):
+    # 반환: 최종 파일 경로. 진행률은 ydl의 progress hook으로 (대역폭 제한/공간 감시/취소 그대로 동작)
+    from yt_dlp.networking import Request
+    from yt_dlp.networking.exceptions import HTTPError, RequestError
+
+    output = f"{output_base}.{convert}"
+    tmp_output = f"{output_base}.temp.{convert}"
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+
+    proc = subprocess.Popen(
+        [resolve_ffmpeg(), "-y", "-loglevel", "error", "-i", "pipe:0", *convert_args(convert, ops, 1), tmp_output],
+        stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+    )
+    # stderr를 따로 읽음 (버퍼가 차서 ffmpeg가 멈추지 않도록)
+    stderr = []
+    reader = threading.Thread(target=lambda: stderr.append(proc.stderr.read()), daemon=True)
+    reader.start()
+
+    stream_info = {**info, **fmt}
+    hooks = list(ydl._progress_hooks)
+    logger = ydl.params["logger"]
+    retries = ydl.params.get("retries", 10)
+    headers = fmt.get("http_headers") or {}
+    total = fmt.get("filesize")
+    offset = 0
+    attempt = 0
+    start = time.time()
+
+    def report(status):
+        elapsed = time.time() - start
+        d = {
+            "status": status, "filename": output, "tmpfilename": tmp_output,
+            "downloaded_bytes": offset, "total_bytes": total if status == "downloading" else offset,
+            "elapsed": elapsed, "speed": offset / elapsed if elapsed > 0 else None, "info_dict": stream_info,
+        }
+        for hook in hooks:
+            hook(d)
+
+    def feed(block):
+        try:
+            proc.stdin.write(block)
+        except BrokenPipeError:
+            # ffmpeg가 입력을 포기함 (탐색이 필요한 형식 등)
+            proc.wait()
+            reader.join()
+            raise StreamFallback(b"".join(stderr).decode(errors="replace").strip()[-300:] or "ffmpeg 종료")
+
+    try:
+        while total is None or offset < total:
+            request = Request(fmt["url"], headers={**headers, "Range": f"bytes={offset}-{offset + STREAM_CHUNK_SIZE - 1}"})
+            received = 0
+            try:
+                with ydl.urlopen(request) as response:
+                    if response.status == 206:
+                        m = re.search(r"/(\d+)$", response.headers.get("Content-Range") or "")
+                        total = int(m.group(1)) if m else total
+                        skip = 0
+                    else:
+                        # Range 미지원 → 처음부터 다시 받으면서 이미 넘긴 부분은 건너뜀
+                        total = int(response.headers.get("Content-Length") or 0) or None
+                        skip = offset
+
+                    while True:
+                        block = response.read(STREAM_BLOCK_SIZE)
+                        if not block:
+                            break
+                        if skip:
+                            block, skip = block[skip:], max(0, skip - len(block))
+                            if not block:
+                                continue
+                        feed(block)
+                        offset += len(block)
+                        received += len(block)
+                        report("downloading")
+
+                    if response.status != 206:
+                        total = offset
+            except HTTPError as e:
+                if e.status == 416 and offset:
+                    break
+                if e.status < 500 or attempt >= retries:
+                    raise RuntimeError(f"스트리밍 다운로드 실패: HTTP Error {e.status}: {e.reason}")
+                error = e
+            except RequestError as e:
+                if attempt >= retries:
+                    raise RuntimeError(f"스트리밍 다운로드 실패: {e}")
+                error = e
+            else:
+                # 전체 크기를 모르는 서버 → 요청보다 적게 오면 끝
+                if total is None and received < STREAM_CHUNK_SIZE:
+                    total = offset
+                if received or offset >= total:
+                    attempt = 0
+                    continue
+                # 남은 부분이 있는데 빈 응답 → 오류로 세고 대기 후 다시 (같은 요청을 끝없이 반복하지 않도록)
+                error = f"빈 응답 ({offset}/{total} 바이트)"
+                if attempt >= retries:
+                    raise RuntimeError(f"스트리밍 다운로드 실패: {error}")
+
+            # 끊긴 위치부터 이어받기
+            attempt += 1
+            logger.warning(f"[stream] {error}. Retrying ({attempt}/{retries})...")
+            time.sleep(ydl_retry_sleep(attempt))
+
+        proc.stdin.close()
+        returncode = proc.wait()
+        reader.join()
+        if returncode != 0:
+            raise StreamFallback(b"".join(stderr).decode(errors="replace").strip()[-300:])
+
+        os.replace(tmp_output, output)
+        report("finished")
+        return output
+    except BaseException:
+        if proc.poll() is None:
+            proc.kill()
+            proc.wait()
+        if os.path.exists(tmp_output):
+            os.remove(tmp_output)
+        raise
+
+# ------------------------------------------------------------
+# 단계별 파이프라인 (추출 → 다운로드 → 후처리)
+# ------------------------------------------------------------
+# 각 단계는 별도의 크기 제한 큐와 동시 실행 수를 가짐
+# - extract     : 메타데이터 추출 (네트워크)
+# - download    : 스트림 다운로드 (네트워크) - 병합/변환 없이 개별 파일로 저장
+# - postprocess : ffmpeg 병합/변환 (CPU) - CPU 수 크기의 프로세스 풀
+# 후처리 큐가 가득 차면 다운로드 단계가 대기 → 디스크/CPU보다 앞서 나가지 않음
+PIPELINE_LIMITS = {
+    "extract": 3,
+    "download": 3,
+    "postprocess": os.cpu_count() or 2,
+    "channel": 0,                # 채널별 동시 다운로드 수 (0 = 제한 없음)
+}
+PIPELINE_QUEUE_FACTOR = 2       # 단계별 큐 크기 = 동시 실행 수 * factor
+
+DEFAULT_FORMAT = "bv*+ba/best"
+STREAM_OUTTMPL = "%(title)s.f%(format_id)s.%(ext)s"
+FINAL_OUTTMPL = "%(title)s.%(ext)s"
+PLAYLIST_OUTTMPL = "%(playlist_title)s/%(title)s.%(ext)s"
+
+def resolve_ffmpeg():
+    location = ydl_base_opts.get("ffmpeg_location")
+
+    if location and os.path.isdir(location):
+        candidate = os.path.join(location, "ffmpeg.exe" if os.name == "nt" else "ffmpeg")
+        if os.path.exists(candidate):
+            return candidate
+    elif location and os.path.exists(location):
+        return location
+
+    return shutil.which("ffmpeg")
+
+def run_ffmpeg(ffmpeg, args, output):
+    # 임시 파일에 쓰고 완료 후 이름 변경 (중단 시 불완전한 결과 파일 방지)
+    base, ext = os.path.splitext(output)
+    tmp_output = f"{base}.temp{ext}"
+    cmd = [ffmpeg, "-y", "-loglevel", "error", *args, tmp_output]
+
+    result = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    if result.returncode != 0:
+        if os.path.exists(tmp_output):
+            os.remove(tmp_output)
+        raise RuntimeError(f"ffmpeg 실패: {result.stderr.strip()[-500:]}")
+
+    os.replace(tmp_output, output)
+    return output
+
+def postprocess_files(spec):
+    # 프로세스 풀에서 실행 (pickle 가능한 dict만 주고받음)
+    # 반환: {"path": 최종 파일, "steps": [단계별 시작 시각/소요 시간]} → 부모 프로세스에서 metrics 기록
+    inputs = spec["inputs"]
+    base = spec["output_base"]
+    ffmpeg = spec["ffmpeg"]
+    convert = spec.get("convert")
+    steps = []
+
+    if (len(inputs) > 1 or convert) and not ffmpeg:
+        raise RuntimeError("ffmpeg를 찾을 수 없습니다.")
+
+    # 계획된 스트림별 작업 → 병합과 변환을 한 번에 (중간 파일 없음)
+    if convert and spec.get("ops"):
+        return convert_with_ops(spec)
+
+    # 1. 병합 (video + audio → merge_output_format, 재인코딩 없음)
+    if len(inputs) > 1:
+        start = time.time()
+        merged = f"{base}.{spec.get('merge_format') or 'mp4'}"
+        args = []
+        for path in inputs:
+            args += ["-i", path]
+        args += ["-map", "0:v:0?", "-map", "1:a:0?", "-c", "copy", "-movflags", "+faststart"]
+        current = run_ffmpeg(ffmpeg, args, merged)
+        for path in inputs:
+            os.remove(path)
+        steps.append({"phase": "merge", "start": start, "duration": time.time() - start,
+                      "bytes": os.path.getsize(current)})
+    else:
+        current = f"{base}{os.path.splitext(inputs[0])[1]}"
+        os.replace(inputs[0], current)
+
+    # 2. 변환 (mp3/mp4)
+    if convert == "mp3":
+        output = f"{base}.mp3"
+        args = ["-i", current, "-vn", "-c:a", "libmp3lame", "-b:a", "192k"]
+    elif convert == "mp4" and not current.endswith(".mp4"):
+        output = f"{base}.mp4"
+        args = ["-i", current]
+    else:
+        return {"path": current, "steps": steps}
+
+    start = time.time()
+    run_ffmpeg(ffmpeg, args, output)
+    os.remove(current)
+    steps.append({"phase": "convert", "start": start, "duration": time.time() - start,
+                  "bytes": os.path.getsize(output)})
+    return {"path": output, "steps": steps}
+
+def convert_args(convert, ops, input_count):
+    # 스트림별 작업(copy/transcode) → 출력 인자 (입력 인자 뒤에 붙임)
+    if convert == "mp3":
+        return ["-vn", "-c:a", "copy"] if ops.get("audio") == "copy" else ["-vn", "-c:a", "libmp3lame", "-b:a", "192k"]
+
+    return [
+        "-map", "0:v:0?", "-map", f"{input_count - 1}:a:0?",
+        "-c:v", "copy" if ops.get("video", "copy") == "copy" else "libx264",
+        "-c:a", "copy" if ops.get("audio", "copy") == "copy" else "aac",
+        "-movflags", "+faststart",
+    ]
+
+def convert_with_ops(spec):
+    inputs = spec["inputs"]
+    ops = spec["ops"]
+    convert = spec["convert"]
+    output = f"{spec['output_base']}.{convert}"
+    copy_only = all(op == "copy" for op in ops.values())
+
+    # 이미 목표 형식의 단일 파일 → 이름만 변경
+    if copy_only and len(inputs) == 1 and inputs[0].endswith(f".{convert}"):
+        os.replace(inputs[0], output)
+        return {"path": output, "steps": []}
+
+    args = []
+    for path in inputs:
+        args += ["-i", path]
+    args += convert_args(convert, ops, len(inputs))
+
+    start = time.time()
+    run_ffmpeg(spec["ffmpeg"], args, output)
+    for path in inputs:
+        os.remove(path)
+
+    return {"path": output, "steps": [{
+        "phase": "remux" if copy_only else "convert",
+        "start": start,
+        "duration": time.time() - start,
+        "bytes": os.path.getsize(output),
+    }]}
+
+def select_format_ids(ydl, info, spec):
+    # 이미 추출된 formats에서 yt-dlp 포맷 선택 규칙으로 스트림 결정 (네트워크 없음)
+    formats = info.get("formats") or [info]
+    selected = ydl._select_formats(formats, ydl.build_format_selector(spec))
+
+    if not selected:
+        return []
+
+    best = selected[0]
+    return [f["format_id"] for f in best.get("requested_formats") or [best]]
+
+def select_job_formats(job, info):
+    # 반환: (포맷 설명, 받을 format_id 목록, 스트림별 ffmpeg 작업)
+    # ffmpeg가 없으면 병합이 필요 없는 단일 스트림 선택
+    if job.get("preset"):
+        return f"preset {job['preset']}", FormatTable(info).select(job["preset"], merge=bool(resolve_ffmpeg())), None
+
+    if job.get("convert") and not job.get("video_fmt") and not job.get("audio_fmt"):
+        plan = plan_output(info, job["convert"], merge=bool(resolve_ffmpeg()))
+        log_plan(plan, job["url"])
+        return f"{job['convert']} 계획", plan["format_ids"], plan["ops"]
+
+    spec = job.get("video_fmt") or (DEFAULT_FORMAT if resolve_ffmpeg() else "best")
+    if job.get("audio_fmt"):
+        spec = f"{job['video_fmt']}+{job['audio_fmt']}" if job.get("video_fmt") else job["audio_fmt"]
+    with sessions.session(ydl_base_opts) as ydl:
+        return spec, select_format_ids(ydl, info, spec), None
+
+def compact_info(info, format_ids):
+    # 선택한 스트림의 포맷만 남긴 info (다운로드 단계에서 process_ie_result에 그대로 사용)
+    wanted = set(format_ids)
+    slim = {k: v for k, v in info.items() if k not in HEAVY_FIELDS and k not in PROCESSED_FIELDS}
+    if info.get("formats"):
+        slim["formats"] = [f for f in info["formats"] if f.get("format_id") in wanted]
+    return slim
+
+def extract_stage(job, out_q, summary, retry, expand_q):
+    # 이미 받은 영상 → 추출 없이 완료 처리 (플레이리스트 항목은 폴더가 정해지는 다운로드 단계에서)
+    if not job.get("playlist") and satisfy_from_archive(archive_key_from_url(job["url"]), job_archive_variant(job), job["output"]):
+        out_q.put({**job, "archived": True})
+        return
+
+    check_cancelled(job)
+    breaker.wait(job)
+    # 분산 모드: 대기 중에 다른 노드가 가져간 작업 → 실행하지 않음
+    if not journal.update(job.get("job_id"), "extracting"):
+        raise LeaseLost("다른 노드로 넘어감")
+
+    # 플레이리스트 → 항목을 추출하지 않고 페이지 단위로 읽으면서 항목별 작업(URL만)으로 분리
+    # 항목은 다시 추출 단계로 → 항목 수와 관계없이 info는 처리 중인 작업 것만 메모리에 있음
+    def expand(ydl, playlist):
+        meta = playlist_meta(playlist)
+        for index, entry in iter_playlist_entries(ydl, playlist):
+            check_cancelled(job)
+            # 펼치다 실패해서 재시도 → 이미 넣은 항목은 건너뜀 (저널 없이도 중복 실행 없음)
+            if index <= job.get("expanded_upto", 0):
+                continue
+            admit(meta, index, entry)
+            job["expanded_upto"] = index
+
+    def admit(meta, index, entry):
+        child = {
+            **job,
+            "url": entry.get("webpage_url") or entry.get("url"),
+            "playlist": True,
+            "playlist_extra": {**meta, "playlist_index": index, "playlist_autonumber": index},
+            "parent_id": job.get("job_id"),
+            "job_id": None,
+            "source": f"playlist:{job['url']}",
+            "retries": {},
+            "refresh": False,
+        }
+        child.pop("expanded_upto", None)
+        # URL이 아니라 이미 추출된 영상을 주는 추출기 → 그 항목을 그대로 사용
+        if entry.get("_type", "video") == "video":
+            child["entry"] = entry
+
+        recorded = failures.lookup(child["url"])
+        if recorded:
+            summary.record(child["url"], f"이전 실패 기록 ({recorded[0]}): {recorded[1]}", skipped=True)
+            return
+
+        # 분산 모드: 저장 위치는 항목을 실행하는 노드가 정함 (같은 작업 판별 키도 노드와 무관하게)
+        if cluster.enabled():
+            child.update(output=job.get("shared_output"), auto_place=None)
+
+        if JOURNAL_ENABLED:
+            # 이어서 실행하는 플레이리스트 → 중단된 항목도 다시 (child가 resumed를 물려받음)
+            child["job_id"], previous, runnable = journal.enqueue(child, parent=job.get("job_id"),
+                                                                  resume=child.get("resumed", False))
+            if not runnable:
+                if previous not in JOB_ACTIVE_STATES:
+                    summary.record(child["url"], skipped=True)
+                return
+
+        # 분산 모드: 저널에 등록만 → 어느 노드든 가져감
+        if cluster.enabled():
+            return
+
+        # 대기 한도와 관계없이 넣음 (작은 작업 dict) → 추출 워커끼리 서로 기다리지 않음
+        retry.add()
+        expand_q.put(child, force=True)
+
+    errors = []
+    if job.get("entry") and not job.get("refresh"):
+        with sessions.session(build_info_opts()) as ydl:
+            info = ydl.sanitize_info(ydl.process_ie_result(job.pop("entry"), download=False))
+    else:
+        info = fetch_video_info(job["url"], refresh=job.get("refresh", False), errors=errors, on_playlist=expand)
+
+    if info is None:
+        raise RuntimeError(f"정보 추출 실패: {errors[-1]}" if errors else "정보 추출 실패")
+
+    if info.get("_type") == "playlist":
+        journal.update(job.get("job_id"), "expanded")
+        retry.done()
+        return
+
+    # 플레이리스트 항목 → 플레이리스트 폴더(%(playlist_title)s)에 저장
+    if job.get("playlist_extra"):
+        info = {**info, **job["playlist_extra"]}
+
+    # 스트림을 여기서 정하고 나머지 포맷/자막/썸네일 정보는 버림 → 다운로드 대기 작업은 수 KB
+    spec, format_ids, ops = select_job_formats(job, info)
+    if not format_ids:
+        raise RuntimeError(f"요청한 포맷 없음: {spec}")
+
+    out_q.put({**job, "info": compact_info(info, format_ids), "format_ids": format_ids, "ops": ops})
+
+def download_stage(job, out_q):
+    if job.get("archived"):
+        out_q.put(job)
+        return
+
+    check_cancelled(job)
+    breaker.wait(job)
+    journal.update(job.get("job_id"), "downloading")
+    info = job["info"]
+    format_ids, ops = job["format_ids"], job["ops"]
+    job_bytes = {}
+    partial = set()
+
+    def byte_hook(d):
+        if d["status"] == "finished":
+            job_bytes[d.get("filename")] = d.get("total_bytes") or d.get("downloaded_bytes") or 0
+
+        # 다운로드 중 취소 요청 → 중단 (.part 파일은 남겨서 나중에 이어받기)
+        check_cancelled(job)
+        events.progress(job.get("job_id"), d)
+
+    final_tmpl = PLAYLIST_OUTTMPL if job.get("playlist") else FINAL_OUTTMPL
+    stream_tmpl = os.path.join(os.path.dirname(final_tmpl), STREAM_OUTTMPL)
+
+    opts = {
+        **ydl_base_opts,
+        "outtmpl": os.path.join(job["output"], stream_tmpl),
+        "progress_hooks": [progress_hook, byte_hook, space_guard(partial)],
+        "continuedl": True,     # 중단된 실행의 .part 파일에서 이어받기
+    }
+
+    with sessions.session(opts) as ydl:
+        # 다른 폴더(플레이리스트)에서 이미 받은 영상 → 연결만
+        variant = job_archive_variant(job)
+        output_dir = os.path.dirname(ydl.prepare_filename(info, outtmpl=os.path.join(job["output"], final_tmpl)))
+        if satisfy_from_archive(archive_key_from_info(info), variant, output_dir):
+            out_q.put({**job, "info": None, "archived": True})
+            return
+
+        # 쉼표 = 각 스트림을 병합 없이 개별 파일로 다운로드
+        ydl.format_selector = ydl.build_format_selector(",".join(format_ids))
+
+        # 예상 크기를 볼륨에 예약 (후처리 완료 시 해제)
+        nbytes = estimate_job_size(info, format_ids, job.get("convert"))
+        preferred = None if job.get("auto_place") else job["output"]
+        exclude = set()
+
+        # 단일 스트림 변환 → 받으면서 바로 ffmpeg로 (스트림 파일 없음)
+        stream_fmt = resolve_ffmpeg() and streamable_format(info, format_ids, job.get("convert"), ops)
+        streamed = None
+        use_staging = staging.enabled()
+
+        while True:
+            download_dir, token = placer.place(nbytes, preferred, exclude)
+
+            # 스테이징: 빠른 디스크에서 받고 후처리까지 → 최종 위치로는 이동 스레드가
+            work_dir, stage_token = download_dir, None
+            if use_staging:
+                stage_dir = staging.stage_dir(download_dir)
+                stage_token = stage_dir and staging.reserve(nbytes)
+                if stage_token:
+                    work_dir = stage_dir
+            try:
+                ydl.params["outtmpl"] = {**ydl.params["outtmpl"], "default": os.path.join(work_dir, stream_tmpl)}
+                output_base = os.path.splitext(ydl.prepare_filename(info, outtmpl=os.path.join(work_dir, final_tmpl)))[0]
+
+                if stream_fmt:
+                    try:
+                        streamed = stream_transcode(ydl, info, stream_fmt, job["convert"], ops, output_base)
+                        break
+                    except StreamFallback as e:
+                        print(f"\n[WARN] 스트리밍 변환 불가 → 다운로드 후 변환: {job['url']} ({e})")
+                        stream_fmt = None
+                        job_bytes.clear()
+
+                result = ydl.process_ie_result(info, download=True)
+
+                if ydl._download_retcode:
+                    errors = ydl.params["logger"].errors
+                    raise RuntimeError(f"yt-dlp 다운로드 오류: {errors[-1]}" if errors else "yt-dlp 다운로드 오류")
+                break
+            except DiskSpaceError as e:
+                # 디스크가 차기 전에 중단 → 받던 파일 삭제 후 다른 볼륨에서 다시
+                # (스테이징 디스크가 찬 경우 → 스테이징 없이 최종 위치에서 다시)
+                placer.release(token)
+                staging.release(stage_token)
+                remove_partial(partial)
+                partial.clear()
+                job_bytes.clear()
+                if work_dir != download_dir:
+                    print(f"\n[WARN] {e} → 스테이징 없이 {download_dir} 에 받음")
+                    use_staging = False
+                else:
+                    print(f"\n[WARN] {e} → 다른 볼륨으로 이동")
+                    exclude.add(download_dir)
+                    preferred = None
+            except BaseException:
+                placer.release(token)
+                staging.release(stage_token)
+                raise
+
+    if streamed:
+        inputs = [streamed]
+    else:
+        inputs = [d["filepath"] for d in (result or {}).get("requested_downloads") or [] if d.get("filepath")]
+    if not inputs:
+        placer.release(token)
+        staging.release(stage_token)
+        raise RuntimeError("다운로드된 파일 없음")
+
+    breaker.success(job["url"])
+
+    out_q.put({
+        **job,
+        "info": None,           # 큰 info dict는 다음 단계로 넘기지 않음
+        "output": download_dir,
+        "reservation": token,
+        "staging": [work_dir, stage_token] if stage_token else None,
+        "archive_key": archive_key_from_info(info),
+        "bytes": sum(job_bytes.values()),
+        "pp_spec": {
+            "inputs": inputs,
+            "output_base": output_base,
+            "convert": job.get("convert"),
+            "ops": ops,
+            "ffmpeg": resolve_ffmpeg(),
+            "merge_format": ydl_base_opts.get("merge_output_format"),
+            "streamed": bool(streamed),
+        },
+    })
+
+def postprocess_stage(job, pool):
+    spec = job["pp_spec"]
+
+    # 다운로드 중에 이미 변환된 최종 파일
+    if spec.get("streamed"):
+        return spec["inputs"][0]
+
+    # 단일 파일 + 변환 없음 (또는 이미 목표 형식) → 이름만 변경 (프로세스 풀 불필요)
+    ops = spec.get("ops")
+    already = bool(ops) and all(op == "copy" for op in ops.values()) and \
+        spec["inputs"][0].endswith(f".{spec['convert']}")
+    if len(spec["inputs"]) == 1 and (not spec["convert"] or already):
+        return postprocess_files(spec)["path"]
+
+    result = pool.submit(postprocess_files, spec).result()
+    for step in result["steps"]:
+        metrics.record(step["phase"], step["start"], duration=step["duration"],
+                       url=job["url"], bytes=step["bytes"])
+    return result["path"]
+
+def start_stage(name, count, in_q, handler, summary, retry, out_q=None, next_count=0):
+    # 스케줄러 큐 → 작업이 끝나면 채널별 실행 슬롯 반환
+    release = getattr(in_q, "release", None)
+
+    def loop():
+        while True:
+            job = in_q.get()
+            if job is None:
+                return
+
+            try:
+                handler(job)
+            except LeaseLost:
+                # 다른 노드가 실행 / 기록
+                print(f"\n[INFO] 다른 노드로 넘어감: {job['url']}")
+                retry.done()
+            except JobCancelled:
+                print(f"\n[INFO] 취소됨: {job['url']}")
+                summary.record(job["url"], skipped=True)
+                journal.update(job.get("job_id"), "cancelled")
+                retire_cancelled(job)
+                retry.done()
+            except Exception as e:
+                # 일시적 오류/요청 제한 → 워커를 붙잡지 않고 대기 후 큐 맨 뒤로
+                if retry.handle_failure(name, job, str(e)):
+                    continue
+
+                error = f"{name} ({classify_failure(str(e), name)}): {type(e).__name__}: {e}"
+                print(f"\n[ERROR] {name} 실패: {job['url']} → {e}")
+                summary.record(job["url"], error)
+                journal.update(job.get("job_id"), "failed", error=error)
+                retire_cancelled(job)
+                metrics.record("job", job.get("queued_at", time.time()), "error",
+                               url=job["url"], stage=name, error=f"{type(e).__name__}: {e}")
+                retry.done()
+            else:
+                # 마지막 단계까지 끝난 작업
+                if out_q is None:
+                    retry.done()
+            finally:
+                if release:
+                    release(job)
+
+    threads = [threading.Thread(target=loop, name=f"{name}-{i}", daemon=True) for i in range(count)]
+    for th in threads:
+        th.start()
+
+    # 모든 워커 종료 후 다음 단계에 종료 신호 전달
+    def close():
+        for th in threads:
+            th.join()
+        for _ in range(next_count):
+            out_q.put(None)
+
+    closer = threading.Thread(target=close, name=f"{name}-close", daemon=True)
+    closer.start()
+    return closer
+
+def admit_task(t, download_dir):
+    # 반환: (작업, 이전 상태, 실행 여부)
+    task = {
+        **t,
+        "output": t.get("output") or download_dir,
+        "auto_place": t.get("auto_place", placer.enabled() and not t.get("output")),
+        "admitted": True,
+    }
+
+    # 저널: 이미 끝난 작업은 건너뛰고, 중단된 작업은 이어서 실행
+    if not JOURNAL_ENABLED:
+        return task, None, True
+
+    task["job_id"], previous, runnable = journal.enqueue(task, resume=t.get("resumed", False))
+    if runnable and task["job_id"] in cancelled_jobs:
+        # 취소한 작업이 아직 파이프라인에서 빠지지 않음 → 취소를 그대로 두고 다시 넣지 않음
+        journal.update(task["job_id"], "cancelled")
+        return task, "cancelled", False
+    if runnable and (previous in JOB_ACTIVE_STATES or previous == "expanded"):
+        print(f"\n[INFO] 이어서 실행: {t['url']} ({previous})")
+
+    return task, previous, runnable
+
+def feed_queue(q, tasks, download_dir, summary, count, retry, window=0):
+    # 분산 모드: 입력은 공유 저널에 등록만, 실행할 작업은 저널에서 window 개까지 가져옴
+    puller = None
+    if cluster.enabled():
+        input_done = threading.Event()
+        puller = threading.Thread(target=cluster.pull, args=(q, retry, window, download_dir, input_done),
+                                  name="cluster-pull", daemon=True)
+        puller.start()
+
+    try:
+        for t in tasks:
+            # JSONL 파싱 실패 등 잘못된 입력
+            if t.get("invalid"):
+                summary.record(t["url"], t["invalid"], invalid=True)
+                continue
+
+            # 사전 확인에서 걸러낸 영상 (판정은 사전 확인 캐시에만 - 만료되면 다시 확인)
+            if t.get("preflight"):
+                verdict, detail = t["preflight"]
+                error = f"사전 확인 ({verdict}): {detail}"
+                summary.record(t["url"], error, skipped=True)
+                journal.update(t.get("job_id"), "failed", error=error)
+                continue
+
+            # 삭제/비공개/로그인 필요로 실패했던 영상 → 다시 시도하지 않음 (--retry-failed 로 무시)
+            recorded = failures.lookup(t["url"])
+            if recorded:
+                error = f"이전 실패 기록 ({recorded[0]}): {recorded[1]}"
+                summary.record(t["url"], error, skipped=True)
+                journal.update(t.get("job_id"), "failed", error=error)
+                continue
+
+            # 데몬 API로 들어온 작업은 이미 저널에 등록됨
+            if not t.get("admitted"):
+                t, previous, runnable = cluster.submit(t) if cluster.enabled() else admit_task(t, download_dir)
+                if not runnable:
+                    if previous == "done" and t.get("sync"):
+                        playlist_sync.mark_done(*t["sync"])
+                    # 같은 작업이 이미 대기 중이거나 실행 중 (분산 모드: 다른 노드가 실행 중) / 취소 처리 중
+                    if previous in JOB_ACTIVE_STATES or previous == "cancelled":
+                        continue
+                    error = None if previous == "done" else "이전 실행에서 실패 (재시도 횟수 초과)"
+                    summary.record(t["url"], error, skipped=previous == "done")
+                    continue
+
+            if cluster.enabled():
+                continue
+
+            retry.add()
+            q.put({**t, "queued_at": time.time()})
+    except Exception as e:
+        # 입력 읽기 실패 → 이미 넣은 작업은 끝까지 처리하고 요약/종료 코드에 반영
+        print(f"\n[ERROR] 입력 읽기 실패: {type(e).__name__}: {e}")
+        summary.input_error(f"{type(e).__name__}: {e}")
+    finally:
+        if puller:
+            input_done.set()
+            puller.join()
+        # 진행 중인 작업과 재시도 대기 작업이 모두 끝난 뒤 종료 신호
+        retry.wait_idle()
+        for _ in range(count):
+            q.put(None)
+
+def process_download_queue(tasks, download_dir, threads=3, queue_size=None, limits=None):
+    print_header("멀티 다운로드 큐 실행")
+
+    import concurrent.futures
+    import multiprocessing
+
+    limits = {**PIPELINE_LIMITS, "download": threads, **(limits or {})}
+    summary = QueueSummary()
+
+    # 크기 제한 큐 → 입력이 아무리 길어도 메모리 일정
+    # 추출/다운로드 입력은 우선순위 스케줄러 (입력을 넉넉히 앞서 읽어야 뒤쪽의 급한 작업이 먼저 나감)
+    extract_q = JobScheduler(queue_size or SCHED_MAX_QUEUED)
+    download_q = JobScheduler(max(limits["download"] * PIPELINE_QUEUE_FACTOR, SCHED_DOWNLOAD_WINDOW),
+                              channel_limit=limits["channel"])
+    post_q = queue.Queue(maxsize=limits["postprocess"] * PIPELINE_QUEUE_FACTOR)
+    pipeline_queues.update(extract=extract_q, download=download_q)
+
+    retry = RetryScheduler(extract_q)
+    if cluster.enabled():
+        cluster.start()
+
+    pool = concurrent.futures.ProcessPoolExecutor(
+        max_workers=limits["postprocess"],
+        mp_context=multiprocessing.get_context("spawn"),
+    )
+
+    def on_postprocessed(job):
+        if job.get("archived"):
+            journal.update(job.get("job_id"), "done")
+            retire_cancelled(job)
+            if job.get("sync"):
+                playlist_sync.mark_done(*job["sync"])
+            summary.record(job["url"], skipped=True)
+            metrics.record("job", job["queued_at"], "skipped", url=job["url"])
+            return
+
+        staged = job.get("staging")
+        try:
+            check_cancelled(job)
+            journal.update(job.get("job_id"), "postprocessing")
+            final_path = postprocess_stage(job, pool)
+        except BaseException:
+            placer.release(job.get("reservation"))
+            if staged:
+                staging.release(staged[1])
+            raise
+
+        # 스테이징에서 끝난 파일 → 최종 위치로 이동은 백그라운드 (후처리 워커는 바로 다음 작업)
+        if staged:
+            staging.submit(final_path, staged[0], job["output"], staged[1],
+                           lambda path, error: finish(job, path, error))
+            return
+        finish(job, final_path)
+
+    def finish(job, final_path, error=None):
+        placer.release(job.get("reservation"))
+        if error:
+            print(f"\n[ERROR] {error}")
+            summary.record(job["url"], error)
+            journal.update(job.get("job_id"), "failed", error=error)
+            retire_cancelled(job)
+            metrics.record("job", job["queued_at"], "error", url=job["url"], stage="move", error=error)
+            return
+
+        journal.update(job.get("job_id"), "done", path=final_path, nbytes=job.get("bytes", 0))
+        retire_cancelled(job)
+        if not FAILURE_SKIP:
+            failures.forget(job["url"])
+        if job.get("sync"):
+            playlist_sync.mark_done(*job["sync"])
+
+        if ARCHIVE_ENABLED:
+            archive.add(job.get("archive_key"), job_archive_variant(job), final_path)
+        summary.record(job["url"], nbytes=job.get("bytes", 0))
+        metrics.record("job", job["queued_at"], url=job["url"], bytes=job.get("bytes", 0))
+
+    try:
+        with progress_display() as display:
+            display.set_pending(lambda: extract_q.qsize() + download_q.qsize())
+
+            start_stage("extract", limits["extract"], extract_q,
+                        lambda job: extract_stage(job, download_q, summary, retry, extract_q), summary, retry,
+                        download_q, limits["download"])
+            start_stage("download", limits["download"], download_q,
+                        lambda job: download_stage(job, post_q), summary, retry,
+                        post_q, limits["postprocess"])
+            last = start_stage("postprocess", limits["postprocess"], post_q,
+                               on_postprocessed, summary, retry)
+
+            feeder = threading.Thread(
+                target=feed_queue,
+                args=(extract_q, tasks, download_dir, summary, limits["extract"], retry,
+                      (limits["extract"] + limits["download"]) * CLUSTER_PREFETCH_FACTOR),
+                daemon=True,
+            )
+            feeder.start()
+
+            last.join()
+            staging.drain()
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+        if cluster.enabled():
+            cluster.stop()
+
+    print("모든 다운로드가 완료되었습니다.")
+    print(f"[INFO] 메타데이터 캐시: {info_cache.summary()}")
+    if sessions.enabled:
+        print(f"[INFO] 세션 재사용: {sessions.summary()}")
+    if tuner.enabled:
+        print(f"[INFO] 자동 튜닝: {tuner.summary()}")
+    print(f"[INFO] 재시도: {dict(retry.stats, throttle_pauses=breaker.trips)}")
+    if preflight.counts:
+        print(f"[INFO] 사전 확인: {preflight.summary()}")
+    if staging.enabled():
+        print(f"[INFO] 스테이징: {staging.summary()}")
+    for name, q in pipeline_queues.items():
+        print(f"[INFO] 대기 시간 ({name}): {q.summary()}")
+    if JOURNAL_ENABLED:
+        print(f"[INFO] 작업 저널: {journal.counts()}")
+    if cluster.enabled():
+        print(f"[INFO] 노드별 처리량: {cluster.summary()}")
+    return summary.to_dict()
+
+# ------------------------------------------------------------
+# 배치 입력 (파일 / 디렉토리 / stdin)
+# ------------------------------------------------------------
+# 한 줄에 URL 하나, 또는 JSONL (작업별 옵션)
+#   https://www.youtube.com/watch?v=xxxx
+#   {"url": "...", "convert": "mp3", "format": "137+140", "output": "/mnt/music"}
+BATCH_FILE_EXTS = (".txt", ".list", ".jsonl", ".json")
+
+def iter_batch_files(source):
+    if source == "-":
+        yield sys.stdin
+        return
+
+    if os.path.isdir(source):
+        for root, dirs, files in os.walk(source):
+            dirs[:] = sorted(d for d in dirs if not d.startswith("."))
+            for name in sorted(files):
+                if name.startswith(".") or not name.endswith(BATCH_FILE_EXTS):
+                    continue
+                with open(os.path.join(root, name), encoding="utf-8") as f:
+                    yield f
+        return
+
+    with open(source, encoding="utf-8") as f:
+        yield f
+
+def parse_batch_line(line, defaults):
+    line = line.strip()
+
+    if not line or line.startswith("#"):
+        return None
+
+    if not line.startswith("{"):
+        return {**defaults, "url": line}
+
+    try:
+        item = json.loads(line)
+    except ValueError as e:
+        return {"url": line, "invalid": f"JSON 파싱 실패: {e}"}
+
+    if not isinstance(item, dict) or not item.get("url"):
+        return {"url": line, "invalid": "url 항목 없음"}
+
+    # 내부 표시(저널 등록 / 이어서 실행)는 입력으로 받지 않음
+    task = {**defaults, **{k: v for k, v in item.items() if k not in ("admitted", "resumed")}}
+
+    try:
+        task["priority"] = parse_priority(task.get("priority"))
+        task["deadline"] = parse_deadline(task.get("deadline"))
+    except (TypeError, ValueError) as e:
+        return {"url": item["url"], "invalid": f"priority/deadline 오류: {e}"}
+
+    # "format" 은 yt-dlp 포맷 문자열 그대로 사용, "preset" 은 포맷 선택 프리셋
+    # (항목에 지정한 쪽이 기본값보다 우선)
+    if item.get("format"):
+        task["video_fmt"], task["audio_fmt"], task["preset"] = item["format"], None, None
+    elif item.get("preset"):
+        task["video_fmt"], task["audio_fmt"] = None, None
+
+    return task
+
+def iter_batch_items(sources, defaults=None):
+    # 한 줄씩 지연 읽기 (파일 전체를 메모리에 올리지 않음)
+    defaults = defaults or {}
+
+    for source in sources:
+        for f in iter_batch_files(source):
+            for line in f:
+                task = parse_batch_line(line, defaults)
+                if task is not None:
+                    # 공정 분배 단위: 항목에 지정한 source, 없으면 입력 파일
+                    task.setdefault("source", f.name)
+                    yield task
+
+def batch_defaults(args):
+    defaults = {"convert": args.convert, "priority": args.priority}
+    if args.format:
+        defaults["video_fmt"] = args.format
+    elif args.preset:
+        if args.preset not in FORMAT_PRESETS:
+            print(f"[ERROR] 알 수 없는 프리셋: {args.preset} (사용 가능: {', '.join(FORMAT_PRESETS)})")
+            return None
+        defaults["preset"] = args.preset
+    return defaults
+
+def pipeline_limits(args):
+    limits = {}
+    if args.extract_workers:
+        limits["extract"] = args.extract_workers
+    if args.pp_workers:
+        limits["postprocess"] = args.pp_workers
+    if args.channel_limit:
+        limits["channel"] = args.channel_limit
+    return limits
+
+def check_batch_sources(sources):
+    # 파이프라인 시작 전에 확인 (피더 스레드에서 실패하면 빈 요약으로 정상 종료처럼 보임)
+    errors = []
+    for source in sources:
+        if source == "-":
+            continue
+        if os.path.isdir(source):
+            if not os.access(source, os.R_OK | os.X_OK):
+                errors.append(f"배치 디렉토리를 읽을 수 없음: {source}")
+        elif not os.path.isfile(source):
+            errors.append(f"배치 파일 없음: {source}")
+        elif not os.access(source, os.R_OK):
+            errors.append(f"배치 파일을 읽을 수 없음: {source}")
+    return errors
+
+def run_batch(args):
+    download_dir = args.output or build_download_paths()[0][0]
+
+    defaults = batch_defaults(args)
+    if defaults is None:
+        return 2
+
+    errors = check_batch_sources(args.batch or [])
+    for error in errors:
+        print(f"[ERROR] {error}")
+    if errors:
+        return 2
+
+    tasks = iter_batch_items(args.batch or [], defaults)
+    to_stdout = not args.summary or args.summary == "-"
+
+    # 요약을 stdout으로 내보내면 진행 로그는 stderr로 (stdout에는 JSON만)
+    with contextlib.redirect_stdout(sys.stderr if to_stdout else sys.stdout):
+        if preflight.enabled:
+            tasks = preflight.screen(tasks)
+
+        # 이전 실행에서 끝나지 않은 작업부터 (분산 모드는 저널에 남은 작업을 노드들이 가져감)
+        if args.resume and JOURNAL_ENABLED and not cluster.enabled():
+            pending = journal.pending()
+            print(f"[INFO] 이어서 실행할 작업: {len(pending)}개")
+            tasks = itertools.chain(pending, tasks)
+
+        summary = process_download_queue(
+            tasks, download_dir,
+            threads=args.threads, queue_size=args.queue_size, limits=pipeline_limits(args),
+        )
+        if args.preflight_report:
+            preflight.write_report(args.preflight_report)
+
+    # 기계 판독용 요약 (JSON)
+    text = json.dumps(summary, ensure_ascii=False)
+    if to_stdout:
+        print(text)
+    else:
+        with open(args.summary, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+
+    if summary.get("input_errors"):
+        return 2
+    return 1 if summary["failed"] or summary["invalid"] else 0
+
+# ------------------------------------------------------------
+# 플레이리스트 / 채널 증분 동기화
+# ------------------------------------------------------------
+# 같은 플레이리스트/채널을 주기적으로 다시 받을 때, 항목 ID 목록(flat)만 조회해서
+# 이전 동기화 이후 새로 생긴 항목과 아직 받지 못한 항목만 큐에 넣음.
+# 최신순 소스(채널 업로드 목록 등)는 이미 아는 항목이 연속으로 나오면 페이지 조회 중단.
+#   python3 youtube_downloader_cli.py --sync "https://www.youtube.com/@channel/videos"
+SYNC_PATH = os.path.join(STATE_DIR, "sync.sqlite3")
+SYNC_KNOWN_STREAK = 10      # 최신순 소스: 아는 항목이 연속 N개 나오면 조회 중단 (고정/순서 변경 여유)
+
+# 최신순 목록으로 보는 URL (채널 홈/업로드/라이브/쇼츠 탭)
+SYNC_NEWEST_FIRST_RE = re.compile(
+    r"youtube\.com/(?:@[^/?#]+|channel/[^/?#]+|c/[^/?#]+|user/[^/?#]+)"
+    r"(?:/(?:videos|streams|shorts|featured))?/?(?:[?#]|$)"
+)
+
+class PlaylistSync:
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self._conn = None
+
+    def _db(self):
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS playlists ("
+                " url TEXT PRIMARY KEY, id TEXT, title TEXT, meta TEXT, newest_first INTEGER,"
+                " entry_count INTEGER, last_sync REAL, last_full REAL)"
+            )
+            # position: 소스 목록 순서 (0 = 맨 앞), 마지막 전체 조회에 없던 항목은 NULL
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                " playlist TEXT, video_id TEXT, url TEXT, title TEXT, position INTEGER,"
+                " first_seen REAL, done INTEGER DEFAULT 0, PRIMARY KEY (playlist, video_id))"
+            )
+            self._conn = conn
+        return self._conn
+
+    def state(self, url):
+        with self.lock:
+            row = self._db().execute(
+                "SELECT id, title, meta, newest_first, entry_count, last_sync, last_full FROM playlists WHERE url = ?",
+                (url,),
+            ).fetchone()
+
+        if row is None:
+            return None
+
+        keys = ("id", "title", "meta", "newest_first", "entry_count", "last_sync", "last_full")
+        state = dict(zip(keys, row))
+        state["meta"] = json.loads(state["meta"] or "{}")
+        return state
+
+    def known(self, url):
+        with self.lock:
+            rows = self._db().execute("SELECT video_id FROM entries WHERE playlist = ?", (url,)).fetchall()
+        return {video_id for (video_id,) in rows}
+
+    def record(self, url, meta, listed, complete, newest_first):
+        # listed: 이번에 조회한 (video_id, url, title) - 소스 순서
+        now = time.time()
+
+        with self.lock:
+            db = self._db()
+            known = {video_id for (video_id,) in db.execute(
+                "SELECT video_id FROM entries WHERE playlist = ?", (url,)).fetchall()}
+            new = [index for index, (video_id, _, _) in enumerate(listed) if video_id not in known]
+
+            if complete:
+                # 전체 조회 → 순서를 새로 기록하고, 새 항목 위치로 최신순 여부 학습
+                db.execute("UPDATE entries SET position = NULL WHERE playlist = ?", (url,))
+                first_known = next((i for i, (vid, _, _) in enumerate(listed) if vid in known), None)
+                if new and first_known is not None:
+                    if all(i < first_known for i in new):
+                        newest_first = True
+                    elif all(i > first_known for i in new):
+                        newest_first = False
+            else:
+                # 앞부분만 조회 (최신순) → 기존 항목은 새 항목 수만큼 뒤로
+                db.execute("UPDATE entries SET position = position + ? WHERE playlist = ?", (len(new), url))
+
+            for index, (video_id, entry_url, title) in enumerate(listed):
+                db.execute(
+                    "INSERT INTO entries (playlist, video_id, url, title, position, first_seen)"
+                    " VALUES (?, ?, ?, ?, ?, ?)"
+                    " ON CONFLICT (playlist, video_id) DO UPDATE SET url = excluded.url, position = excluded.position",
+                    (url, video_id, entry_url, title, index, now),
+                )
+
+            count = db.execute(
+                "SELECT COUNT(*) FROM entries WHERE playlist = ? AND position IS NOT NULL", (url,)
+            ).fetchone()[0]
+            db.execute(
+                "INSERT INTO playlists (url, id, title, meta, newest_first, entry_count, last_sync, last_full)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+                " ON CONFLICT (url) DO UPDATE SET id = excluded.id, title = excluded.title, meta = excluded.meta,"
+                " newest_first = excluded.newest_first, entry_count = excluded.entry_count,"
+                " last_sync = excluded.last_sync, last_full = COALESCE(excluded.last_full, last_full)",
+                (url, meta.get("playlist_id"), meta.get("playlist_title"), json.dumps(meta, ensure_ascii=False),
+                 int(bool(newest_first)), count, now, now if complete else None),
+            )
+            db.commit()
+
+        return [listed[i] for i in new]
+
+    def pending(self, url):
+        # 이전 동기화에서 찾았지만 아직 받지 못한 항목 (목록 순서)
+        with self.lock:
+            return self._db().execute(
+                "SELECT video_id, url, title FROM entries WHERE playlist = ? AND done = 0"
+                " ORDER BY position IS NULL, position",
+                (url,),
+            ).fetchall()
+
+    def mark_done(self, url, video_id):
+        with self.lock:
+            db = self._db()
+            db.execute("UPDATE entries SET done = 1 WHERE playlist = ? AND video_id = ?", (url, video_id))
+            db.commit()
+
+playlist_sync = PlaylistSync(SYNC_PATH)
+
+def list_playlist_entries(url, known, newest_first):
+    # flat 조회 (항목별 추출 없음). 반환: (플레이리스트 정보, [(video_id, url, title)], 끝까지 조회했는지)
+    opts = build_info_opts(flat=True)
+
+    with metrics.span("extract", url=url, flat=True) as span, sessions.session(opts) as ydl:
+        # process=False → 항목 목록을 페이지 단위로 지연 조회
+        info = resolve_ie_result(ydl, url)
+
+        span["retries"] = ydl.params["logger"].retries
+        if not info or info.get("_type") != "playlist":
+            span["outcome"] = "error"
+            return info, [], True
+
+        listed = []
+        streak = 0
+        complete = True
+
+        for _, entry in iter_playlist_entries(ydl, info):
+            video_id = entry.get("id")
+            if not video_id:
+                continue
+
+            listed.append((video_id, entry.get("webpage_url") or entry.get("url"), entry.get("title")))
+
+            # 최신순: 이미 아는 항목이 연속으로 나오면 그 뒤는 모두 아는 항목
+            streak = streak + 1 if video_id in known else 0
+            if newest_first and streak >= SYNC_KNOWN_STREAK:
+                complete = False
+                break
+
+        span["entries"] = len(listed)
+
+    return info, listed, complete
+
+def sync_playlist(url, full=False):
+    # 반환: (플레이리스트 정보, 받을 항목 [(video_id, url, title)])
+    state = playlist_sync.state(url)
+    known = playlist_sync.known(url) if state else set()
+    newest_first = bool(SYNC_NEWEST_FIRST_RE.search(url) or (state and state["newest_first"]))
+
+    start = time.perf_counter()
+    info, listed, complete = list_playlist_entries(url, known, newest_first and not full)
+
+    if not info or info.get("_type") != "playlist":
+        print(f"[ERROR] 플레이리스트 조회 실패: {url}")
+        return None, []
+
+    meta = playlist_meta(info)
+    new = playlist_sync.record(url, meta, listed, complete, newest_first)
+    new_ids = {video_id for video_id, _, _ in new}
+    pending = [row for row in playlist_sync.pending(url) if row[0] not in new_ids]
+
+    scanned = f"{len(listed)}개 확인" + ("" if complete else " (아는 항목에서 중단)")
+    print(f"[INFO] 동기화: {meta['playlist']} - {scanned}, 새 항목 {len(new)}, 미완료 {len(pending)}"
+          f" ({time.perf_counter() - start:.1f}초)")
+
+    return meta, pending + new
+
+def run_sync(args):
+    download_dir = args.output or build_download_paths()[0][0]
+
+    defaults = batch_defaults(args)
+    if defaults is None:
+        return 2
+
+    tasks = []
+    failed = 0
+    for url in args.sync:
+        meta, entries = sync_playlist(url, full=args.sync_full)
+        if meta is None:
+            failed += 1
+            continue
+
+        for video_id, entry_url, title in entries:
+            tasks.append({
+                **defaults,
+                "url": entry_url,
+                "playlist": True,
+                "playlist_extra": meta,
+                "sync": [url, video_id],
+                "source": f"sync:{url}",
+            })
+
+    # 바뀐 것이 없으면 큐(프로세스 풀)를 띄우지 않음
+    if not tasks:
+        print("[INFO] 새로 받을 항목 없음")
+        return 1 if failed else 0
+
+    summary = process_download_queue(
+        preflight.screen(tasks) if preflight.enabled else iter(tasks), download_dir,
+        threads=args.threads, queue_size=args.queue_size, limits=pipeline_limits(args),
+    )
+    if args.preflight_report:
+        preflight.write_report(args.preflight_report)
+
+    text = json.dumps(summary, ensure_ascii=False)
+    if args.summary and args.summary != "-":
+        with open(args.summary, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+    return 1 if summary["failed"] or failed else 0
+
+# ------------------------------------------------------------
+# 데몬 모드 (로컬 HTTP / Unix 소켓 API)
+# ------------------------------------------------------------
+# 인터프리터, yt_dlp, 파이프라인 워커/프로세스 풀을 띄워 둔 채로 작업을 받음.
+#   POST   /jobs                 {"url": ...} 또는 {"urls": [...], "convert": "mp3", "preset": ...}
+#                                 (+ "priority", "deadline", "source" → 작업 스케줄러)
+#   GET    /jobs?limit=&state=   최근 작업 목록
+#   GET    /jobs/<id>            작업 상태
+#   DELETE /jobs/<id>            취소
+#   GET    /events[?job=<id>]    상태/진행률 이벤트 스트림 (text/event-stream)
+#   GET    /health
+DAEMON_HOST = "127.0.0.1"
+DAEMON_PORT = 8790
+DAEMON_KEEPALIVE = 15
+DAEMON_MAX_BODY = 16 << 20
+
+def make_daemon_handler(submit, status):
+    from http.server import BaseHTTPRequestHandler
+
+    class Handler(BaseHTTPRequestHandler):
+
+        def address_string(self):
+            # Unix 소켓은 client_address가 빈 문자열
+            return self.client_address[0] if self.client_address else "unix"
+
+        def log_message(self, fmt, *args):
+            pass
+
+        def _send(self, code, body):
+            data = json.dumps(body, ensure_ascii=False).encode()
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _route(self):
+            parsed = urllib.parse.urlsplit(self.path)
+            parts = [p for p in parsed.path.split("/") if p]
+            return parts, dict(urllib.parse.parse_qsl(parsed.query))
+
+        def _job_id(self, parts):
+            if len(parts) == 2 and parts[0] == "jobs" and parts[1].isdigit():
+                return int(parts[1])
+            return None
+
+        def do_POST(self):
+            parts, _ = self._route()
+            if parts != ["jobs"]:
+                return self._send(404, {"error": "not found"})
+
+            length = self.headers.get("Content-Length") or "0"
+            if not length.isdigit():
+                return self._send(400, {"error": f"잘못된 Content-Length: {length}"})
+            length = int(length)
+            if length > DAEMON_MAX_BODY:
+                return self._send(413, {"error": "요청이 너무 큼"})
+
+            try:
+                body = json.loads(self.rfile.read(length) or b"{}")
+            except ValueError as e:
+                return self._send(400, {"error": f"JSON 파싱 실패: {e}"})
+
+            if not isinstance(body, dict):
+                return self._send(400, {"error": "JSON 객체가 필요합니다"})
+
+            urls = body.pop("urls", None) or ([body.pop("url")] if body.get("url") else [])
+            if not urls:
+                return self._send(400, {"error": "url 또는 urls 항목 없음"})
+
+            self._send(202, {"jobs": submit([{**body, "url": u} for u in urls])})
+
+        def do_GET(self):
+            parts, query = self._route()
+            job_id = self._job_id(parts)
+
+            if parts == ["health"]:
+                return self._send(200, status())
+            if parts == ["jobs"]:
+                limit = query.get("limit") or "50"
+                if not limit.isdigit():
+                    return self._send(400, {"error": f"limit는 0 이상의 정수여야 합니다: {limit}"})
+                return self._send(200, {"jobs": journal.recent(int(limit), query.get("state"))})
+            if job_id is not None:
+                job = journal.get(job_id)
+                return self._send(200, job) if job else self._send(404, {"error": "not found"})
+            if parts == ["events"]:
+                return self._stream_events(int(query["job"]) if query.get("job", "").isdigit() else None)
+
+            self._send(404, {"error": "not found"})
+
+        def do_DELETE(self):
+            job_id = self._job_id(self._route()[0])
+            if job_id is None:
+                return self._send(404, {"error": "not found"})
+
+            code, job = cancel_job(job_id)
+            self._send(code, job or {"error": "not found"})
+
+        def _stream_events(self, job_filter):
+            q = events.subscribe()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream; charset=utf-8")
+            self.send_header("Cache-Control", "no-cache")
+            self.end_headers()
+
+            try:
+                while True:
+                    try:
+                        event = q.get(timeout=DAEMON_KEEPALIVE)
+                    except queue.Empty:
+                        self.wfile.write(b": keepalive\n\n")
+                        self.wfile.flush()
+                        continue
+
+                    if job_filter is not None and event.get("job") != job_filter:
+                        continue
+
+                    self.wfile.write(f"data: {json.dumps(event, ensure_ascii=False)}\n\n".encode())
+                    self.wfile.flush()
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+            finally:
+                events.unsubscribe(q)
+
+    return Handler
+
+def serve_daemon_api(handler, port=None, socket_path=None):
+    import socketserver
+    from http.server import ThreadingHTTPServer
+
+    if socket_path:
+        class UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+            daemon_threads = True
+
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        server = UnixHTTPServer(socket_path, handler)
+        address = f"unix:{socket_path}"
+    else:
+        server = ThreadingHTTPServer((DAEMON_HOST, port or DAEMON_PORT), handler)
+        address = f"http://{DAEMON_HOST}:{server.server_address[1]}"
+
+    threading.Thread(target=server.serve_forever, name="daemon-api", daemon=True).start()
+    print(f"[INFO] 데몬 API: {address}")
+    return server
+
+def run_daemon(args):
+    global JOURNAL_ENABLED
+
+    if not JOURNAL_ENABLED:
+        print("[WARN] 데몬 모드는 작업 상태 조회에 작업 저널이 필요합니다 → 저널 사용")
+        JOURNAL_ENABLED = True
+
+    defaults = batch_defaults(args)
+    if defaults is None:
+        return 2
+
+    # 첫 작업이 import를 기다리지 않도록 미리 로드
+    load_yt_dlp()
+
+    download_dir = args.output or build_download_paths()[0][0]
+    submissions = queue.Queue()
+    started = time.time()
+
+    def submit(items):
+        results = []
+        for item in items:
+            t = parse_batch_line(json.dumps(item, ensure_ascii=False), defaults)
+            if t.get("invalid"):
+                results.append({"url": t["url"], "error": t["invalid"]})
+                continue
+
+            task, previous, runnable = admit_task(t, download_dir)
+            results.append({
+                "id": task.get("job_id"),
+                "url": t["url"],
+                "state": "queued" if runnable else previous,
+            })
+            if runnable:
+                submissions.put(task)
+        return results
+
+    def status():
+        return {
+            "uptime": round(time.time() - started, 1),
+            "waiting": submissions.qsize(),
+            "jobs": journal.counts(),
+            "sessions": sessions.summary(),
+            "queue_wait": {name: q.summary() for name, q in pipeline_queues.items()},
+        }
+
+    def tasks():
+        # 이전 실행에서 끝나지 않은 작업부터
+        if args.resume:
+            yield from journal.pending()
+        while True:
+            task = submissions.get()
+            if task is None:
+                return
+            yield task
+
+    server = serve_daemon_api(make_daemon_handler(submit, status), args.daemon_port, args.daemon_socket)
+
+    try:
+        summary = process_download_queue(
+            tasks(), download_dir,
+            threads=args.threads, queue_size=args.queue_size, limits=pipeline_limits(args),
+        )
+    except KeyboardInterrupt:
+        print("\n[INFO] 데몬 종료 (진행 중인 작업은 --resume 으로 이어서 실행)")
+        return 0
+    finally:
+        server.shutdown()
+        if args.daemon_socket and os.path.exists(args.daemon_socket):
+            os.remove(args.daemon_socket)
+
+    print(json.dumps(summary, ensure_ascii=False))
+    return 0
+
+# ------------------------------------------------------------
+# 다운로드 저장 위치 선택
+# ------------------------------------------------------------
+def select_download_path():
+
+    paths = build_download_paths()
+
+    print("\n다운로드 저장 위치를 선택하세요:\n")
+
+    for i, (path, free, label) in enumerate(paths):
+
+        label_str = f"[{label}] " if label else ""
+        print(f"{i+1}. {label_str}{path} ({format_size(free)} free)")
+
+    custom_index = len(paths) + 1
+    print(f"{custom_index}. 직접 입력")
+
+    print("\n번호를 입력하세요 (엔터=기본값): ", end="")
+    choice = safe_input().strip()
+
+    if not choice:
+        return paths[0][0]
+
+    if choice.isdigit():
+
+        index = int(choice)
+
+        if 1 <= index <= len(paths):
+            return paths[index - 1][0]
+
+        if index == custom_index:
+            custom = safe_input("다운로드 경로 : ").strip()
+            if custom:
+                return custom
+
+    print("잘못된 입력입니다. 기본값을 사용합니다.")
+    return paths[0][0]
+
+# ------------------------------------------------------------
+# 초기화
+# ------------------------------------------------------------
+def initialize_environment(force_check=False):
 
     if not is_venv():
         print("[ERROR] 현재 Python은 system 환경입니다.")
@@ -644,23 +6198,156 @@ def initialize_environment():
         print(" 다시 실행하세요.")
         sys.exit(1)
 
-    # 1. 설치 보장
-    ensure_python_package("yt-dlp", "yt_dlp")
+    stamp = load_env_stamp()
+
+    # stamp가 유효하면 pip/ffmpeg 점검 생략
+    if force_check or not is_env_stamp_valid(stamp):
+        print("[INFO] 실행 환경 점검 중...")
+        stamp = check_environment()
+
+    if stamp.get("ffmpeg"):
+        ydl_base_opts["ffmpeg_location"] = stamp["ffmpeg"]
+
+    # yt_dlp는 백그라운드에서 미리 로드 (첫 프롬프트를 막지 않음)
+    threading.Thread(target=load_yt_dlp, daemon=True).start()
+
+def report_startup_time():
+    elapsed_ms = (time.perf_counter() - _LAUNCH_TIME) * 1000
+    print(f"[INFO] 시작 시간: {elapsed_ms:.0f} ms")
+    return elapsed_ms
+
+def parse_args(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="yt-dlp 기반 YouTube 다운로더")
+    parser.add_argument("--batch", nargs="+", metavar="SRC",
+                        help="URL 목록 파일/디렉토리 ('-' = stdin) → 비대화형 배치 모드")
+    parser.add_argument("-o", "--output", help="다운로드 저장 경로")
+    parser.add_argument("--convert", choices=("mp3", "mp4"), help="변환 옵션")
+    parser.add_argument("-f", "--format", help="yt-dlp 포맷 문자열 (기본값 bv*+ba/best)")
+    parser.add_argument("--preset", help="포맷 선택 프리셋 (best, 1080p, 720p, 480p, compact, compatible, audio)")
+    parser.add_argument("-j", "--threads", type=int, default=3, help="동시 다운로드 수")
+    parser.add_argument("--extract-workers", type=int, help="정보 추출 동시 실행 수 (기본값 3)")
+    parser.add_argument("--pp-workers", type=int, help="ffmpeg 후처리 프로세스 수 (기본값 CPU 수)")
+    parser.add_argument("--playlist-workers", type=int, default=PLAYLIST_WORKERS,
+                        help="플레이리스트 항목 동시 다운로드 수")
+    parser.add_argument("--queue-size", type=int, help=f"입력을 앞서 읽는 작업 수 - 우선순위/공정 분배가 적용되는 범위 (기본값 {SCHED_MAX_QUEUED})")
+    parser.add_argument("--priority", choices=SCHED_PRIORITIES, default=SCHED_DEFAULT_PRIORITY,
+                        help="작업 기본 우선순위 (JSONL 항목의 \"priority\" 가 우선)")
+    parser.add_argument("--channel-limit", type=int, help="채널별 동시 다운로드 수 (기본값 제한 없음)")
+    parser.add_argument("--summary", default="-", help="요약 JSON 출력 파일 ('-' = stdout)")
+    parser.add_argument("--sync", nargs="+", metavar="URL",
+                        help="플레이리스트/채널 증분 동기화: 새 항목과 아직 받지 못한 항목만 다운로드")
+    parser.add_argument("--sync-full", action="store_true",
+                        help="동기화 시 아는 항목에서 멈추지 않고 목록 전체 조회 (순서/삭제 반영)")
+    parser.add_argument("--daemon", action="store_true",
+                        help=f"데몬 모드: 로컬 API로 작업을 받음 (기본 {DAEMON_HOST}:{DAEMON_PORT})")
+    parser.add_argument("--daemon-port", type=int, metavar="PORT", help="데몬 API HTTP 포트")
+    parser.add_argument("--daemon-socket", metavar="PATH", help="데몬 API를 TCP 대신 Unix 소켓으로")
+    parser.add_argument("--cluster", metavar="DB",
+                        help="분산 모드: 여러 노드가 공유하는 작업 저널 - SQLite 파일(한 머신) 또는 postgresql:// URL(여러 머신)"
+                             " (--batch 입력은 등록만, 실행은 작업을 가져간 노드)")
+    parser.add_argument("--node", metavar="NAME", help="분산 모드 노드 이름 (기본값 호스트명-PID)")
+    parser.add_argument("--cluster-status", action="store_true", help="분산 모드 노드별 처리량 / 작업 상태 출력 후 종료")
+    parser.add_argument("--check-env", action="store_true", help="실행 환경 강제 재점검")
+    parser.add_argument("--no-archive", action="store_true", help="다운로드 보관 목록 사용 안 함")
+    parser.add_argument("--resume", action="store_true",
+                        help="이전 실행에서 중단된 작업부터 이어서 실행 (--batch 없이도 사용 가능)")
+    parser.add_argument("--no-autotune", action="store_true",
+                        help="조각 동시 다운로드 수 / HTTP 청크 크기 자동 조정 사용 안 함")
+    parser.add_argument("--no-stream-transcode", action="store_true",
+                        help="변환(mp3/mp4)을 다운로드와 동시에 하지 않고 다운로드 후 변환")
+    parser.add_argument("--no-preflight", action="store_true",
+                        help="배치/동기화 입력의 사전 확인(삭제/비공개/로그인 필요 영상 걸러내기) 사용 안 함")
+    parser.add_argument("--preflight-report", metavar="FILE", help="사전 확인에서 걸러낸 영상 목록 (JSONL)")
+    parser.add_argument("--no-session-reuse", action="store_true", help="작업마다 YoutubeDL 세션 새로 생성")
+    parser.add_argument("--retry-failed", action="store_true",
+                        help="삭제/비공개/로그인 필요로 실패 기록된 영상도 다시 시도")
+    parser.add_argument("--no-journal", action="store_true", help="작업 저널(재시작 시 이어서 실행) 사용 안 함")
+    parser.add_argument("--limit-rate", metavar="RATE",
+                        help="전체 대역폭 제한 (bit/s, 예: 20M) - 시간대 프로필보다 우선")
+    parser.add_argument("--bandwidth-profile", metavar="FILE",
+                        help=f"시간대별 대역폭 프로필 JSON (기본값 {BANDWIDTH_PROFILE_PATH})")
+    parser.add_argument("--metrics", metavar="FILE", help="단계별 성능 지표를 JSONL 파일로 기록")
+    parser.add_argument("--metrics-port", type=int, metavar="PORT",
+                        help="Prometheus 형식 지표 HTTP 엔드포인트 (127.0.0.1:PORT/metrics)")
+    parser.add_argument("--staging", metavar="DIR",
+                        help="빠른 로컬 디스크에서 받고 병합/변환한 뒤 최종 위치(외장/NAS)로 백그라운드 이동")
+    parser.add_argument("--staging-limit", metavar="SIZE", help="스테이징 공간 한도 (예: 50G, 기본값 디스크 여유 공간)")
+    parser.add_argument("--auto-place", nargs="*", metavar="DIR",
+                        help="예상 크기 기준으로 공간이 남은 볼륨에 자동 배치 (DIR 생략 = 감지된 모든 볼륨)")
+    parser.add_argument("--archive-import", nargs="+", metavar="DIR",
+                        help="기존 다운로드 폴더를 스캔해서 보관 목록 생성 후 종료")
+
+    return parser.parse_args(argv)
+
+def main(argv=None):
+
+    global ARCHIVE_ENABLED, JOURNAL_ENABLED, FAILURE_SKIP, STREAM_TRANSCODE
+
+    args = parse_args(argv)
+    initialize_environment(force_check=args.check_env)
+
+    if args.no_archive:
+        ARCHIVE_ENABLED = False
+    if args.no_journal:
+        JOURNAL_ENABLED = False
+    if args.retry_failed:
+        FAILURE_SKIP = False
+    if args.no_session_reuse:
+        sessions.enabled = False
+    sessions.check_version()
+    if args.no_autotune:
+        tuner.enabled = False
+    if args.no_stream_transcode:
+        STREAM_TRANSCODE = False
+    if args.no_preflight:
+        preflight.enabled = False
+
+    metrics.configure(args.metrics, args.metrics_port)
+    load_format_presets()
+
+    bandwidth.load_profiles(args.bandwidth_profile)
+    if args.limit_rate:
+        bandwidth.set_rate(args.limit_rate)
+
+    if args.staging or STAGING_DIR:
+        staging.configure(args.staging or STAGING_DIR, parse_size(args.staging_limit) if args.staging_limit else None)
+        print(f"[INFO] 스테이징: {staging.root}" + (f" (한도 {format_size(staging.limit)})" if staging.limit else ""))
+
+    if args.auto_place is not None:
+        placer.configure(args.auto_place or [path for path, free, label in build_download_paths()])
+        print(f"[INFO] 자동 배치 볼륨: {', '.join(placer.roots)}")
+
+    if args.archive_import:
+        import_archive(args.archive_import)
+        return
 
-    # 2. 선택적 업데이트 (옵션)
-    update_package("yt-dlp")
+    if args.cluster:
+        if not JOURNAL_ENABLED:
+            print("[ERROR] 분산 모드는 작업 저널이 필요합니다 (--no-journal 과 함께 사용 불가)")
+            sys.exit(2)
+        cluster.configure(args.cluster, args.node)
 
-    # 3. import
-    from yt_dlp import YoutubeDL
+        if args.cluster_status:
+            print(json.dumps({"jobs": journal.counts(), "nodes": journal.node_stats()}, ensure_ascii=False, indent=2))
+            return
 
-    # 4. ffmpeg (OS 패키지 : 필요 시 수동 업데이트)
-    #ensure_ffmpeg()
+        error = cluster.check_host()
+        if error:
+            print(f"[ERROR] {error}")
+            sys.exit(2)
 
+    if args.daemon:
+        sys.exit(run_daemon(args))
 
+    if args.sync:
+        sys.exit(run_sync(args))
 
-def main():
+    if args.batch or args.resume or args.cluster:
+        sys.exit(run_batch(args))
 
-    initialize_environment()
+    report_startup_time()
 
     while True:
 
@@ -668,7 +6355,7 @@ def main():
 
             print("\n===== Youtube Downloader =====\n")
 
-            download_dir = select_download_path()
+            download_dir = args.output or select_download_path()
 
             url = safe_input("유튜브 URL을 입력하세요: ").strip()
 
@@ -676,7 +6363,16 @@ def main():
                 print("URL이 비어있습니다.")
                 continue
 
-            download_video(url, download_dir)
+            if "list=" in url:
+                print("플레이리스트 URL 감지됨.")
+                convert = safe_input("변환 옵션 (mp3/mp4/없음): ").strip().lower()
+                download_playlist(
+                    url, download_dir,
+                    convert_to=convert if convert in ("mp3", "mp4") else None,
+                    workers=args.playlist_workers,
+                )
+            else:
+                download_video(url, download_dir)
 
             print("\n유튜브 URL 관련 파일 다운로드 완료\n")
 